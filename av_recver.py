@@ -2,16 +2,66 @@
 # ffmpeg -re -i backup.ts -map 0:1 -c copy -f mpegts udp://localhost:20000
 
 import argparse
-from pydroneklv.av_decoder import decode_from_ts_stream
+import asyncio
+
+try:
+    from pydroneklv.av_decoder import decode_from_ts_stream
+except ImportError:  # PyAV is optional, fall back to the built-in MPEG-TS demuxer
+    decode_from_ts_stream = None
+from pydroneklv.aio_receiver import open_udp_receiver
+from pydroneklv.decimation import EveryNth, FixedRate
+from pydroneklv.multi_receiver import MultiFeedReceiver
+from pydroneklv.ts_demuxer import TsKlvDecoder
+
+
+def mk_decimation(args):
+    if args.rate is not None:
+        return FixedRate(args.rate)
+    if args.every is not None:
+        return EveryNth(args.every)
+    return None
+
+
+async def receive_builtin(address: str, port: int) -> None:
+    async with await open_udp_receiver(address, port, decoder=TsKlvDecoder(decimation=mk_decimation(args))) \
+            as receiver:
+        async for p in receiver:
+            print('\n'*4)
+            print(p)
+
+
+def receive_feeds(feeds: list) -> None:
+    with MultiFeedReceiver(decoder_factory=TsKlvDecoder) as receiver:
+        for feed in feeds:
+            address, port = feed.rsplit(':', 1)
+            receiver.add_feed(feed, address, int(port), decimation=mk_decimation(args))
+        for feed, p in receiver:
+            print('\n'*4)
+            print(feed, p)
+
 
 parser = argparse.ArgumentParser(description='Parse KLV packets from a data stream in a MPEG-TS UDP connection.')
-parser.add_argument('address', type=str,
+parser.add_argument('address', type=str, nargs='?',
                     help='address of UDP connection')
-parser.add_argument('port', type=int,
+parser.add_argument('port', type=int, nargs='?',
                     help='port of UDP connection')
+parser.add_argument('--feed', action='append', default=[], metavar='ADDRESS:PORT',
+                    help='receive several feeds in one process, can be repeated')
+decimation_group = parser.add_mutually_exclusive_group()
+decimation_group.add_argument('--rate', type=float, metavar='HZ',
+                              help='keep at most this many packets per second, dropped packets are not decoded')
+decimation_group.add_argument('--every', type=int, metavar='N',
+                              help='keep one packet out of N, dropped packets are not decoded')
 
 args = parser.parse_args()
 
-for p in (decode_from_ts_stream(f"udp://{args.address}:{args.port}")):
-    print('\n'*4)
-    print(p)
+if args.feed:
+    receive_feeds(args.feed + ([f'{args.address}:{args.port}'] if args.address is not None else []))
+elif args.port is None:
+    parser.error('give an address and a port, or --feed')
+elif decode_from_ts_stream is None:
+    asyncio.run(receive_builtin(args.address, args.port))
+else:
+    for p in (decode_from_ts_stream(f"udp://{args.address}:{args.port}", decimation=mk_decimation(args))):
+        print('\n'*4)
+        print(p)
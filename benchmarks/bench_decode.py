@@ -0,0 +1,231 @@
+"""
+throughput benchmarks of the decode hot paths, on synthetic corpora built from the example values of the
+decoder map
+
+    python -m benchmarks.bench_decode run -o results.json
+    python -m benchmarks.bench_decode compare baseline.json results.json
+
+compare exits with status 1 when a benchmark got slower than the baseline by more than the threshold
+"""
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import time
+
+from pydroneklv.decoder_map import klv_types_data, UNIVERSAL_KEY
+from pydroneklv.decoders import decode_length, verify_crc
+from pydroneklv.encoders import encode_field, encode_length, mk_crc_field
+from pydroneklv.packet_decoder import decode_packet, search_packet_start
+from pydroneklv.stream_decoder import StreamDecoder
+from pydroneklv.utils import computeCrc
+
+from typing import Callable, Dict, List, Tuple
+
+CORPUS_SIZES = {'small': 100, 'medium': 10_000, 'large': 100_000}  # number of packets
+STREAM_CHUNK_SIZE = 64 * 1024
+DEFAULT_THRESHOLD = 0.10
+
+
+def mk_example_packet(tags: List[int], padding: int = 0) -> bytes:
+    """packet with the example value of each tag, padding adds a passthrough field of that many bytes"""
+    payload = b''.join([encode_field(tag, bytes.fromhex(klv_types_data[tag].example_input_output_values[0]))
+                        for tag in tags])
+    if padding:
+        payload += encode_field(48, bytes(padding))
+    packet = UNIVERSAL_KEY + encode_length(len(payload) + 4) + payload  # checksum field is 4 bytes
+    return bytes(packet + mk_crc_field(packet))
+
+
+def packet_variants() -> List[bytes]:
+    """packets with a short form length, a one byte long form length and a two bytes long form length"""
+    example_tags = [tag for tag, type_data in klv_types_data.items()
+                    if type_data.example_input_output_values is not None]
+    return [mk_example_packet(example_tags[:8]),
+            mk_example_packet(example_tags),
+            mk_example_packet(example_tags, padding=512)]
+
+
+class Corpus:
+    """packets of random variants with up to max_garbage random bytes before each one"""
+
+    def __init__(self, name: str, n_packets: int, max_garbage: int = 32, seed: int = 0):
+        rng = random.Random(seed)
+        variants = packet_variants()
+        self.name = name
+        self.offsets: List[int] = []
+        self.packets: List[bytes] = []
+        buf = bytearray()
+        for _ in range(n_packets):
+            buf += bytes(rng.getrandbits(8) for _ in range(rng.randint(0, max_garbage)))
+            packet = rng.choice(variants)
+            self.offsets.append(len(buf))
+            self.packets.append(packet)
+            buf += packet
+        self.buf = bytes(buf)
+
+    def __len__(self) -> int:
+        return len(self.packets)
+
+
+def bench_decode_packet(corpus: Corpus) -> Callable[[], None]:
+    buf, offsets = corpus.buf, corpus.offsets
+
+    def run():
+        for offset in offsets:
+            decode_packet(buf, offset)
+    return run
+
+
+def bench_decode_packet_lazy(corpus: Corpus) -> Callable[[], None]:
+    buf, offsets = corpus.buf, corpus.offsets
+
+    def run():
+        for offset in offsets:
+            decode_packet(buf, offset, lazy=True)
+    return run
+
+
+def bench_compute_crc(corpus: Corpus) -> Callable[[], None]:
+    bodies = [packet[:-2] for packet in corpus.packets]
+
+    def run():
+        for body in bodies:
+            computeCrc(body)
+    return run
+
+
+def bench_verify_crc(corpus: Corpus) -> Callable[[], None]:
+    buf = corpus.buf
+    bounds = [(offset, offset + len(packet)) for offset, packet in zip(corpus.offsets, corpus.packets)]
+
+    def run():
+        for start, end in bounds:
+            verify_crc(buf, start, end)
+    return run
+
+
+def bench_decode_length(corpus: Corpus) -> Callable[[], None]:
+    buf = corpus.buf
+    length_offsets = [offset + len(UNIVERSAL_KEY) for offset in corpus.offsets]
+
+    def run():
+        for idx in length_offsets:
+            decode_length(buf, idx)
+    return run
+
+
+def bench_search_packet_start(corpus: Corpus) -> Callable[[], None]:
+    buf = corpus.buf
+
+    def run():
+        idx = search_packet_start(buf, 0)
+        while idx is not None:
+            idx = search_packet_start(buf, idx)
+    return run
+
+
+def bench_stream(corpus: Corpus) -> Callable[[], None]:
+    chunks = [corpus.buf[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(corpus.buf), STREAM_CHUNK_SIZE)]
+
+    def run():
+        decoder = StreamDecoder()
+        for chunk in chunks:
+            for _ in decoder.feed(chunk):
+                pass
+    return run
+
+
+BENCHMARKS = {'decode_packet': bench_decode_packet,
+              'decode_packet_lazy': bench_decode_packet_lazy,
+              'computeCrc': bench_compute_crc,
+              'verify_crc': bench_verify_crc,
+              'decode_length': bench_decode_length,
+              'search_packet_start': bench_search_packet_start,
+              'stream': bench_stream,
+              }
+
+
+def best_time(func: Callable[[], None], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)  # the least disturbed run
+
+
+def run_benchmarks(sizes: List[str], names: List[str], repeat: int) -> Dict:
+    results = {}
+    for size in sizes:
+        corpus = Corpus(size, CORPUS_SIZES[size])
+        for name in names:
+            seconds = best_time(BENCHMARKS[name](corpus), repeat)
+            results[f'{name}/{size}'] = {'seconds': seconds,
+                                         'packets': len(corpus),
+                                         'bytes': len(corpus.buf),
+                                         'packets_per_s': len(corpus) / seconds,
+                                         'bytes_per_s': len(corpus.buf) / seconds,
+                                         }
+            print(f'{name + "/" + size:32} {len(corpus) / seconds:14,.0f} packets/s '
+                  f'{len(corpus.buf) / seconds / 2 ** 20:10.1f} MiB/s')
+    return {'meta': {'python': sys.version,
+                     'platform': platform.platform(),
+                     'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                     'repeat': repeat,
+                     },
+            'results': results}
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float) -> Tuple[List[str], List[str]]:
+    """returns the report lines and the names of the benchmarks slower than the baseline by more than threshold"""
+    lines = []
+    regressions = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        ratio = result['seconds'] / baseline['results'][name]['seconds']
+        regressed = ratio > 1 + threshold
+        if regressed:
+            regressions.append(name)
+        lines.append(f'{name:32} {ratio:6.2f}x time' + (' REGRESSION' if regressed else ''))
+    return lines, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('-o', '--output', help='JSON file to save the results to')
+    run_parser.add_argument('--sizes', default='small,medium', help=f'corpora among {",".join(CORPUS_SIZES)}')
+    run_parser.add_argument('--benchmarks', default=','.join(BENCHMARKS), help='benchmarks to run')
+    run_parser.add_argument('--repeat', type=int, default=5)
+
+    compare_parser = commands.add_parser('compare', help='compare results to a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help='relative slowdown reported as a regression')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        results = run_benchmarks(args.sizes.split(','), args.benchmarks.split(','), args.repeat)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    lines, regressions = compare_results(baseline, current, args.threshold)
+    print('\n'.join(lines))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# module to receive KLV packets over UDP inside an asyncio event loop
+import asyncio
+from collections import deque
+
+from .decimation import Decimator
+from .stream_decoder import StreamDecoder
+
+from typing import Any, Deque, Optional, Tuple
+
+# what to do with a decoded packet when the queue is full
+DROP_OLDEST = 'drop_oldest'  # discard the oldest queued packet to make room
+DROP_NEWEST = 'drop_newest'  # discard the packet that just arrived
+PAUSE = 'pause'  # queue it and stop reading the socket until the consumer catches up, the kernel
+#                  socket buffer fills up and drops datagrams instead
+QUEUE_POLICIES = (DROP_OLDEST, DROP_NEWEST, PAUSE)
+
+
+class KlvDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, receiver: 'UdpKlvReceiver'):
+        self.receiver = receiver
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.receiver.feed(data)
+
+    def error_received(self, exc: Exception) -> None:
+        self.receiver.socket_errors += 1
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.receiver.close()
+
+
+class UdpKlvReceiver:
+    """
+    async iterator over the packets decoded from the datagrams received on a UDP socket
+
+        async with await open_udp_receiver('0.0.0.0', 20000) as receiver:
+            async for packet in receiver:
+                ...
+
+    decoded packets wait in a queue of at most max_queue_size packets, policy decides what happens when
+    the consumer falls behind and the queue is full, see QUEUE_POLICIES
+    decoder - object with a feed(bytes) method returning the completed packets, a StreamDecoder by default
+    decimation - Decimator of the default StreamDecoder, packets are then dropped before being decoded, see
+                 StreamDecoder. give it to the decoder instead when there is one
+    """
+
+    def __init__(self, decoder: Optional[Any] = None, max_queue_size: int = 1024, policy: str = DROP_OLDEST,
+                 decimation: Optional[Decimator] = None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f'policy must be one of {QUEUE_POLICIES}, got {policy}')
+        if decoder is not None and decimation is not None:
+            raise ValueError('decimation is an option of the default decoder, give it to the decoder instead')
+        self.decoder = decoder if decoder is not None else StreamDecoder(decimation=decimation)
+        self.max_queue_size = max_queue_size
+        self.policy = policy
+
+        self.received_packets = 0
+        self.dropped_packets = 0
+        self.socket_errors = 0
+
+        self._packets: Deque = deque()
+        self._waiter: Optional[asyncio.Future] = None
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._paused = False
+        self._closed = False
+
+    async def start(self, host: str, port: int) -> 'UdpKlvReceiver':
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(lambda: KlvDatagramProtocol(self),
+                                                                 local_addr=(host, port))
+        return self
+
+    @property
+    def local_address(self) -> Tuple[str, int]:
+        return self._transport.get_extra_info('sockname')
+
+    @property
+    def metrics(self) -> Optional[Any]:
+        """DecodeMetrics of the decoder, if it was given some, to poll them while receiving"""
+        return getattr(self.decoder, 'metrics', None)
+
+    @property
+    def queue_size(self) -> int:
+        return len(self._packets)
+
+    def feed(self, data: bytes) -> None:
+        """decodes a datagram and queues the completed packets"""
+        for packet in self.decoder.feed(data):
+            self.received_packets += 1
+            self._put(packet)
+
+    def _put(self, packet: Any) -> None:
+        if len(self._packets) >= self.max_queue_size:
+            if self.policy == DROP_NEWEST:
+                self.dropped_packets += 1
+                return
+            if self.policy == DROP_OLDEST:
+                self._packets.popleft()
+                self.dropped_packets += 1
+        self._packets.append(packet)
+
+        if self.policy == PAUSE and not self._paused and len(self._packets) >= self.max_queue_size and \
+           self._transport is not None:
+            self._transport.pause_reading()
+            self._paused = True
+        self._wake_up()
+
+    def _wake_up(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def close(self) -> None:
+        """stops receiving, the packets already queued can still be iterated"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._transport is not None:
+            self._transport.close()
+        self._wake_up()
+
+    def __aiter__(self) -> 'UdpKlvReceiver':
+        return self
+
+    async def __anext__(self) -> Any:
+        while not self._packets:
+            if self._closed:
+                raise StopAsyncIteration
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+
+        packet = self._packets.popleft()
+        if self._paused and len(self._packets) <= self.max_queue_size // 2 and not self._closed:
+            self._transport.resume_reading()
+            self._paused = False
+        return packet
+
+    async def __aenter__(self) -> 'UdpKlvReceiver':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+
+async def open_udp_receiver(host: str, port: int, decoder: Optional[Any] = None, max_queue_size: int = 1024,
+                            policy: str = DROP_OLDEST, decimation: Optional[Decimator] = None) -> UdpKlvReceiver:
+    """creates a UdpKlvReceiver listening on host:port, see UdpKlvReceiver"""
+    receiver = UdpKlvReceiver(decoder, max_queue_size, policy, decimation)
+    return await receiver.start(host, port)
@@ -1,9 +1,22 @@
 # module to connect to a MPEG-TS stream and decode KLV packets from a KLV stream
 import av
-from .packet_decoder import decode_packet
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+from .decimation import Decimator
+from .delta import DeltaFilter
+from .frame_align import FrameAligner, AlignedFrame, NEAREST, PTS_CLOCK
+from .metrics import DecodeMetrics
+from .packet_decoder import decode_packet, find_packet_key, tags_set, DecodeCache
+from .parallel_decoder import ordered_map
+from .threaded_decoder import ThreadedDecoder, BLOCK
 
-def decode_from_ts_stream(stream_path: str) -> None:
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+def demux_data_packets(stream_path: str) -> Iterator[bytes]:
+    """yields the bytes of the packets of the first data stream of a MPEG-TS stream"""
     with av.open(stream_path) as input_:
         # Make an output stream using the input as a template. This copies the stream
         # setup from one to the other.
@@ -13,8 +26,164 @@ def decode_from_ts_stream(stream_path: str) -> None:
             # We need to skip the "flushing" packets that `demux` generates.
             if packet.dts is None:
                 continue
+            yield bytes(packet)  # buffer protocol, packet.to_bytes() is gone from recent PyAV
+
+
+def decimated(packets_bytes: Iterator[bytes], decimation: Decimator) -> Iterator[bytes]:
+    """the packets kept by decimation, decided before they are decoded"""
+    for packet_bytes in packets_bytes:
+        key_idx = find_packet_key(packet_bytes)
+        if key_idx == -1:
+            yield packet_bytes  # dropped by the decoder
+            continue
+        try:
+            keep = decimation.keep(packet_bytes, key_idx)
+        except Exception:  # malformed bytes, dropped as the packets failing to decode
+            continue
+        if keep:
+            yield packet_bytes
+
+
+def decode_from_ts_stream(stream_path: str, tags: Optional[Iterable[int]] = None, check_crc: bool = True,
+                          metrics: Optional[DecodeMetrics] = None, cache: Optional[DecodeCache] = None,
+                          decimation: Optional[Decimator] = None, raw: bool = False,
+                          delta: Optional[DeltaFilter] = None) -> Iterator[dict]:
+    """yields the packets decoded from the first data stream of a MPEG-TS stream
+    packets failing to decode are dropped, metrics counts them by error
+    tags, check_crc, cache, raw - see decode_packet, a cache must then be created with raw=True too
+    decimation - Decimator, the packets it drops are not decoded
+    delta - DeltaFilter, packets are then DeltaPackets with only the fields changed since the previous ones
+    """
+    if cache is not None and cache.raw != raw:  # checked once, every packet would be dropped otherwise
+        raise ValueError(f'cache decodes with raw={cache.raw}, the packets with raw={raw}')
+    tags = tags_set(tags)
+    lazy = delta is not None  # the delta filter compares the fields before decoding them
+    packets_bytes = demux_data_packets(stream_path)
+    if decimation is not None:
+        packets_bytes = decimated(packets_bytes, decimation)
+    if metrics is None:
+        for packet_bytes in packets_bytes:
+            try:
+                decoded_packet = decode_packet(packet_bytes, lazy=lazy, tags=tags, check_crc=check_crc, cache=cache,
+                                               raw=raw)
+                if delta is not None:  # the lazy fields are decoded here
+                    decoded_packet = delta.update(decoded_packet)
+            except Exception:  # CRCError, ByteArrayTooSmall, UniversalKeyNotFound or a field failing to decode
+                continue
+            yield decoded_packet
+        return
+
+    for packet_bytes in packets_bytes:
+        demux_time = time.perf_counter_ns()
+        try:
+            decoded_packet = metrics.decode(packet_bytes, lazy=lazy, tags=tags, check_crc=check_crc, cache=cache,
+                                            raw=raw)
+        except Exception:  # counted by metrics
+            continue
+        if delta is not None:
+            try:
+                decoded_packet = delta.update(decoded_packet)  # the lazy fields are decoded here
+            except Exception as e:
+                metrics.add_error(e)
+                continue
+        metrics.add_latency(demux_time)
+        yield decoded_packet
+
+
+def decode_packets(packets_bytes: List[bytes], tags: Optional[Iterable[int]] = None,
+                   check_crc: bool = True, metrics: Optional[DecodeMetrics] = None) -> List[dict]:
+    """decodes a batch of demuxed packets, the ones failing to decode are dropped as in decode_from_ts_stream"""
+    decode = metrics.decode if metrics is not None else decode_packet
+    decoded_packets = []
+    for packet_bytes in packets_bytes:
+        try:
+            decoded_packets.append(decode(packet_bytes, tags=tags, check_crc=check_crc))
+        except Exception:
+            pass
+    return decoded_packets
+
+
+def decode_packets_counted(packets_bytes: List[bytes], tags: Optional[Iterable[int]] = None,
+                           check_crc: bool = True, tag_timing: bool = False) -> Tuple[List[dict], DecodeMetrics]:
+    """decode_packets in a worker process, returning the metrics of the batch to merge them in the parent"""
+    metrics = DecodeMetrics(tag_timing)
+    return decode_packets(packets_bytes, tags, check_crc, metrics), metrics
+
+
+def _batches(packets_bytes: Iterator[bytes], batch_size: int) -> Iterator[List[bytes]]:
+    batch = []
+    for packet_bytes in packets_bytes:
+        batch.append(packet_bytes)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def decode_from_ts_stream_parallel(stream_path: str, workers: Optional[int] = None, batch_size: int = 1024,
+                                   tags: Optional[Iterable[int]] = None, check_crc: bool = True,
+                                   metrics: Optional[DecodeMetrics] = None) -> Iterator[dict]:
+    """
+    yields the same packets as decode_from_ts_stream, in the same order, decoded by a pool of processes
+    demuxing stays in this process, the demuxed packets are sent to the workers in batches of batch_size
+    workers - number of processes, defaults to the number of CPUs
+    metrics - the metrics of every batch are merged in it, without latencies
+    """
+    workers = workers or os.cpu_count() or 1
+    if tags is not None:
+        tags = frozenset(tags)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        batches = _batches(demux_data_packets(stream_path), batch_size)
+        if metrics is None:
+            args_iter = ((batch, tags, check_crc) for batch in batches)
+            for packets in ordered_map(executor, decode_packets, args_iter, 2 * workers):
+                yield from packets
+            return
+
+        args_iter = ((batch, tags, check_crc, metrics.tag_timing) for batch in batches)
+        for packets, batch_metrics in ordered_map(executor, decode_packets_counted, args_iter, 2 * workers):
+            metrics.merge(batch_metrics)
+            yield from packets
+
+
+def decode_from_ts_stream_threaded(stream_path: str, workers: int = 2, max_queue_size: int = 1024,
+                                   policy: str = BLOCK, tags: Optional[Iterable[int]] = None, check_crc: bool = True,
+                                   metrics: Optional[DecodeMetrics] = None) -> ThreadedDecoder:
+    """
+    decode_from_ts_stream with demuxing in its own thread, decoding in a pool of threads and a queue of at
+    most max_queue_size packets in between, see ThreadedDecoder. packets come in stream order
+
+        with decode_from_ts_stream_threaded('udp://0.0.0.0:20000', policy=DROP_OLDEST) as decoder:
+            for packet in decoder:
+                ...
+    """
+    return ThreadedDecoder(demux_data_packets(stream_path), workers, max_queue_size, policy, tags, check_crc,
+                           metrics)
+
+
+def align_frames_from_ts_stream(stream_path: str, method: str = NEAREST, max_distance: Optional[int] = None,
+                                tags: Optional[Iterable[int]] = None, check_crc: bool = True) -> Iterator[AlignedFrame]:
+    """
+    yields the frames of the first video stream of a MPEG-TS stream with the packets of its first data stream,
+    demuxed together in one pass, see FrameAligner. pts are in 90 kHz ticks whatever the stream time base
+    """
+    tags = tags_set(tags)
+    aligner = FrameAligner(method, max_distance)
+    with av.open(stream_path) as input_:
+        in_video = input_.streams.video[0]
+        in_data = input_.streams.data[0]
+        for packet in input_.demux(in_video, in_data):
+            if packet.dts is None:  # flushing packets
+                continue
+            pts = round(packet.pts * packet.time_base * PTS_CLOCK) if packet.pts is not None else None
+            if packet.stream.index == in_video.index:
+                if pts is not None:
+                    yield from aligner.add_frame(pts)
+                continue
             try:
-                decoded_packet = decode_packet(packet.to_bytes())
-                yield decoded_packet
-            except:
-                pass
+                decoded_packet = decode_packet(bytes(packet), tags=tags, check_crc=check_crc)
+            except Exception:  # dropped as in decode_from_ts_stream
+                continue
+            yield from aligner.add_klv(pts, decoded_packet)
+    yield from aligner.flush()
@@ -0,0 +1,209 @@
+# module to decode many packets at once into one numpy array per tag (struct of arrays)
+import numpy as np
+
+from .decoder_map import klv_dispatch_table
+from .decoder_map import UNIVERSAL_KEY as BYTES_UKEY
+from .decoders import verify_crc, decode_length
+from .packet_decoder import find_packet_key
+
+from typing import Dict, Iterable, Optional, Tuple
+
+# big endian numpy dtypes for the input types declared in the decoder map
+numpy_input_types = {'uint8': '>u1',
+                     'int8': '>i1',
+                     'uint16': '>u2',
+                     'int16': '>i2',
+                     'uint32': '>u4',
+                     'int32': '>i4',
+                     'uint64': '>u8',
+                     'int64': '>i8',
+                     }
+
+TIMESTAMP_TAG = 2
+
+
+def _segment_sums(arr: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """sums of arr[lo[i]:hi[i]] for every i, arr must end with a zero element"""
+    indices = np.empty(2 * len(lo), dtype=np.int64)
+    indices[0::2] = lo
+    indices[1::2] = hi
+    sums = np.add.reduceat(arr, indices, dtype=np.int64)[0::2]
+    return np.where(hi > lo, sums, 0)  # reduceat gives arr[lo] for empty segments
+
+
+def verify_crc_batch(buf: bytes, starts: Iterable[int], ends: Iterable[int]) -> np.ndarray:
+    """checks the CRC of many packets lying in one contiguous buffer at once
+    starts - index of the universal key of each packet
+    ends   - index one past the last byte of each packet
+    returns a boolean mask, True for the packets whose CRC matches
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    starts = np.asarray(starts, dtype=np.int64)
+    crc_starts = np.asarray(ends, dtype=np.int64) - 2
+
+    # bytes at even and odd positions of the buffer, the appended zero keeps segments ending at the
+    # last byte valid reduceat indices
+    even = np.append(data[0::2], np.uint8(0))
+    odd = np.append(data[1::2], np.uint8(0))
+    # the byte range [a, b) holds the even positions [ceil(a / 2), ceil(b / 2)) and odd ones [a // 2, b // 2)
+    even_sums = _segment_sums(even, (starts + 1) // 2, (crc_starts + 1) // 2)
+    odd_sums = _segment_sums(odd, starts // 2, crc_starts // 2)
+
+    # the first byte of a packet is the high byte of its first 16 bit word
+    starts_even = (starts % 2) == 0
+    high = np.where(starts_even, even_sums, odd_sums)
+    low = np.where(starts_even, odd_sums, even_sums)
+    computed_crc = ((high << 8) + low) & 0xffff
+
+    packet_crc = (data[crc_starts].astype(np.int64) << 8) + data[crc_starts + 1]
+    return computed_crc == packet_crc
+
+
+class KlvBatch:
+    """decoded values of a batch of packets, one array per tag
+
+    values[tag]  - array with one element per packet, scaled to the tag output units, or the raw integers and
+                   UNIX microseconds of a raw batch
+    present[tag] - boolean mask, True where the packet carried the tag
+    valid        - boolean mask, True where the packet was found and passed the CRC check
+    """
+
+    def __init__(self, n_packets: int):
+        self.n_packets = n_packets
+        self.values: Dict[int, np.ndarray] = {}
+        self.present: Dict[int, np.ndarray] = {}
+        self.valid = np.zeros(n_packets, dtype=bool)
+
+    def __len__(self) -> int:
+        return self.n_packets
+
+    def __getitem__(self, tag: int) -> np.ndarray:
+        return self.values[tag]
+
+    def __contains__(self, tag: int) -> bool:
+        return tag in self.values
+
+    def tags(self):
+        return self.values.keys()
+
+
+class _TagColumn:
+    """payloads of one tag collected across the batch, decoded all at once in to_array"""
+
+    def __init__(self):
+        self.rows = []
+        self.payloads = []
+
+    def add(self, row: int, payload: bytes) -> None:
+        self.rows.append(row)
+        self.payloads.append(payload)
+
+    def to_array(self, tag: int, n_packets: int, raw: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.array(self.rows, dtype=np.intp)
+        present = np.zeros(n_packets, dtype=bool)
+        type_data = klv_dispatch_table[tag]
+
+        if type_data.input_type in numpy_input_types:
+            dtype = np.dtype(numpy_input_types[type_data.input_type])
+            # fields with an unexpected size can't be decoded as that type, leave them out
+            sized = [i for i, p in enumerate(self.payloads) if len(p) == dtype.itemsize]
+            raw_values = np.frombuffer(b''.join([self.payloads[i] for i in sized]), dtype=dtype)
+            rows = rows[sized]
+            if type_data.scale is not None and not raw:
+                values = np.full(n_packets, np.nan)
+                values[rows] = raw_values * type_data.scale + type_data.offset
+            else:
+                values = np.zeros(n_packets, dtype=dtype.newbyteorder('='))
+                values[rows] = raw_values
+        elif tag == TIMESTAMP_TAG:
+            sized = [i for i, p in enumerate(self.payloads) if len(p) == 8]
+            raw_values = np.frombuffer(b''.join([self.payloads[i] for i in sized]), dtype='>u8')
+            rows = rows[sized]
+            if raw:
+                values = np.zeros(n_packets, dtype=np.int64)
+                values[rows] = raw_values
+            else:
+                values = np.full(n_packets, np.datetime64('NaT'), dtype='datetime64[us]')
+                values[rows] = raw_values.astype(np.int64).view('datetime64[us]')
+        else:
+            # strings and other variable length fields, decoded one by one. fields failing to decode are left out
+            decode_func = type_data.decode_func
+            values = np.full(n_packets, None, dtype=object)
+            decoded = []
+            for row, payload in zip(self.rows, self.payloads):
+                try:
+                    values[row] = decode_func(payload)
+                except Exception:
+                    continue
+                decoded.append(row)
+            rows = np.array(decoded, dtype=np.intp)
+
+        present[rows] = True
+        return values, present
+
+
+def _n_length_bytes(buf: bytes, idx: int) -> int:
+    """number of bytes of the BER length at idx, from its first byte"""
+    return 1 + (buf[idx] & 0b01111111) if buf[idx] & 0b10000000 else 1
+
+
+def decode_batch(packets: Iterable[bytes], tags: Optional[Iterable[int]] = None, check_crc: bool = True,
+                 raw: bool = False) -> KlvBatch:
+    """decodes a sequence of packet buffers into a KlvBatch
+    tags - if given, only these tags are decoded
+    raw  - keep the integers unscaled, with the 0 default where missing, and the timestamps as int64 UNIX
+           microseconds. decoder_map.scale_raw_value converts whole columns later
+    """
+    wanted = set(tags) if tags is not None else None
+    columns: Dict[int, _TagColumn] = {}
+    valid = []
+
+    n_packets = 0
+    for row, buf in enumerate(packets):
+        n_packets += 1
+        idx = find_packet_key(buf)
+        if idx == -1:
+            valid.append(False)
+            continue
+        packet_start = idx
+        idx += len(BYTES_UKEY)
+        if idx >= len(buf) or idx + _n_length_bytes(buf, idx) > len(buf):
+            valid.append(False)
+            continue
+        n_length_bytes, payload_length = decode_length(buf, idx)
+        idx += n_length_bytes
+        payload_end = idx + payload_length
+        if payload_end > len(buf) or \
+           (check_crc and not verify_crc(buf, packet_start, payload_end)):
+            valid.append(False)
+            continue
+
+        # fields are checked to stay within the payload before any is added, unchecked packets can be corrupted
+        fields = []
+        while idx < payload_end:
+            tag = buf[idx]
+            if idx + 1 >= payload_end or idx + 1 + _n_length_bytes(buf, idx + 1) > payload_end:
+                break
+            n_tag_len_bytes, tag_len = decode_length(buf, idx + 1)
+            payload_start = idx + 1 + n_tag_len_bytes
+            idx = payload_start + tag_len
+            if idx > payload_end:
+                break
+            if wanted is None or tag in wanted:
+                fields.append((tag, payload_start, idx))
+        if idx != payload_end:
+            valid.append(False)
+            continue
+        valid.append(True)
+
+        for tag, field_start, field_end in fields:
+            column = columns.get(tag)
+            if column is None:
+                column = columns[tag] = _TagColumn()
+            column.add(row, buf[field_start:field_end])
+
+    batch = KlvBatch(n_packets)
+    batch.valid[:] = valid
+    for tag in sorted(columns):
+        batch.values[tag], batch.present[tag] = columns[tag].to_array(tag, n_packets, raw)
+    return batch
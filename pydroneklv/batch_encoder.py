@@ -0,0 +1,130 @@
+# module to encode many packets at once from one numpy array per tag, the inverse of batch_decoder
+import datetime
+
+import numpy as np
+
+from .batch_decoder import numpy_input_types
+from .decoder_map import klv_dispatch_table, UNIVERSAL_KEY
+from .decoders import decodeTimeStamp, to_microseconds
+from .encoders import encode_length, encode_value, CRC_HEADER
+
+from typing import Any, Dict, Iterator, Optional, Union
+
+TIMESTAMP_TAG = 2
+
+
+def column_to_raw(tag: int, values: Any) -> np.ndarray:
+    """big endian integers encoding values, as stored in the fields of the tag"""
+    type_data = klv_dispatch_table[tag]
+    values = np.asarray(values)
+    if type_data.decode_func is decodeTimeStamp:
+        if np.issubdtype(values.dtype, np.datetime64):
+            values = values.astype('datetime64[us]').view(np.int64)
+        return values.astype('>u8')
+    if type_data.input_type not in numpy_input_types:
+        raise ValueError(f'tag {tag} has no fixed size type, give it as a constant field')
+    dtype = np.dtype(numpy_input_types[type_data.input_type])
+    if type_data.scale is not None:
+        values = np.rint((values - type_data.offset) / type_data.scale)
+        values = np.clip(values, type_data.min_input_val, type_data.max_input_val)
+    return values.astype(dtype)
+
+
+def encode_batch(columns: Dict[int, Any], constant_fields: Optional[Dict[int, Any]] = None) -> bytes:
+    """
+    encodes one packet per row of columns into a contiguous buffer of complete packets with their checksum
+    columns         - tag -> sequence of values, one per packet, in the tag output units (datetime64 or
+                      microseconds for timestamps). only fixed size types, every packet carries every tag
+    constant_fields - tag -> value repeated in every packet, for strings and other variable size fields
+    the timestamp comes first in each packet, then the constant fields and the columns in their order
+    """
+    constant_fields = constant_fields or {}
+    raw_columns = {tag: column_to_raw(tag, values) for tag, values in columns.items()}
+    n_packets = len(next(iter(raw_columns.values()))) if raw_columns else 0
+    if any(len(raw) != n_packets for raw in raw_columns.values()):
+        raise ValueError('columns have different lengths')
+
+    # template of a packet with zero values, every packet has the same layout
+    fields = []
+    column_offsets = {}
+    payload_size = 0
+    ordered = sorted([(tag, False) for tag in constant_fields] + [(tag, True) for tag in raw_columns],
+                     key=lambda item: item[0] != TIMESTAMP_TAG)
+    for tag, is_column in ordered:
+        if is_column:
+            raw = raw_columns[tag]
+            field = bytes((tag, raw.dtype.itemsize)) + bytes(raw.dtype.itemsize)
+            column_offsets[tag] = payload_size + 2
+        else:
+            field = encode_value(tag, constant_fields[tag])
+        fields.append(field)
+        payload_size += len(field)
+    header = bytes(UNIVERSAL_KEY) + encode_length(payload_size + 4)  # checksum field is 4 bytes
+    template = np.frombuffer(header + b''.join(fields) + CRC_HEADER + b'\x00\x00', dtype=np.uint8)
+    packet_size = len(template)
+
+    packets = np.empty((n_packets, packet_size), dtype=np.uint8)
+    packets[:] = template
+    for tag, offset in column_offsets.items():
+        raw = raw_columns[tag]
+        start = len(header) + offset
+        packets[:, start:start + raw.dtype.itemsize] = raw.view(np.uint8).reshape(n_packets, -1)
+
+    # sum of the 16 bit words up to the checksum value, bytes at even positions are the high bytes
+    crc_idx = packet_size - 2
+    high = packets[:, 0:crc_idx:2].sum(axis=1, dtype=np.int64)
+    low = packets[:, 1:crc_idx:2].sum(axis=1, dtype=np.int64)
+    crc = ((high << 8) + low) & 0xffff
+    packets[:, crc_idx] = crc >> 8
+    packets[:, crc_idx + 1] = crc & 0xff
+    return packets.tobytes()
+
+
+def synthetic_columns(n_packets: int, start: Union[int, datetime.datetime], rate: float = 30.0,
+                      rng: Optional[np.random.Generator] = None, first_packet: int = 0) -> Dict[int, np.ndarray]:
+    """
+    values of a platform flying an orbit around a point and looking at its center, rate packets a second
+    start is the time of packet 0, the values begin at packet first_packet to continue a previous batch
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    t = (first_packet + np.arange(n_packets)) / rate
+    angle = 2 * np.pi * t / 600  # one orbit every 10 minutes
+    center_lat, center_lon, radius = 38.7, -9.1, 0.05
+    lat = center_lat + radius * np.sin(angle)
+    lon = center_lon + radius * np.cos(angle)
+    altitude = 1500 + 20 * np.sin(t / 30) + rng.normal(0, 0.5, n_packets)
+    heading = np.degrees(angle) % 360  # tangent to the orbit, clockwise from north
+    return {
+        TIMESTAMP_TAG: to_microseconds(start) + np.rint(t * 1e6).astype(np.int64),
+        5: heading,
+        6: rng.normal(0, 1, n_packets),
+        7: 15 + rng.normal(0, 1, n_packets),
+        13: lat,
+        14: lon,
+        15: altitude,
+        16: np.full(n_packets, 10.0),
+        17: np.full(n_packets, 5.6),
+        18: (heading + 270) % 360,  # sensor looking to the orbit center
+        19: np.full(n_packets, -45.0),
+        20: np.zeros(n_packets),
+        21: altitude * np.sqrt(2),
+        23: np.full(n_packets, center_lat),
+        24: np.full(n_packets, center_lon),
+        25: np.full(n_packets, 100.0),
+    }
+
+
+def iter_synthetic_stream(n_packets: int, start: Union[int, datetime.datetime], rate: float = 30.0,
+                          batch_size: int = 64 * 1024, seed: Optional[int] = None,
+                          constant_fields: Optional[Dict[int, Any]] = None) -> Iterator[bytes]:
+    """
+    raw KLV stream of n_packets synthetic packets (see synthetic_columns), yielded as buffers of up to
+    batch_size packets so memory stays bounded
+    """
+    if constant_fields is None:
+        constant_fields = {3: 'MISSION01', 4: 'AF-101', 65: 8}
+    rng = np.random.default_rng(seed)
+    start = to_microseconds(start)
+    for first in range(0, n_packets, batch_size):
+        n = min(batch_size, n_packets - first)
+        yield encode_batch(synthetic_columns(n, start, rate, rng, first), constant_fields)
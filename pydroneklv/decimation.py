@@ -0,0 +1,147 @@
+# module to thin out a packet stream at ingest, deciding from the packet bytes before the CRC check and decoding
+from abc import ABC, abstractmethod
+
+from .decoder_map import UNIVERSAL_KEY as BYTES_UKEY
+from .decoder_map import klv_dispatch_table, circular_tags
+from .decoders import decode_length, decode_field
+from .packet_decoder import index_fields, read_timestamp, tags_set
+
+from typing import Any, Dict, Optional
+
+
+class Decimator(ABC):
+    """
+    policy deciding which packets of a stream are kept, from their undecoded bytes
+    keep(buf, offset) is called once per packet, in stream order, with the index of its universal key.
+    the CRC is not checked yet, a corrupted packet can be kept and then dropped by the decoder, and keep raises
+    when the bytes it reads are malformed, the caller then drops the packet or resyncs
+
+        decoder = StreamDecoder(decimation=FixedRate(5))
+    """
+
+    def __init__(self):
+        self.kept_packets = 0
+        self.dropped_packets = 0
+
+    def keep(self, buf: bytes, offset: int) -> bool:
+        if self._keep(buf, offset):
+            self.kept_packets += 1
+            return True
+        self.dropped_packets += 1
+        return False
+
+    @abstractmethod
+    def _keep(self, buf: bytes, offset: int) -> bool:
+        """True to keep the packet whose universal key is at offset"""
+
+    def reset(self) -> None:
+        """forgets the previous packets, the next one is kept"""
+
+
+class EveryNth(Decimator):
+    """keeps one packet out of n, starting with the first"""
+
+    def __init__(self, n: int):
+        super().__init__()
+        if n < 1:
+            raise ValueError(f'n must be at least 1, got {n}')
+        self.n = n
+        self._count = 0
+
+    def _keep(self, buf: bytes, offset: int) -> bool:
+        keep = self._count == 0
+        self._count = (self._count + 1) % self.n
+        return keep
+
+    def reset(self) -> None:
+        self._count = 0
+
+
+class FixedRate(Decimator):
+    """
+    keeps at most rate packets per second of stream time, the first packet of every 1 / rate seconds period
+    of the tag 2 timestamp, read where ST 0601 puts it without decoding the packet. the periods are aligned
+    to the UNIX epoch so every receiver of a feed keeps the same packets, at 30 Hz a 5 Hz rate keeps one packet
+    in six on average. packets without a timestamp are kept
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        if rate <= 0:
+            raise ValueError(f'rate must be positive, got {rate}')
+        self.rate = rate
+        self.period_us = 1e6 / rate
+        self._period: Optional[int] = None
+
+    def _keep(self, buf: bytes, offset: int) -> bool:
+        timestamp = read_timestamp(buf, offset)
+        if timestamp is None:
+            return True
+        period = int(timestamp // self.period_us)
+        if period == self._period:
+            return False
+        self._period = period
+        return True
+
+    def reset(self) -> None:
+        self._period = None
+
+
+class OnChange(Decimator):
+    """
+    keeps the packets where one of the watched tags changed significantly since the last packet kept
+    only the watched fields are located and decoded
+
+    thresholds   - tag -> smallest change of its value that counts, None for any change of its payload bytes.
+                   angles over a full turn are compared the short way around
+    max_interval - seconds of stream time after which a packet is kept even without a change, None for never
+    """
+
+    def __init__(self, thresholds: Dict[int, Optional[float]], max_interval: Optional[float] = None):
+        super().__init__()
+        self.thresholds = thresholds
+        self.tags = tags_set(thresholds)
+        self.max_interval_us = round(max_interval * 1e6) if max_interval is not None else None
+        self._payloads: Dict[int, bytes] = {}
+        self._values: Dict[int, Any] = {}
+        self._kept_time: Optional[int] = None
+        self._started = False
+
+    def _changed(self, tag: int, payload: bytes) -> bool:
+        threshold = self.thresholds[tag]
+        if tag not in self._payloads:
+            return True
+        if threshold is None:
+            return payload != self._payloads[tag]
+        value = klv_dispatch_table[tag].decode_func(payload)
+        difference = abs(value - self._values[tag])
+        if tag in circular_tags:
+            difference = min(difference, 360 - difference)
+        return difference >= threshold
+
+    def _keep(self, buf: bytes, offset: int) -> bool:
+        idx = offset + len(BYTES_UKEY)
+        n_length_bytes, payload_length = decode_length(buf, idx)
+        payload_start = idx + n_length_bytes
+        fields = index_fields(buf, payload_start, payload_start + payload_length, self.tags)
+        payloads = {tag: bytes(decode_field(buf, idx)[2]) for tag, idx in fields.items()}
+
+        timestamp = read_timestamp(buf, offset) if self.max_interval_us is not None else None
+        keep = not self._started or any(self._changed(tag, payload) for tag, payload in payloads.items()) or \
+            (timestamp is not None and (self._kept_time is None or
+                                        timestamp - self._kept_time >= self.max_interval_us))
+        if keep:
+            self._started = True
+            # changes are measured from the packets kept, so slow drifts add up until they count
+            self._payloads.update(payloads)
+            for tag, payload in payloads.items():
+                if self.thresholds[tag] is not None:
+                    self._values[tag] = klv_dispatch_table[tag].decode_func(payload)
+            self._kept_time = timestamp
+        return keep
+
+    def reset(self) -> None:
+        self._payloads.clear()
+        self._values.clear()
+        self._kept_time = None
+        self._started = False
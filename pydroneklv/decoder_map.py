@@ -1,5 +1,7 @@
-from typing import Dict, Optional, Callable, Any
+from collections import namedtuple
+from typing import Dict, List, Optional, Callable, Any
 from .decoders import *
+from .local_sets import decodeSecurityLocalSet, decodeVmtiLocalSet, decodeMiisCoreId
 
 # Universal key - 16 bytes
 ukey_hex = "060E2B34020B01010E01030101000000"
@@ -10,7 +12,7 @@ class PacketTypeData:
     def __init__(self,
                  tag: int,
                  description: str,
-                 decode_func: Callable = decode_passthrough,
+                 decode_func: Optional[Callable] = None,
                  input_type: str = '',
                  min_input_val: Optional[float] = None,
                  max_input_val: Optional[float] = None,
@@ -20,7 +22,8 @@ class PacketTypeData:
                  example_input_output_values: Optional[tuple] = None,
                  exact_input_size: Optional[int] = None,
                  min_input_size: Optional[int] = None,
-                 max_input_size: Optional[int] = None):
+                 max_input_size: Optional[int] = None,
+                 low_cardinality: bool = False):
         # min_val, max_val, negative_input_value, exact_input_size have to be offered together
         self.tag = tag
         self.description = description
@@ -35,18 +38,55 @@ class PacketTypeData:
         self.exact_input_size = exact_input_size
         self.min_input_size = min_input_size
         self.max_input_size = max_input_size
+        # the same few values repeat in almost every packet, their decoding can be cached (see DecodeCache)
+        self.low_cardinality = low_cardinality
 
         if self.example_input_output_values is not None:
             in_, out_ = self.example_input_output_values
             self.example_input_output_values = (in_.strip().replace(' ', ''), out_)
 
+        # precompiled struct and linear scaling coefficients, value = scale * int_value + offset
+        self.struct: Optional[struct.Struct] = None
+        self.scale: Optional[float] = None
+        self.offset: Optional[float] = None
+        if self.input_type in struct_formats:
+            self.struct = struct.Struct('>' + struct_formats[self.input_type])
+            if self.min_input_val is not None and self.max_input_val is not None and \
+               self.min_output_val is not None and self.max_output_val is not None:
+                in_range = self.max_input_val - self.min_input_val
+                self.scale = (self.max_output_val - self.min_output_val) / in_range
+                # written this way so that symmetric ranges get an offset of exactly zero
+                self.offset = (self.min_output_val * self.max_input_val -
+                               self.max_output_val * self.min_input_val) / in_range
+
+        if self.decode_func is None:
+            if self.scale is not None:
+                self.decode_func = mk_linear_decoder(self.struct.unpack, self.scale, self.offset)
+            elif self.struct is not None:
+                self.decode_func = mk_int_decoder(self.struct.unpack)
+            else:
+                self.decode_func = decode_passthrough
+
+        # decoder of the raw mode, integers as read from the payload without scaling and timestamps as UNIX
+        # microseconds, the other types decode as usual
+        if self.decode_func is decodeTimeStamp:
+            self.raw_decode_func = decode_timestamp_seconds
+        elif self.struct is not None:
+            self.raw_decode_func = mk_int_decoder(self.struct.unpack)
+        else:
+            self.raw_decode_func = self.decode_func
+
 
 klv_types_data: Dict[int, PacketTypeData] = {}
 
+# tag indexed table with an entry for every possible tag byte, tags without a registered type decode
+# as passthrough. decoding a field only takes klv_dispatch_table[tag].decode_func
+klv_dispatch_table: List[PacketTypeData] = [PacketTypeData(tag, "unknown") for tag in range(256)]
+
 
 def add_klv_type(tag: int,
                  description: str,
-                 decode_func: Callable[[bytes], Any] = decode_passthrough,
+                 decode_func: Optional[Callable[[bytes], Any]] = None,
                  input_type: str = '',
                  min_input_val: Optional[float] = None,
                  max_input_val: Optional[float] = None,
@@ -56,7 +96,8 @@ def add_klv_type(tag: int,
                  example_input_output_values: Optional[Tuple[str, Any]] = None,
                  exact_input_size: Optional[int] = None,
                  min_input_size: Optional[int] = None,
-                 max_input_size: Optional[int] = None):
+                 max_input_size: Optional[int] = None,
+                 low_cardinality: bool = False):
     packet_data = PacketTypeData(tag=tag,
                                  description=description,
                                  decode_func=decode_func,
@@ -69,20 +110,33 @@ def add_klv_type(tag: int,
                                  example_input_output_values=example_input_output_values,
                                  exact_input_size=exact_input_size,
                                  min_input_size=min_input_size,
-                                 max_input_size=max_input_size
+                                 max_input_size=max_input_size,
+                                 low_cardinality=low_cardinality
                                  )
     klv_types_data[tag] = packet_data
+    klv_dispatch_table[tag] = packet_data
     return packet_data
 
 
+add_klv_type(1, "Checksum",
+             input_type='uint16',
+             exact_input_size=2)
+
+
 add_klv_type(2, "UNIX Time Stamp", decodeTimeStamp,
              # standard documentation says this byte list corresponds to  2008/10/24 00:13:29.913
              example_input_output_values=('00 04 56 F4 A6 AA 4A A8', datetime.datetime(2008, 9, 15, 19, 57, 55, 29672)),
              exact_input_size=8)
 
-add_klv_type(3, "Mission ID", max_input_size=127)
+add_klv_type(3, "Mission ID", decodeString,
+             example_input_output_values=('4D 49 53 53 49 4F 4E 30 31', 'MISSION01'),
+             max_input_size=127,
+             low_cardinality=True)
 
-add_klv_type(4, "Platform Tail Number", max_input_size=127)
+add_klv_type(4, "Platform Tail Number", decodeString,
+             example_input_output_values=('41 46 2D 31 30 31', 'AF-101'),
+             max_input_size=127,
+             low_cardinality=True)
 
 add_klv_type(5, "Platform Heading Angle", decodePlatformHeadingAngle,
              input_type='uint16',
@@ -114,6 +168,41 @@ add_klv_type(7, "Platform Roll Angle", decodePlatformRollAngle,
              example_input_output_values=('08 B8', 3.405814),
              exact_input_size=2)
 
+add_klv_type(8, "Platform True Airspeed",
+             input_type='uint8',
+             min_input_val=0,
+             max_input_val=2 ** 8 - 1,
+             min_output_val=0.0,
+             max_output_val=255.0,
+             resolution=1.0,
+             example_input_output_values=('93', 147.0),
+             exact_input_size=1)
+
+add_klv_type(9, "Platform Indicated Airspeed",
+             input_type='uint8',
+             min_input_val=0,
+             max_input_val=2 ** 8 - 1,
+             min_output_val=0.0,
+             max_output_val=255.0,
+             resolution=1.0,
+             example_input_output_values=('9F', 159.0),
+             exact_input_size=1)
+
+add_klv_type(10, "Platform Designation", decodeString,
+             example_input_output_values=('4D 51 31 2D 42', 'MQ1-B'),
+             max_input_size=127,
+             low_cardinality=True)
+
+add_klv_type(11, "Image Source Sensor", decodeString,
+             example_input_output_values=('45 4F', 'EO'),
+             max_input_size=127,
+             low_cardinality=True)
+
+add_klv_type(12, "Image Coordinate System", decodeString,
+             example_input_output_values=('47 65 6F 64 65 74 69 63 20 57 47 53 38 34', 'Geodetic WGS84'),
+             max_input_size=127,
+             low_cardinality=True)
+
 add_klv_type(13, "Sensor latitude", decodeLatitude,
              input_type='int32',
              min_input_val=-(2 ** 31 - 1),
@@ -194,32 +283,594 @@ add_klv_type(20, "Sensor Relative Roll Angle", decodeSensorRelAngle,
              example_input_output_values=('7DC55ECE', 176.865437690572),
              exact_input_size=4)
 
-klv_types = {1: ("Checksum", None),
-             3: ("Mission ID", None),
-             4: ("Platform Tail Number", None),
-             10: ("Platform Designation", decodeString),
-             11: ("Image Source Sensor", decodeString),
-             12: ("Image Coordinate System", decodeString),
-             21: ("Slant range", decodeSlantRange),
-             22: ("Target width", decodeTargetWidth),
-             23: ("Frame center latitude", decodeLatitude),
-             24: ("Frame center longitude", decodeLongitude),
-             25: ("Frame center elevation", decodeAltitude),
-             26: ("Offset Corner Latitude Point 1", None),
-             27: ("Offset Corner Longitude Point 1", None),
-             28: ("Offset Corner Latitude Point 2", None),
-             29: ("Offset Corner Longitude Point 2", None),
-             30: ("Offset Corner Latitude Point 3", None),
-             31: ("Offset Corner Longitude Point 3", None),
-             32: ("Offset Corner Latitude Point 4", None),
-             33: ("Offset Corner Longitude Point 4", None),
-             40: ("Target Location Latitude", decodeLatitude),
-             41: ("Target Location Longitude", decodeLongitude),
-             42: ("Target Location Elevation", decodeAltitude),
-             43: ("Target Track Gate Width", None),
-             44: ("Target Track Gate Height", None),
-             48: ("Security Local Metadata Set", None),
-             65: ("UAS LDS version", decodeUasLdsVersion),
-             74: ("VMTI Data SetConversion", None),
-             94: ("MIIS Core Identifier", None),
-             }
+add_klv_type(21, "Slant range", decodeSlantRange,
+             input_type='uint32',
+             min_input_val=0,
+             max_input_val=2 ** 32 - 1,
+             min_output_val=0.0,
+             max_output_val=5000000.0,
+             resolution=1.2e-3,
+             example_input_output_values=('03 83 09 26', 68590.983),
+             exact_input_size=4)
+
+add_klv_type(22, "Target width", decodeTargetWidth,
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=0.0,
+             max_output_val=10000.0,
+             resolution=0.16,
+             example_input_output_values=('12 81', 722.8199),
+             exact_input_size=2)
+
+add_klv_type(23, "Frame center latitude", decodeLatitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-90.0,
+             max_output_val=+90.0,
+             resolution=42e-9,
+             example_input_output_values=('F1 01 A2 29', -10.5423886331461),
+             exact_input_size=4)
+
+add_klv_type(24, "Frame center longitude", decodeLongitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-180.0,
+             max_output_val=+180.0,
+             resolution=84e-9,
+             example_input_output_values=('14 BC 08 2B', 29.157890122923),
+             exact_input_size=4)
+
+add_klv_type(25, "Frame center elevation", decodeAltitude,
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=-900.0,
+             max_output_val=+19000.0,
+             resolution=0.3,
+             example_input_output_values=('34 F3', 3216.037),
+             exact_input_size=2)
+
+add_klv_type(26, "Offset Corner Latitude Point 1",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-0.075,
+             max_output_val=+0.075,
+             resolution=2.3e-6,
+             exact_input_size=2)
+
+add_klv_type(27, "Offset Corner Longitude Point 1",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-0.075,
+             max_output_val=+0.075,
+             resolution=2.3e-6,
+             exact_input_size=2)
+
+add_klv_type(28, "Offset Corner Latitude Point 2",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-0.075,
+             max_output_val=+0.075,
+             resolution=2.3e-6,
+             exact_input_size=2)
+
+add_klv_type(29, "Offset Corner Longitude Point 2",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-0.075,
+             max_output_val=+0.075,
+             resolution=2.3e-6,
+             exact_input_size=2)
+
+add_klv_type(30, "Offset Corner Latitude Point 3",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-0.075,
+             max_output_val=+0.075,
+             resolution=2.3e-6,
+             exact_input_size=2)
+
+add_klv_type(31, "Offset Corner Longitude Point 3",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-0.075,
+             max_output_val=+0.075,
+             resolution=2.3e-6,
+             exact_input_size=2)
+
+add_klv_type(32, "Offset Corner Latitude Point 4",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-0.075,
+             max_output_val=+0.075,
+             resolution=2.3e-6,
+             exact_input_size=2)
+
+add_klv_type(33, "Offset Corner Longitude Point 4",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-0.075,
+             max_output_val=+0.075,
+             resolution=2.3e-6,
+             exact_input_size=2)
+
+add_klv_type(34, "Icing Detected",
+             input_type='uint8',
+             exact_input_size=1)
+
+add_klv_type(35, "Wind Direction",
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=0.0,
+             max_output_val=360.0,
+             resolution=5.5e-3,
+             exact_input_size=2)
+
+add_klv_type(36, "Wind Speed",
+             input_type='uint8',
+             min_input_val=0,
+             max_input_val=2 ** 8 - 1,
+             min_output_val=0.0,
+             max_output_val=100.0,
+             resolution=0.4,
+             exact_input_size=1)
+
+add_klv_type(37, "Static Pressure",
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=0.0,
+             max_output_val=5000.0,
+             resolution=0.08,
+             exact_input_size=2)
+
+add_klv_type(38, "Density Altitude", decodeAltitude,
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=-900.0,
+             max_output_val=+19000.0,
+             resolution=0.3,
+             exact_input_size=2)
+
+add_klv_type(39, "Outside Air Temperature",
+             input_type='int8',
+             exact_input_size=1)
+
+add_klv_type(40, "Target Location Latitude", decodeLatitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-90.0,
+             max_output_val=+90.0,
+             resolution=42e-9,
+             exact_input_size=4)
+
+add_klv_type(41, "Target Location Longitude", decodeLongitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-180.0,
+             max_output_val=+180.0,
+             resolution=84e-9,
+             exact_input_size=4)
+
+add_klv_type(42, "Target Location Elevation", decodeAltitude,
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=-900.0,
+             max_output_val=+19000.0,
+             resolution=0.3,
+             exact_input_size=2)
+
+add_klv_type(43, "Target Track Gate Width",
+             input_type='uint8',
+             min_input_val=0,
+             max_input_val=2 ** 8 - 1,
+             min_output_val=0.0,
+             max_output_val=510.0,
+             resolution=2.0,
+             exact_input_size=1)
+
+add_klv_type(44, "Target Track Gate Height",
+             input_type='uint8',
+             min_input_val=0,
+             max_input_val=2 ** 8 - 1,
+             min_output_val=0.0,
+             max_output_val=510.0,
+             resolution=2.0,
+             exact_input_size=1)
+
+add_klv_type(45, "Target Error Estimate - CE90",
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=0.0,
+             max_output_val=4095.0,
+             resolution=0.0625,
+             exact_input_size=2)
+
+add_klv_type(46, "Target Error Estimate - LE90",
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=0.0,
+             max_output_val=4095.0,
+             resolution=0.0625,
+             exact_input_size=2)
+
+add_klv_type(47, "Generic Flag Data 01",
+             input_type='uint8',
+             exact_input_size=1)
+
+add_klv_type(48, "Security Local Metadata Set", decodeSecurityLocalSet,
+             low_cardinality=True)
+
+add_klv_type(49, "Differential Pressure",
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=0.0,
+             max_output_val=5000.0,
+             resolution=0.08,
+             exact_input_size=2)
+
+add_klv_type(50, "Platform Angle of Attack",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-20.0,
+             max_output_val=+20.0,
+             resolution=610e-6,
+             exact_input_size=2)
+
+add_klv_type(51, "Platform Vertical Speed",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-180.0,
+             max_output_val=+180.0,
+             resolution=5.5e-3,
+             exact_input_size=2)
+
+add_klv_type(52, "Platform Sideslip Angle",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-20.0,
+             max_output_val=+20.0,
+             resolution=610e-6,
+             exact_input_size=2)
+
+add_klv_type(53, "Airfield Barometric Pressure",
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=0.0,
+             max_output_val=5000.0,
+             resolution=0.08,
+             exact_input_size=2)
+
+add_klv_type(54, "Airfield Elevation", decodeAltitude,
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=-900.0,
+             max_output_val=+19000.0,
+             resolution=0.3,
+             exact_input_size=2)
+
+add_klv_type(55, "Relative Humidity",
+             input_type='uint8',
+             min_input_val=0,
+             max_input_val=2 ** 8 - 1,
+             min_output_val=0.0,
+             max_output_val=100.0,
+             resolution=0.4,
+             exact_input_size=1)
+
+add_klv_type(56, "Platform Ground Speed",
+             input_type='uint8',
+             min_input_val=0,
+             max_input_val=2 ** 8 - 1,
+             min_output_val=0.0,
+             max_output_val=255.0,
+             resolution=1.0,
+             exact_input_size=1)
+
+add_klv_type(57, "Ground Range", decodeSlantRange,
+             input_type='uint32',
+             min_input_val=0,
+             max_input_val=2 ** 32 - 1,
+             min_output_val=0.0,
+             max_output_val=5000000.0,
+             resolution=1.2e-3,
+             exact_input_size=4)
+
+add_klv_type(58, "Platform Fuel Remaining",
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=0.0,
+             max_output_val=10000.0,
+             resolution=0.16,
+             exact_input_size=2)
+
+add_klv_type(59, "Platform Call Sign", decodeString,
+             max_input_size=127,
+             low_cardinality=True)
+
+add_klv_type(60, "Weapon Load",
+             input_type='uint16',
+             exact_input_size=2)
+
+add_klv_type(61, "Weapon Fired",
+             input_type='uint8',
+             exact_input_size=1)
+
+add_klv_type(62, "Laser PRF Code",
+             input_type='uint16',
+             exact_input_size=2)
+
+add_klv_type(63, "Sensor Field of View Name",
+             input_type='uint8',
+             exact_input_size=1,
+             low_cardinality=True)
+
+add_klv_type(64, "Platform Magnetic Heading",
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=0.0,
+             max_output_val=360.0,
+             resolution=5.5e-3,
+             exact_input_size=2)
+
+add_klv_type(65, "UAS LDS version", decodeUasLdsVersion,
+             input_type='uint8',
+             example_input_output_values=('08', 8),
+             exact_input_size=1,
+             low_cardinality=True)
+
+add_klv_type(67, "Alternate Platform Latitude", decodeLatitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-90.0,
+             max_output_val=+90.0,
+             resolution=42e-9,
+             exact_input_size=4)
+
+add_klv_type(68, "Alternate Platform Longitude", decodeLongitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-180.0,
+             max_output_val=+180.0,
+             resolution=84e-9,
+             exact_input_size=4)
+
+add_klv_type(69, "Alternate Platform Altitude", decodeAltitude,
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=-900.0,
+             max_output_val=+19000.0,
+             resolution=0.3,
+             exact_input_size=2)
+
+add_klv_type(70, "Alternate Platform Name", decodeString,
+             max_input_size=127,
+             low_cardinality=True)
+
+add_klv_type(71, "Alternate Platform Heading",
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=0.0,
+             max_output_val=360.0,
+             resolution=5.5e-3,
+             exact_input_size=2)
+
+add_klv_type(72, "Event Start Time - UTC", decodeTimeStamp,
+             exact_input_size=8)
+
+add_klv_type(74, "VMTI Data Set", decodeVmtiLocalSet)
+
+add_klv_type(75, "Sensor Ellipsoid Height", decodeAltitude,
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=-900.0,
+             max_output_val=+19000.0,
+             resolution=0.3,
+             exact_input_size=2)
+
+add_klv_type(76, "Alternate Platform Ellipsoid Height", decodeAltitude,
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=-900.0,
+             max_output_val=+19000.0,
+             resolution=0.3,
+             exact_input_size=2)
+
+add_klv_type(77, "Operational Mode",
+             input_type='uint8',
+             exact_input_size=1,
+             low_cardinality=True)
+
+add_klv_type(78, "Frame Center Height Above Ellipsoid", decodeAltitude,
+             input_type='uint16',
+             min_input_val=0,
+             max_input_val=2 ** 16 - 1,
+             min_output_val=-900.0,
+             max_output_val=+19000.0,
+             resolution=0.3,
+             exact_input_size=2)
+
+add_klv_type(79, "Sensor North Velocity",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-327.0,
+             max_output_val=+327.0,
+             resolution=0.01,
+             exact_input_size=2)
+
+add_klv_type(80, "Sensor East Velocity",
+             input_type='int16',
+             min_input_val=-(2 ** 15 - 1),
+             max_input_val=2 ** 15 - 1,
+             min_output_val=-327.0,
+             max_output_val=+327.0,
+             resolution=0.01,
+             exact_input_size=2)
+
+add_klv_type(82, "Corner Latitude Point 1 (Full)", decodeLatitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-90.0,
+             max_output_val=+90.0,
+             resolution=42e-9,
+             exact_input_size=4)
+
+add_klv_type(83, "Corner Longitude Point 1 (Full)", decodeLongitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-180.0,
+             max_output_val=+180.0,
+             resolution=84e-9,
+             exact_input_size=4)
+
+add_klv_type(84, "Corner Latitude Point 2 (Full)", decodeLatitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-90.0,
+             max_output_val=+90.0,
+             resolution=42e-9,
+             exact_input_size=4)
+
+add_klv_type(85, "Corner Longitude Point 2 (Full)", decodeLongitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-180.0,
+             max_output_val=+180.0,
+             resolution=84e-9,
+             exact_input_size=4)
+
+add_klv_type(86, "Corner Latitude Point 3 (Full)", decodeLatitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-90.0,
+             max_output_val=+90.0,
+             resolution=42e-9,
+             exact_input_size=4)
+
+add_klv_type(87, "Corner Longitude Point 3 (Full)", decodeLongitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-180.0,
+             max_output_val=+180.0,
+             resolution=84e-9,
+             exact_input_size=4)
+
+add_klv_type(88, "Corner Latitude Point 4 (Full)", decodeLatitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-90.0,
+             max_output_val=+90.0,
+             resolution=42e-9,
+             exact_input_size=4)
+
+add_klv_type(89, "Corner Longitude Point 4 (Full)", decodeLongitude,
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-180.0,
+             max_output_val=+180.0,
+             resolution=84e-9,
+             exact_input_size=4)
+
+add_klv_type(90, "Platform Pitch Angle (Full)",
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-90.0,
+             max_output_val=+90.0,
+             resolution=42e-9,
+             exact_input_size=4)
+
+add_klv_type(91, "Platform Roll Angle (Full)",
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-90.0,
+             max_output_val=+90.0,
+             resolution=42e-9,
+             exact_input_size=4)
+
+add_klv_type(92, "Platform Angle of Attack (Full)",
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-90.0,
+             max_output_val=+90.0,
+             resolution=42e-9,
+             exact_input_size=4)
+
+add_klv_type(93, "Platform Sideslip Angle (Full)",
+             input_type='int32',
+             min_input_val=-(2 ** 31 - 1),
+             max_input_val=2 ** 31 - 1,
+             min_output_val=-180.0,
+             max_output_val=+180.0,
+             resolution=84e-9,
+             exact_input_size=4)
+
+add_klv_type(94, "MIIS Core Identifier", decodeMiisCoreId,
+             low_cardinality=True)
+
+# tags whose decoding is worth caching, see PacketTypeData.low_cardinality
+low_cardinality_tags = frozenset(tag for tag, type_data in klv_types_data.items() if type_data.low_cardinality)
+
+# angles whose output range is a full turn, they wrap around
+circular_tags = frozenset(tag for tag, type_data in klv_types_data.items()
+                          if type_data.scale is not None and type_data.max_output_val - type_data.min_output_val == 360)
+
+# linear scaling of the tags decoded as integers in raw mode, value = scale * raw_value + offset
+Scaling = namedtuple('Scaling', 'scale offset')
+scaling_table: Dict[int, Scaling] = {tag: Scaling(type_data.scale, type_data.offset)
+                                     for tag, type_data in klv_types_data.items() if type_data.scale is not None}
+
+
+# legacy map of tag -> (description, decode function), kept for code still using it
+klv_types = {tag: (type_data.description, type_data.decode_func) for tag, type_data in klv_types_data.items()}
+
+
+def scale_raw_value(tag: int, raw_value: Any) -> Any:
+    """value of a tag decoded in raw mode, in the units of the tag. works on numpy arrays of raw values too"""
+    scaling = scaling_table.get(tag)
+    if scaling is None:
+        return raw_value
+    return raw_value * scaling.scale + scaling.offset
@@ -1,10 +1,28 @@
 import datetime
 import struct
 
-from typing import Tuple
+from typing import Callable, Tuple, Union
 
 from .utils import *
 
+# struct format letters of the input types declared in the decoder map, all values are big endian
+struct_formats = {'uint8': 'B',
+                  'int8': 'b',
+                  'uint16': 'H',
+                  'int16': 'h',
+                  'uint32': 'I',
+                  'int32': 'i',
+                  'uint64': 'Q',
+                  'int64': 'q',
+                  }
+
+UINT8 = struct.Struct(">B")
+UINT16 = struct.Struct(">H")
+INT16 = struct.Struct(">h")
+UINT32 = struct.Struct(">I")
+INT32 = struct.Struct(">i")
+UINT64 = struct.Struct(">Q")
+
 
 def raiseLenError(payload, correct_length):
     if len(payload) != correct_length:
@@ -12,7 +30,7 @@ def raiseLenError(payload, correct_length):
 
 
 def decode_timestamp_seconds(buf: bytes) -> int:
-    return struct.unpack(">Q", buf)[0]
+    return UINT64.unpack(buf)[0]
 
 
 def decodeTimeStamp(buf):
@@ -30,84 +48,112 @@ def decodeTimeStamp(buf):
     return dt
 
 
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def to_microseconds(t: Union[int, datetime.datetime]) -> int:
+    """UNIX time in microseconds, naive datetimes are taken as UTC like decodeTimeStamp returns them"""
+    if isinstance(t, datetime.datetime):
+        if t.tzinfo is not None:
+            t = t.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return (t - _EPOCH) // datetime.timedelta(microseconds=1)
+    return t
+
+
 def decodePlatformHeadingAngle(buf: bytes) -> float:
     # tag 5, page 38
     raiseLenError(buf, 2)
-    uint16 = struct.unpack(">H", buf)[0]
+    uint16 = UINT16.unpack(buf)[0]
     return (360 / 65535) * uint16
 
 
 def decodePlatformPitchAngle(buf):
     # tag 6, page 40
     raiseLenError(buf, 2)
-    int16 = struct.unpack(">h", buf)[0]
+    int16 = INT16.unpack(buf)[0]
     return (40 / 65534) * int16
 
 
 def decodePlatformRollAngle(buf):
     # tag 7, page 42
     raiseLenError(buf, 2)
-    int16 = struct.unpack(">h", buf)[0]
+    int16 = INT16.unpack(buf)[0]
     return (100 / 65534) * int16
 
 
 def decodeString(buf):
-    return buf.decode("ascii")
+    # unlike bytes.decode, also takes a memoryview. bytes out of ASCII are replaced by U+FFFD rather than
+    # failing the whole packet, tags 3 and 4 were passed through as bytes before
+    return str(buf, "ascii", "replace")
 
 
 def decodeLatitude(buf):
     # tag 13, defined in page 52
     raiseLenError(buf, 4)
-    int32 = struct.unpack(">i", buf)[0]
+    int32 = INT32.unpack(buf)[0]
     return 180 / 0xFFFFFFFE * int32
 
 
 def decodeLongitude(buf: bytes) -> float:
     # tag 14, defined in page 53
     raiseLenError(buf, 4)
-    int32 = struct.unpack(">i", buf)[0]
+    int32 = INT32.unpack(buf)[0]
     return 360 / 0xFFFFFFFE * int32
 
 
 def decodeAltitude(buf: bytes) -> float:
     # tag 15, defined in page 54, example provided there is wrong
     raiseLenError(buf, 2)
-    uInt16 = struct.unpack(">H", buf)[0]
+    uInt16 = UINT16.unpack(buf)[0]
     return 19900 / 0xFFFF * uInt16 - 900
 
 
 def decodeSensorFOV(buf):
     # same convertion calculation for horizontal and vertical
-    uInt16 = struct.unpack(">H", buf)[0]
+    uInt16 = UINT16.unpack(buf)[0]
     return 180 / 0xFFFF * uInt16
 
 
 def decodeSensorRelAngle(buf):
     # same convertion calculation for azimuth, elevation and roll
     raiseLenError(buf, 4)
-    uInt32 = struct.unpack(">I", buf)[0]
+    uInt32 = UINT32.unpack(buf)[0]
     return 360 / 0xFFFFFFFF * uInt32
 
 
 def decodeSensorRelElevationAngle(buf):
     # same convertion calculation for azimuth, elevation and roll
     raiseLenError(buf, 4)
-    uInt32 = struct.unpack(">i", buf)[0]
+    uInt32 = INT32.unpack(buf)[0]
     return 360 / 0xFFFFFFFE * uInt32
 
 
 def decodeSlantRange(buf):
-    uInt32 = struct.unpack(">I", buf)[0]
+    uInt32 = UINT32.unpack(buf)[0]
     return 5000000 / 0xFFFFFFFF * uInt32
 
 
 def decodeTargetWidth(buf: bytes) -> object:
-    uInt16 = struct.unpack(">H", buf)[0]
+    uInt16 = UINT16.unpack(buf)[0]
     return 10000 / 0xFFFF * uInt16
 
 
 def decodeUasLdsVersion(buf):
-    return struct.unpack(">B", buf)[0]
+    return UINT8.unpack(buf)[0]
+
+
+def mk_int_decoder(unpack: Callable) -> Callable[[bytes], int]:
+    """decoder returning the integer unpacked from the payload, for flags, counters and enumerations"""
+    def decode_int(buf):
+        return unpack(buf)[0]
+    return decode_int
+
+
+def mk_linear_decoder(unpack: Callable, scale: float, offset: float) -> Callable[[bytes], float]:
+    """decoder mapping the integer unpacked from the payload linearly to the output range"""
+    def decode_linear(buf):
+        return unpack(buf)[0] * scale + offset
+    return decode_linear
 
 
 def checksum(packet):
@@ -128,8 +174,9 @@ def verifyCrc_old(p):
 
 
 def verify_crc(p: bytes, start_idx: int, size: int) -> bool:
+    """checks the CRC of the packet in p[start_idx:size], without copying it"""
     pkt_crc = (p[size - 2] << 8) + p[size - 1]
-    computed_crc = computeCrc(p[start_idx:size - 2])
+    computed_crc = word_sum(p, start_idx, size - 2) & 0xffff
     return pkt_crc == computed_crc
 
 
@@ -157,3 +204,24 @@ def decode_length(buf: bytes, idx: int = 0) -> Tuple[int, int]:
             klv_size += buf[idx+i]
             i += 1
         return 1 + n_size_bytes, klv_size  # the "1+" is for the first byte specifying how many length bytes exist
+
+
+def decode_field(buf: bytes, idx: int = 0) -> Tuple[int, int, bytes]:
+    """
+    receives a bytes-like buffer and the index to start decoding
+    assumes first bytes is tag number
+    following length encoded bytes
+    following payload bytes
+
+    returns a tuple of:
+    - number of bytes in the tag, including tag key, bytes encoding length and value bytes
+    - tag key
+    - value bytes, a view into buf when buf is a memoryview
+    """
+    tag = buf[idx]
+    n_tag_len_bytes, tag_len = decode_length(buf, idx + 1)
+
+    tag_payload_start = idx + 1 + n_tag_len_bytes  # +1 for tag byte
+    tag_payload = buf[tag_payload_start:tag_payload_start + tag_len]
+
+    return 1+n_tag_len_bytes+tag_len, tag, tag_payload
@@ -0,0 +1,90 @@
+# module to pass on only the fields of a packet that changed since the previous packet of the stream
+from .decoders import decode_timestamp_seconds
+from .packet_decoder import KlvPacket
+
+from typing import Dict, Optional, Tuple
+
+CHECKSUM_TAG = 1
+TIMESTAMP_TAG = 2
+
+
+class DeltaPacket(dict):
+    """dict of tag -> KlvField like decode_packet returns, keyframe is True when it holds every field"""
+    __slots__ = ('keyframe',)
+
+    def __init__(self, keyframe: bool):
+        super().__init__()
+        self.keyframe = keyframe
+
+
+class DeltaFilter:
+    """
+    turns the lazy packets of a stream into DeltaPackets holding only the fields whose payload bytes differ
+    from the last ones seen for their tag. payloads are compared before decoding, unchanged fields are
+    never decoded. a field missing from a packet is emitted again when it comes back. the checksum, different
+    in every packet, is only part of keyframes.
+
+    a keyframe with every field is emitted for the first packet, then every keyframe_interval packets and
+    every keyframe_seconds of stream time (tag 2 timestamps), whichever comes first. None disables either.
+
+        decoder = StreamDecoder(delta=DeltaFilter(keyframe_interval=100))
+    """
+
+    def __init__(self, keyframe_interval: Optional[int] = 100, keyframe_seconds: Optional[float] = None):
+        self.keyframe_interval = keyframe_interval
+        self.keyframe_us = round(keyframe_seconds * 1e6) if keyframe_seconds is not None else None
+        self._payloads: Dict[int, bytes] = {}  # last payload of every tag
+        self._n_since_keyframe: Optional[int] = None  # None until the first keyframe
+        self._keyframe_time: Optional[int] = None
+
+        self.emitted_fields = 0
+        self.skipped_fields = 0
+
+    def reset(self) -> None:
+        """forgets the previous packets, the next one is a keyframe"""
+        self._payloads.clear()
+        self._n_since_keyframe = None
+        self._keyframe_time = None
+
+    def _is_keyframe(self, packet: KlvPacket) -> Tuple[bool, Optional[int]]:
+        """whether packet is a keyframe, and its timestamp when it counts"""
+        timestamp = None
+        if self.keyframe_us is not None and TIMESTAMP_TAG in packet:
+            timestamp = decode_timestamp_seconds(packet.raw(TIMESTAMP_TAG))
+        keyframe = self._n_since_keyframe is None or \
+            (self.keyframe_interval is not None and self._n_since_keyframe >= self.keyframe_interval) or \
+            (timestamp is not None and (self._keyframe_time is None or
+                                        timestamp - self._keyframe_time >= self.keyframe_us))
+        return keyframe, timestamp
+
+    def update(self, packet: KlvPacket) -> DeltaPacket:
+        """
+        the fields of packet that changed since the previous packets, packet must be lazy
+        the filter is left unchanged when a field fails to decode, the packet is then dropped by the caller
+        """
+        keyframe, timestamp = self._is_keyframe(packet)
+        delta = DeltaPacket(keyframe)
+        payloads = self._payloads
+        changed = {}
+        skipped = 0
+        for tag in packet:
+            if tag == CHECKSUM_TAG and not keyframe:
+                continue
+            payload = packet.raw(tag)
+            if not keyframe and payloads.get(tag) == payload:
+                skipped += 1
+                continue
+            delta[tag] = packet[tag]
+            changed[tag] = bytes(payload)
+
+        # every field decoded, the packet is committed
+        if keyframe:
+            self._n_since_keyframe = 0
+            self._keyframe_time = timestamp
+        self._n_since_keyframe += 1
+        payloads.update(changed)
+        for tag in [tag for tag in payloads if tag not in packet]:
+            del payloads[tag]
+        self.emitted_fields += len(delta)
+        self.skipped_fields += skipped
+        return delta
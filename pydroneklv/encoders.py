@@ -1,25 +1,84 @@
 from .utils import *
+from .decoder_map import klv_dispatch_table, PacketTypeData, UNIVERSAL_KEY
+from .decoders import decodeString, decodeTimeStamp, to_microseconds, UINT64
 import struct
 
+from typing import Any, Callable, Dict
+
+CRC_HEADER = struct.pack(">BB", 1, 2)  # tag and length of the checksum field
 
-def encode_length(length: int) -> bytes:
-    # translate to bytes, padding zeros
-    length_hex = to_hex_padded(length)
 
-    is_longform = length >= 128
-    if not is_longform:
-        return bytes.fromhex(length_hex)
-    else:
-        first_byte = 0b10000000 | len(length_hex)
-        return bytes.fromhex(to_hex_padded(first_byte) + length_hex)
+def encode_length(length: int) -> bytes:
+    if length < 128:  # short form
+        return bytes((length,))
+    n_length_bytes = (length.bit_length() + 7) // 8
+    return bytes((0b10000000 | n_length_bytes,)) + length.to_bytes(n_length_bytes, 'big')
 
 
 def mk_crc_field(values: bytes) -> bytes:
-    tag_byte = struct.pack(">B", 1)
-    length_byte = struct.pack(">B", 2)
-    computed_crc = computeCrc(values + tag_byte + length_byte)
-    return tag_byte + length_byte + struct.pack(">H", computed_crc)
+    # tag and length bytes are part of the checksum
+    computed_crc = computeCrc(CRC_HEADER, computeCrc(values), len(values))
+    return CRC_HEADER + struct.pack(">H", computed_crc)
 
 
 def encode_field(tag: int, payload: bytes) -> bytes:
     return struct.pack('>B', tag) + encode_length(len(payload)) + payload
+
+
+def quantize(type_data: PacketTypeData, value: float) -> int:
+    """integer whose decoding is closest to value, clamped to the input range of the type"""
+    int_value = round((value - type_data.offset) / type_data.scale)
+    return int(min(max(int_value, type_data.min_input_val), type_data.max_input_val))
+
+
+def mk_linear_encoder(type_data: PacketTypeData) -> Callable[[float], bytes]:
+    pack = type_data.struct.pack
+
+    def encode_linear(value):
+        return pack(quantize(type_data, value))
+    return encode_linear
+
+
+def encode_timestamp(value) -> bytes:
+    """datetime, taken as UTC when naive, or UNIX time in microseconds"""
+    return UINT64.pack(to_microseconds(value))
+
+
+def encode_string(value: str) -> bytes:
+    return value.encode('ascii')
+
+
+def encode_passthrough(value: bytes) -> bytes:
+    return bytes(value)
+
+
+def mk_value_encoder(type_data: PacketTypeData) -> Callable[[Any], bytes]:
+    """inverse of the decoder of the type, value -> payload bytes"""
+    if type_data.decode_func is decodeTimeStamp:
+        return encode_timestamp
+    if type_data.decode_func is decodeString:
+        return encode_string
+    if type_data.scale is not None:
+        return mk_linear_encoder(type_data)
+    if type_data.struct is not None:
+        return type_data.struct.pack
+    return encode_passthrough
+
+
+# tag indexed like klv_dispatch_table
+klv_encoder_table = [mk_value_encoder(type_data) for type_data in klv_dispatch_table]
+
+
+def encode_value(tag: int, value: Any) -> bytes:
+    """field of the given tag holding value"""
+    return encode_field(tag, klv_encoder_table[tag](value))
+
+
+def encode_packet(values: Dict[int, Any]) -> bytes:
+    """
+    complete packet, universal key to checksum, with a field per item of values in their order
+    ST 0601 expects the timestamp (tag 2) first
+    """
+    payload = b''.join([encode_value(tag, value) for tag, value in values.items()])
+    packet = UNIVERSAL_KEY + encode_length(len(payload) + 4) + payload  # checksum field is 4 bytes
+    return bytes(packet + mk_crc_field(packet))
@@ -0,0 +1,149 @@
+# module to export decoded packets to columnar Parquet files, one column per tag
+from array import array
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from .decoder_map import klv_types_data, PacketTypeData
+from .decoders import decodeString, decodeTimeStamp, decode_timestamp_seconds
+
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024
+
+# arrow type and array typecode of the integer input types declared in the decoder map
+integer_column_types = {'uint8': (pa.uint8(), 'B'),
+                        'int8': (pa.int8(), 'b'),
+                        'uint16': (pa.uint16(), 'H'),
+                        'int16': (pa.int16(), 'h'),
+                        'uint32': (pa.uint32(), 'I'),
+                        'int32': (pa.int32(), 'i'),
+                        'uint64': (pa.uint64(), 'Q'),
+                        'int64': (pa.int64(), 'q'),
+                        }
+
+
+def column_name(tag: int) -> str:
+    return str(tag)
+
+
+class _Column:
+    """values of one tag for the rows of the current row group, in a typed buffer, and their validity"""
+
+    def __init__(self, type_data: PacketTypeData):
+        self.tag = type_data.tag
+        self.kind = 'object'
+        if type_data.decode_func is decodeTimeStamp:
+            # kept as UNIX microseconds read from the payload, no datetime is converted
+            self.kind, self.type, self.typecode = 'timestamp', pa.timestamp('us'), 'q'
+        elif type_data.scale is not None:
+            self.kind, self.type, self.typecode = 'number', pa.float64(), 'd'
+        elif type_data.input_type in integer_column_types:
+            self.kind = 'number'
+            self.type, self.typecode = integer_column_types[type_data.input_type]
+        elif type_data.decode_func is decodeString:
+            self.type = pa.string()
+        else:
+            self.type = pa.binary()
+        self.field = pa.field(column_name(self.tag), self.type,
+                              metadata={'description': type_data.description.strip()})
+        self.clear()
+
+    def clear(self) -> None:
+        self.values = array(self.typecode) if self.kind != 'object' else []
+        self.validity = bytearray()
+
+    def append(self, packet: Dict[int, Any]) -> None:
+        field = packet.get(self.tag)
+        if field is None:
+            self.values.append(0 if self.kind != 'object' else None)
+            self.validity.append(0)
+            return
+        if self.kind == 'timestamp':
+            self.values.append(decode_timestamp_seconds(field.bytes))
+        elif self.kind == 'number':
+            self.values.append(field.value)
+        else:
+            self.values.append(field.value if self.type == pa.string() else bytes(field.bytes))
+        self.validity.append(1)
+
+    def to_arrow(self) -> pa.Array:
+        if self.kind == 'object':
+            return pa.array(self.values, type=self.type)
+        n_rows = len(self.validity)
+        # the validity bytes become a bitmap through a vectorized comparison
+        validity = pa.Array.from_buffers(pa.uint8(), n_rows, [None, pa.py_buffer(self.validity)])
+        bitmap = pc.not_equal(validity, 0).buffers()[1]
+        return pa.Array.from_buffers(self.type, n_rows, [bitmap, pa.py_buffer(self.values)])
+
+
+class ColumnarWriter:
+    """
+    writes decoded packets to a Parquet file with one column per tag, missing fields are nulls
+    packets are appended to typed buffers and written as a row group every row_group_size packets, so memory
+    stays bounded whatever the number of packets
+
+        with ColumnarWriter('mission.parquet') as writer:
+            for packet in decode_file('mission.klv'):
+                writer.write(packet)
+
+    tags - columns to write, by default every tag of klv_types_data
+    """
+
+    def __init__(self, path: str, tags: Optional[Iterable[int]] = None,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE, compression: str = 'snappy'):
+        if tags is None:
+            tags = klv_types_data.keys()
+        self.columns = [_Column(klv_types_data[tag]) for tag in tags]
+        self.schema = pa.schema([column.field for column in self.columns])
+        self.row_group_size = row_group_size
+        self.n_rows = 0
+        self._n_buffered_rows = 0
+        self._writer = pq.ParquetWriter(path, self.schema, compression=compression)
+
+    def write(self, packet: Dict[int, Any]) -> None:
+        for column in self.columns:
+            column.append(packet)
+        self.n_rows += 1
+        self._n_buffered_rows += 1
+        if self._n_buffered_rows >= self.row_group_size:
+            self.flush()
+
+    def write_many(self, packets: Iterable[Dict[int, Any]]) -> None:
+        for packet in packets:
+            self.write(packet)
+
+    def flush(self) -> None:
+        """writes the buffered packets as a row group"""
+        if not self._n_buffered_rows:
+            return
+        table = pa.Table.from_arrays([column.to_arrow() for column in self.columns], schema=self.schema)
+        self._writer.write_table(table)
+        for column in self.columns:
+            column.clear()
+        self._n_buffered_rows = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self) -> 'ColumnarWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def export_packets(packets: Iterable[Dict[int, Any]], path: str, tags: Optional[Iterable[int]] = None,
+                   row_group_size: int = DEFAULT_ROW_GROUP_SIZE) -> int:
+    """writes packets to a Parquet file, see ColumnarWriter. returns the number of packets written"""
+    with ColumnarWriter(path, tags, row_group_size) as writer:
+        writer.write_many(packets)
+    return writer.n_rows
+
+
+def read_columns(path: str, tags: Optional[Iterable[int]] = None) -> pa.Table:
+    """loads an exported file, memory mapped, reading only the columns of the given tags"""
+    columns: Optional[List[str]] = [column_name(tag) for tag in tags] if tags is not None else None
+    return pq.read_table(path, columns=columns, memory_map=True)
@@ -0,0 +1,81 @@
+# module to compute the ground footprint of the frames of many packets at once, from the frame center
+# (tags 23-25) and the corner offsets (tags 26-33) or full corners (tags 82-89)
+import numpy as np
+
+from .batch_decoder import KlvBatch
+from .decoder_map import klv_dispatch_table
+
+EARTH_RADIUS = 6371008.8  # mean radius, meters
+
+FRAME_CENTER_TAGS = (23, 24, 25)  # latitude, longitude, elevation
+# (latitude, longitude) of the corners, upper left, upper right, lower right, lower left
+OFFSET_CORNER_TAGS = ((26, 27), (28, 29), (30, 31), (32, 33))
+FULL_CORNER_TAGS = ((82, 83), (84, 85), (86, 87), (88, 89))
+
+
+def tag_column(batch: KlvBatch, tag: int) -> np.ndarray:
+    """values of a tag as floats, NaN where missing or outside the tag range (the error indicators)"""
+    if tag not in batch:
+        return np.full(len(batch), np.nan)
+    values = np.where(batch.present[tag], batch[tag], np.nan)
+    type_data = klv_dispatch_table[tag]
+    if type_data.min_output_val is not None and type_data.max_output_val is not None:
+        values[(values < type_data.min_output_val) | (values > type_data.max_output_val)] = np.nan
+    return values
+
+
+class Footprints:
+    """
+    frame geometry of a batch of packets, NaN where it is unknown
+
+    center  - (n, 3) latitude, longitude and elevation of the frame center
+    corners - (n, 4, 2) latitude and longitude of the corners, upper left, upper right, lower right, lower left
+    valid   - (n,) True where the four corners are known
+    """
+
+    def __init__(self, center: np.ndarray, corners: np.ndarray):
+        self.center = center
+        self.corners = corners
+        self.valid = np.isfinite(corners).all(axis=(1, 2))
+
+    def __len__(self) -> int:
+        return len(self.center)
+
+    def polygons(self) -> np.ndarray:
+        """(n, 5, 2) closed rings of longitude, latitude like GeoJSON polygons"""
+        ring = self.corners[:, [0, 1, 2, 3, 0], ::-1]
+        return np.ascontiguousarray(ring)
+
+    def bounds(self) -> np.ndarray:
+        """(n, 4) minimum longitude, minimum latitude, maximum longitude, maximum latitude of each footprint
+        footprints across the antimeridian span every longitude in between"""
+        lat = self.corners[:, :, 0]
+        lon = self.corners[:, :, 1]
+        return np.stack([lon.min(axis=1), lat.min(axis=1), lon.max(axis=1), lat.max(axis=1)], axis=1)
+
+    def areas(self) -> np.ndarray:
+        """(n,) footprint areas in square meters, on a plane tangent to the earth at the frame center"""
+        lat0 = self.center[:, 0][:, None]
+        d_lon = (self.corners[:, :, 1] - self.center[:, 1][:, None] + 180) % 360 - 180  # across the antimeridian
+        x = EARTH_RADIUS * np.radians(d_lon) * np.cos(np.radians(lat0))
+        y = EARTH_RADIUS * np.radians(self.corners[:, :, 0] - lat0)
+        # shoelace formula over the four corners
+        return 0.5 * np.abs((x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(axis=1))
+
+
+def compute_footprints(batch: KlvBatch) -> Footprints:
+    """
+    footprints of the packets of a batch, see decode_batch. corners are the frame center plus the offset
+    corners, the full corners fill in the packets without offsets
+    """
+    center = np.stack([tag_column(batch, tag) for tag in FRAME_CENTER_TAGS], axis=1)
+    corners = np.empty((len(batch), 4, 2))
+    corner_tags = zip(OFFSET_CORNER_TAGS, FULL_CORNER_TAGS)
+    for i, ((lat_tag, lon_tag), (full_lat_tag, full_lon_tag)) in enumerate(corner_tags):
+        lat = center[:, 0] + tag_column(batch, lat_tag)
+        lon = center[:, 1] + tag_column(batch, lon_tag)
+        # the offsets are small enough that a corner past the antimeridian only needs one wrap
+        lon = np.where(lon > 180, lon - 360, np.where(lon < -180, lon + 360, lon))
+        corners[:, i, 0] = np.where(np.isnan(lat), tag_column(batch, full_lat_tag), lat)
+        corners[:, i, 1] = np.where(np.isnan(lon), tag_column(batch, full_lon_tag), lon)
+    return Footprints(center, corners)
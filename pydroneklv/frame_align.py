@@ -0,0 +1,246 @@
+# module to align the KLV packets of a MPEG-TS stream with its video frames by PTS, in a single pass
+import datetime
+import heapq
+from bisect import bisect_right
+from collections import deque, namedtuple
+
+from .decoder_map import klv_types_data, circular_tags
+from .stream_decoder import StreamDecoder
+from .ts_demuxer import TsDemuxer, PesPacket
+
+from typing import Any, Deque, Iterable, Iterator, List, Mapping, Optional
+
+PTS_MODULO = 2 ** 33  # pts are 33 bit counters of the 90 kHz clock
+PTS_CLOCK = 90000
+
+# PMT stream types of video streams: MPEG-1 and MPEG-2 video, MPEG-4 part 2, H.264, HEVC and VC-1
+VIDEO_STREAM_TYPES = frozenset({0x01, 0x02, 0x10, 0x1B, 0x24, 0xEA})
+
+# how a frame gets its packet among the KLV packets around its PTS
+NEAREST = 'nearest'  # the packet with the closest PTS
+PREVIOUS = 'previous'  # the last packet at or before the frame, the telemetry known when it was shown
+INTERPOLATE = 'interpolate'  # a packet interpolated between the packets before and after the frame
+ALIGN_METHODS = (NEAREST, PREVIOUS, INTERPOLATE)
+
+CHECKSUM_TAG = 1
+
+# pts - frame PTS, unwrapped past the 33 bit roll over
+# packet - KLV packet of the frame, None if there is none within max_distance
+# klv_pts - PTS of the KLV packet, None when it was interpolated or there is none
+AlignedFrame = namedtuple('AlignedFrame', "pts packet klv_pts")
+
+
+def interpolate_value(tag: int, before: Any, after: Any, weight: float) -> Optional[Any]:
+    """value between two values of a tag, None if the type can't be interpolated. angles go the short way around"""
+    if isinstance(before, float) and isinstance(after, float):
+        if tag in circular_tags:
+            type_data = klv_types_data[tag]
+            difference = (after - before + 180) % 360 - 180
+            return (before + weight * difference - type_data.min_output_val) % 360 + type_data.min_output_val
+        return before + weight * (after - before)
+    if isinstance(before, datetime.datetime) and isinstance(after, datetime.datetime):
+        return before + weight * (after - before)
+    return None
+
+
+def interpolate_packet(before: Mapping, after: Mapping, weight: float) -> dict:
+    """
+    packet between two packets, weight 0 gives before and 1 after. the numbers, angles and timestamps of the
+    tags found in both packets are interpolated linearly, the other fields are the ones of the nearest packet.
+    interpolated fields keep the name, len and bytes of the nearest packet
+    """
+    nearest, other = (before, after) if weight < 0.5 else (after, before)
+    packet = {}
+    for tag in nearest:
+        field = nearest[tag]
+        if tag != CHECKSUM_TAG and tag in other:
+            value = interpolate_value(tag, before[tag].value, after[tag].value, weight)
+            if value is not None:
+                field = field._replace(value=value)
+        packet[tag] = field
+    return packet
+
+
+class FrameAligner:
+    """
+    streaming merge-join of the video frames and KLV packets of a stream on their PTS
+    add_frame and add_klv are called in stream order and return the frames aligned so far, in PTS order.
+    a frame waits for the first KLV packet after it, or for being max_pending frames behind, so memory is
+    bounded by the pending frames and the KLV packets that can still match them
+
+    method        - see ALIGN_METHODS
+    max_distance  - frames further than this from their packets, in 90 kHz ticks, get no packet
+    reorder_depth - frames kept to put them back in PTS order, their PES come in decoding order with B-frames
+    max_pending   - frames waiting for the next KLV packet, the oldest is aligned without it beyond that
+    """
+
+    def __init__(self, method: str = NEAREST, max_distance: Optional[int] = None, reorder_depth: int = 4,
+                 max_pending: int = 256):
+        if method not in ALIGN_METHODS:
+            raise ValueError(f'method must be one of {ALIGN_METHODS}, got {method}')
+        self.method = method
+        self.max_distance = max_distance
+        self.reorder_depth = reorder_depth
+        self.max_pending = max_pending
+
+        self.frames = 0
+        self.unmatched_frames = 0
+
+        self._reorder: List[int] = []  # heap of the frames not yet in PTS order
+        self._pending: Deque[int] = deque()  # frames after the last KLV packet
+        self._klv_pts: List[int] = []  # KLV packets that can still be matched, in PTS order
+        self._klv_packets: List[Any] = []
+        self._last_pts: Optional[int] = None
+        self._last_frame_pts: Optional[int] = None
+        self._aligned_pts: Optional[int] = None
+
+    def _unwrap(self, pts: int) -> int:
+        """pts extended past the roll over, as close as possible to the previous one"""
+        if self._last_pts is not None:
+            pts += (self._last_pts - pts + PTS_MODULO // 2) // PTS_MODULO * PTS_MODULO
+        self._last_pts = pts
+        return pts
+
+    def add_frame(self, pts: int) -> List[AlignedFrame]:
+        pts = self._unwrap(pts)
+        self._last_frame_pts = pts
+        heapq.heappush(self._reorder, pts)
+        out = []
+        while len(self._reorder) > self.reorder_depth:
+            self._queue_frame(heapq.heappop(self._reorder), out)
+        return out
+
+    def add_klv(self, pts: Optional[int], packet: Any) -> List[AlignedFrame]:
+        """pts - of the PES carrying the packet, None to take the one of the last frame, as for asynchronous KLV"""
+        if pts is None:
+            if self._last_frame_pts is None:
+                return []
+            pts = self._last_frame_pts
+        else:
+            pts = self._unwrap(pts)
+        if self._klv_pts and pts < self._klv_pts[-1]:
+            i = bisect_right(self._klv_pts, pts)
+            self._klv_pts.insert(i, pts)
+            self._klv_packets.insert(i, packet)
+        else:
+            self._klv_pts.append(pts)
+            self._klv_packets.append(packet)
+
+        out = []
+        while self._pending and self._pending[0] <= pts:
+            out.append(self._align(self._pending.popleft()))
+        self._trim()
+        return out
+
+    def flush(self) -> List[AlignedFrame]:
+        """end of stream, aligns the remaining frames with the packets received"""
+        out = []
+        while self._reorder:
+            self._queue_frame(heapq.heappop(self._reorder), out)
+        while self._pending:
+            out.append(self._align(self._pending.popleft()))
+        return out
+
+    def _queue_frame(self, pts: int, out: List[AlignedFrame]) -> None:
+        if self._pending or not self._klv_pts or pts > self._klv_pts[-1]:
+            self._pending.append(pts)
+            if len(self._pending) > self.max_pending:
+                out.append(self._align(self._pending.popleft()))
+        else:
+            out.append(self._align(pts))
+            self._trim()
+
+    def _trim(self) -> None:
+        """drops the KLV packets before the last one at or before the last aligned frame, later frames can't
+        match them, and the oldest ones beyond max_pending"""
+        n_dropped = len(self._klv_pts) - self.max_pending
+        if self._aligned_pts is not None:
+            n_dropped = max(n_dropped, bisect_right(self._klv_pts, self._aligned_pts) - 1)
+        if n_dropped > 0:
+            del self._klv_pts[:n_dropped]
+            del self._klv_packets[:n_dropped]
+
+    def _within(self, pts: int, i: Optional[int]) -> bool:
+        return i is not None and (self.max_distance is None or abs(self._klv_pts[i] - pts) <= self.max_distance)
+
+    def _align(self, pts: int) -> AlignedFrame:
+        self.frames += 1
+        self._aligned_pts = pts if self._aligned_pts is None else max(pts, self._aligned_pts)
+        i = bisect_right(self._klv_pts, pts)
+        before = i - 1 if i > 0 and self._within(pts, i - 1) else None
+        after = i if i < len(self._klv_pts) and self._within(pts, i) else None
+
+        if self.method == INTERPOLATE and before is not None and after is not None and \
+           self._klv_pts[before] != pts:
+            weight = (pts - self._klv_pts[before]) / (self._klv_pts[after] - self._klv_pts[before])
+            packet = interpolate_packet(self._klv_packets[before], self._klv_packets[after], weight)
+            return AlignedFrame(pts, packet, None)
+
+        if self.method == PREVIOUS:
+            match = before
+        elif before is None or after is None:
+            match = before if after is None else after
+        else:
+            match = before if pts - self._klv_pts[before] <= self._klv_pts[after] - pts else after
+        if match is None:
+            self.unmatched_frames += 1
+            return AlignedFrame(pts, None, None)
+        return AlignedFrame(pts, self._klv_packets[match], self._klv_pts[match])
+
+
+class TsFrameAligner:
+    """
+    aligns the KLV packets of MPEG-TS bytes with the frames of its video stream, see FrameAligner
+    bytes are given in chunks of any size with feed(), each video PES packet is a frame and the KLV packets
+    take the PTS of the PES carrying them
+    klv_pid - PID of the KLV stream, found in the PMT if not given
+    video_pid - PID of the video stream, the first video stream listed in the PMT if not given
+    decoder_kwargs - StreamDecoder options
+    """
+
+    def __init__(self, klv_pid: Optional[int] = None, video_pid: Optional[int] = None, method: str = NEAREST,
+                 max_distance: Optional[int] = None, reorder_depth: int = 4, max_pending: int = 256,
+                 **decoder_kwargs):
+        # only the PES headers of the video are read, its frames are not reassembled
+        if video_pid is None:
+            self.demuxer = TsDemuxer(klv_pid, header_stream_types=VIDEO_STREAM_TYPES)
+        else:
+            self.demuxer = TsDemuxer(klv_pid, header_pids=[video_pid])
+        self.video_pid = video_pid
+        self.decoder = StreamDecoder(**decoder_kwargs)
+        self.aligner = FrameAligner(method, max_distance, reorder_depth, max_pending)
+
+    def _align(self, pes_packets: List[PesPacket]) -> List[AlignedFrame]:
+        out = []
+        for pes in pes_packets:
+            if pes.pid == self.demuxer.klv_pid:
+                for packet in self.decoder.feed(pes.payload):
+                    out += self.aligner.add_klv(pes.pts, packet)
+                continue
+            if self.video_pid is None and self.demuxer.streams.get(pes.pid) in VIDEO_STREAM_TYPES:
+                self.video_pid = pes.pid
+            if pes.pid == self.video_pid and pes.pts is not None:
+                out += self.aligner.add_frame(pes.pts)
+        return out
+
+    def feed(self, chunk: bytes) -> List[AlignedFrame]:
+        return self._align(self.demuxer.feed(chunk))
+
+    def flush(self) -> List[AlignedFrame]:
+        return self._align(self.demuxer.flush()) + self.aligner.flush()
+
+
+def align_ts_file(path: str, read_size: int = 2 ** 20, klv_pid: Optional[int] = None,
+                  video_pid: Optional[int] = None, method: str = NEAREST, max_distance: Optional[int] = None,
+                  tags: Optional[Iterable[int]] = None, check_crc: bool = True) -> Iterator[AlignedFrame]:
+    """yields the video frames of a MPEG-TS recording with their KLV packets, read read_size bytes at a time
+    tags, check_crc - see decode_packet
+    """
+    aligner = TsFrameAligner(klv_pid, video_pid, method, max_distance, tags=tags, check_crc=check_crc)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(read_size)
+            if not chunk:
+                break
+            yield from aligner.feed(chunk)
+    yield from aligner.flush()
@@ -0,0 +1,246 @@
+# module to decode the sets nested in a ST 0601 packet: the Security Local Set (tag 48, ST 0102), the VMTI
+# Local Set (tag 74, ST 0903) and the MIIS Core Identifier (tag 94, ST 1204). decoding is lazy, the packet
+# decode only wraps the payload, the nested fields are parsed the first time they are read
+import uuid
+from collections import namedtuple
+from collections.abc import Mapping
+
+from .decoders import decode_field, decode_length, decodeString, decode_passthrough
+
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+NestedType = namedtuple('NestedType', "name decode_func")
+
+
+def decode_uint(buf: bytes) -> int:
+    """unsigned integer of any number of bytes, the VMTI sets shorten integers to their significant bytes"""
+    return int.from_bytes(buf, 'big')
+
+
+def decode_ber_oid(buf: bytes, idx: int = 0) -> Tuple[int, int]:
+    """BER-OID integer at buf[idx], 7 bits per byte and a high bit set on every byte but the last
+    returns the number of bytes read and the integer
+    """
+    value = 0
+    i = idx
+    while True:
+        byte = buf[i]
+        value = (value << 7) | (byte & 0x7f)
+        i += 1
+        if not byte & 0x80:
+            return i - idx, value
+
+
+class LocalSet(Mapping):
+    """
+    read only mapping of tag -> decoded value of a nested local set. the payload is only split into its
+    fields the first time the set is read, a field is only decoded the first time it is read. tags missing
+    from types are left as bytes. bytes(local_set) gives back the payload
+    """
+    __slots__ = ('_buf', '_fields', '_values')
+    types: Dict[int, NestedType] = {}
+
+    def __init__(self, buf: bytes):
+        self._buf = buf
+        self._fields: Optional[Dict[int, bytes]] = None
+        self._values: Dict[int, object] = {}
+
+    def _index(self) -> Dict[int, bytes]:
+        if self._fields is None:
+            fields = {}
+            buf = self._buf
+            idx = 0
+            while idx < len(buf):
+                n_bytes, tag, payload = decode_field(buf, idx)
+                fields[tag] = payload
+                idx += n_bytes
+            self._fields = fields
+        return self._fields
+
+    def __getitem__(self, tag: int):
+        if tag in self._values:
+            return self._values[tag]
+        payload = self._index()[tag]
+        type_data = self.types.get(tag)
+        value = type_data.decode_func(payload) if type_data is not None else payload
+        self._values[tag] = value
+        return value
+
+    def __contains__(self, tag: object) -> bool:
+        return tag in self._index()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._index())
+
+    def __len__(self) -> int:
+        return len(self._index())
+
+    def __bytes__(self) -> bytes:
+        return bytes(self._buf)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)})"
+
+    def raw(self, tag: int) -> bytes:
+        """payload of a field, without decoding it"""
+        return self._index()[tag]
+
+    def name(self, tag: int) -> str:
+        type_data = self.types.get(tag)
+        return type_data.name if type_data is not None else 'unknown'
+
+
+class SecurityLocalSet(LocalSet):
+    """ST 0102 Security Metadata Local Set, tag 48"""
+    __slots__ = ()
+    types = {1: NestedType("Security Classification", decode_uint),
+             2: NestedType("Classifying Country and Releasing Instructions Country Coding Method", decode_uint),
+             3: NestedType("Classifying Country", decodeString),
+             4: NestedType("Security-SCI/SHI information", decodeString),
+             5: NestedType("Caveats", decodeString),
+             6: NestedType("Releasing Instructions", decodeString),
+             7: NestedType("Classified By", decodeString),
+             8: NestedType("Derived From", decodeString),
+             9: NestedType("Classification Reason", decodeString),
+             10: NestedType("Declassification Date", decodeString),
+             11: NestedType("Classification and Marking System", decodeString),
+             12: NestedType("Object Country Coding Method", decode_uint),
+             13: NestedType("Object Country Codes", decode_passthrough),  # UTF-16 or ASCII depending on version
+             14: NestedType("Classification Comments", decodeString),
+             15: NestedType("UMID", decode_passthrough),
+             16: NestedType("Stream ID", decode_uint),
+             17: NestedType("Transport Stream ID", decode_uint),
+             21: NestedType("Item Designator ID", decode_passthrough),
+             22: NestedType("Version", decode_uint),
+             23: NestedType("Classifying Country and Releasing Instructions Country Coding Method Version Date",
+                            decodeString),
+             24: NestedType("Object Country Coding Method Version Date", decodeString),
+             }
+
+
+class VTarget(LocalSet):
+    """ST 0903 VTarget Pack, a target of the VMTI set: its id and a local set of its properties
+    bytes() gives the properties, without the target id"""
+    __slots__ = ('target_id',)
+    types = {1: NestedType("Target Centroid Pixel Number", decode_uint),
+             2: NestedType("Boundary Top Left Pixel Number", decode_uint),
+             3: NestedType("Boundary Bottom Right Pixel Number", decode_uint),
+             4: NestedType("Target Priority", decode_uint),
+             5: NestedType("Target Confidence Level", decode_uint),
+             6: NestedType("Target History", decode_uint),
+             7: NestedType("Percentage of Target Pixels", decode_uint),
+             8: NestedType("Target Color", decode_uint),
+             9: NestedType("Target Intensity", decode_uint),
+             19: NestedType("Centroid Pixel Row", decode_uint),
+             20: NestedType("Centroid Pixel Column", decode_uint),
+             22: NestedType("Algorithm ID", decode_uint),
+             }
+
+    def __init__(self, buf: bytes):
+        n_id_bytes, self.target_id = decode_ber_oid(buf)
+        super().__init__(buf[n_id_bytes:])
+
+    def __repr__(self) -> str:
+        return f"VTarget(target_id={self.target_id}, {dict(self)})"
+
+
+class VTargetSeries:
+    """
+    ST 0903 VTarget Series, the targets of the VMTI set, walked only when iterated. each target is a VTarget
+    preceded by its BER length
+    """
+    __slots__ = ('_buf',)
+
+    def __init__(self, buf: bytes):
+        self._buf = buf
+
+    def _spans(self) -> Iterator[Tuple[int, int]]:
+        buf = self._buf
+        idx = 0
+        while idx < len(buf):
+            n_length_bytes, length = decode_length(buf, idx)
+            idx += n_length_bytes
+            yield idx, idx + length
+            idx += length
+
+    def __iter__(self) -> Iterator[VTarget]:
+        for start, end in self._spans():
+            yield VTarget(self._buf[start:end])
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._spans())
+
+    def __bytes__(self) -> bytes:
+        return bytes(self._buf)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, VTargetSeries) and bytes(self) == bytes(other)
+
+    def __hash__(self) -> int:
+        return hash(bytes(self))
+
+    def __repr__(self) -> str:
+        return f"VTargetSeries({list(self)})"
+
+
+class VmtiLocalSet(LocalSet):
+    """ST 0903 Video Moving Target Indicator Local Set, tag 74. targets iterates over its VTarget Series"""
+    __slots__ = ()
+    types = {1: NestedType("Checksum", decode_uint),
+             2: NestedType("Precision Time Stamp", decode_uint),
+             3: NestedType("VMTI System Name", decodeString),
+             4: NestedType("VMTI LS Version Number", decode_uint),
+             5: NestedType("Total Number of Targets Detected", decode_uint),
+             6: NestedType("Number of Reported Targets", decode_uint),
+             7: NestedType("Motion Imagery Frame Number", decode_uint),
+             8: NestedType("Frame Width", decode_uint),
+             9: NestedType("Frame Height", decode_uint),
+             10: NestedType("VMTI Source Sensor", decodeString),
+             13: NestedType("MIIS ID", decode_passthrough),
+             101: NestedType("VTarget Series", VTargetSeries),
+             }
+
+    @property
+    def targets(self) -> VTargetSeries:
+        return self[101] if 101 in self else VTargetSeries(b'')
+
+
+class MiisCoreId:
+    """
+    ST 1204 MIIS Core Identifier, tag 94. it is a binary structure rather than a local set: a version
+    byte, a usage byte whose bits tell which identifiers follow, then the 16 byte identifiers (UUIDs)
+    """
+    __slots__ = ('_buf',)
+
+    def __init__(self, buf: bytes):
+        self._buf = buf
+
+    @property
+    def version(self) -> int:
+        return self._buf[0]
+
+    @property
+    def usage(self) -> int:
+        return self._buf[1]
+
+    @property
+    def identifiers(self) -> List[uuid.UUID]:
+        """the identifiers in payload order, their meaning is given by the usage bits"""
+        return [uuid.UUID(bytes=bytes(self._buf[i:i + 16])) for i in range(2, len(self._buf) - 15, 16)]
+
+    def __bytes__(self) -> bytes:
+        return bytes(self._buf)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, MiisCoreId) and bytes(self) == bytes(other)
+
+    def __hash__(self) -> int:
+        return hash(bytes(self))
+
+    def __repr__(self) -> str:
+        return f"MiisCoreId(version={self.version}, usage={self.usage:#04x}, identifiers={self.identifiers})"
+
+
+decodeSecurityLocalSet: Callable[[bytes], SecurityLocalSet] = SecurityLocalSet
+decodeVmtiLocalSet: Callable[[bytes], VmtiLocalSet] = VmtiLocalSet
+decodeMiisCoreId: Callable[[bytes], MiisCoreId] = MiisCoreId
@@ -0,0 +1,160 @@
+# module to count the packets, bytes and errors of a decoder and time its decoding
+import time
+from collections import defaultdict
+
+from .errors import *
+from .packet_decoder import decode_packet, DecodeCache
+
+from typing import Any, Dict, Optional
+
+N_BUCKETS = 64
+
+
+class Histogram:
+    """
+    counts of durations in nanoseconds, in power of two buckets: bucket i holds the durations d with
+    2 ** (i - 1) <= d < 2 ** i, bucket 0 the zero durations
+    """
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0
+
+    def add(self, duration_ns: int) -> None:
+        self.counts[min(duration_ns.bit_length(), N_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += duration_ns
+
+    def merge(self, other: 'Histogram') -> None:
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q: float) -> Optional[int]:
+        """upper bound of the bucket holding the q quantile, None if empty"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return 2 ** i
+        return 2 ** (N_BUCKETS - 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'count': self.count,
+                'mean_ns': self.total / self.count if self.count else None,
+                'p50_ns': self.quantile(0.5),
+                'p99_ns': self.quantile(0.99),
+                'buckets': {2 ** i: n for i, n in enumerate(self.counts) if n},  # upper bound -> count
+                }
+
+
+class DecodeMetrics:
+    """
+    counters of a decoder, given to StreamDecoder, TsKlvDecoder or decode_from_ts_stream with their metrics
+    argument. decoders without metrics don't pay for them. snapshot() returns the counters and the rates as
+    a JSON serializable dict, to poll them from a long running receiver
+
+    tag_timing - record the decode time of every field per tag, decoding each field separately
+    """
+
+    def __init__(self, tag_timing: bool = False):
+        self.tag_timing = tag_timing
+        self.packets = 0
+        self.bytes = 0
+        self.crc_errors = 0
+        self.too_small_errors = 0  # ByteArrayTooSmall
+        self.key_not_found_errors = 0  # UniversalKeyNotFound
+        self.decode_errors = 0  # fields that could not be decoded
+        self.tag_decode_times: Dict[int, Histogram] = defaultdict(Histogram)
+        self.latency = Histogram()  # start of the demux of the packet bytes to decoded packet
+
+        self.start_time = time.monotonic()
+        self._last_snapshot = (self.start_time, 0, 0)
+
+    def add_error(self, exc: Exception) -> None:
+        if isinstance(exc, CRCError):
+            self.crc_errors += 1
+        elif isinstance(exc, ByteArrayTooSmall):
+            self.too_small_errors += 1
+        elif isinstance(exc, UniversalKeyNotFound):
+            self.key_not_found_errors += 1
+        else:
+            self.decode_errors += 1
+
+    def add_packet(self, n_bytes: int) -> None:
+        self.packets += 1
+        self.bytes += n_bytes
+
+    def add_latency(self, demux_time_ns: int) -> None:
+        """demux_time_ns - time.perf_counter_ns() when the demux of the bytes of the decoded packet started"""
+        self.latency.add(time.perf_counter_ns() - demux_time_ns)
+
+    def decode(self, buf: bytes, start_index: int = 0, lazy: bool = False, copy: bool = True,
+               tags=None, check_crc: bool = True, cache: Optional[DecodeCache] = None, raw: bool = False):
+        """decode_packet, counting the packet or its error, the error is raised again"""
+        try:
+            if self.tag_timing and not lazy:
+                packet = self._decode_timed(buf, start_index, copy, tags, check_crc, cache, raw)
+            else:
+                packet = decode_packet(buf, start_index, lazy, copy, tags, check_crc, cache, raw)
+        except Exception as e:
+            self.add_error(e)
+            raise
+        self.add_packet(len(buf) - start_index)
+        return packet
+
+    def _decode_timed(self, buf: bytes, start_index: int, copy: bool, tags, check_crc: bool,
+                      cache: Optional[DecodeCache], raw: bool) -> dict:
+        # the lazy packet decodes each field on access, which is timed. the result is the eager one
+        if cache is not None and cache.raw != raw:
+            raise ValueError(f'cache decodes with raw={cache.raw}, the packet with raw={raw}')
+        lazy_packet = decode_packet(buf, start_index, lazy=True, copy=copy, tags=tags, check_crc=check_crc, raw=raw)
+        packet = {}
+        perf_counter_ns = time.perf_counter_ns
+        for tag in lazy_packet:
+            start = perf_counter_ns()
+            if cache is not None and tag in cache.tags:
+                packet[tag] = cache.field(tag, lazy_packet.raw(tag))
+            else:
+                packet[tag] = lazy_packet[tag]
+            self.tag_decode_times[tag].add(perf_counter_ns() - start)
+        return packet
+
+    def merge(self, other: 'DecodeMetrics') -> None:
+        """adds the counters of other, the metrics of another decoder or process"""
+        self.packets += other.packets
+        self.bytes += other.bytes
+        self.crc_errors += other.crc_errors
+        self.too_small_errors += other.too_small_errors
+        self.key_not_found_errors += other.key_not_found_errors
+        self.decode_errors += other.decode_errors
+        self.latency.merge(other.latency)
+        for tag, histogram in other.tag_decode_times.items():
+            self.tag_decode_times[tag].merge(histogram)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """counters, with the rates since the previous snapshot and since the start"""
+        now = time.monotonic()
+        last_time, last_packets, last_bytes = self._last_snapshot
+        self._last_snapshot = (now, self.packets, self.bytes)
+        interval = max(now - last_time, 1e-9)
+        elapsed = max(now - self.start_time, 1e-9)
+        return {'packets': self.packets,
+                'bytes': self.bytes,
+                'packets_per_s': (self.packets - last_packets) / interval,
+                'bytes_per_s': (self.bytes - last_bytes) / interval,
+                'mean_packets_per_s': self.packets / elapsed,
+                'mean_bytes_per_s': self.bytes / elapsed,
+                'crc_errors': self.crc_errors,
+                'too_small_errors': self.too_small_errors,
+                'key_not_found_errors': self.key_not_found_errors,
+                'decode_errors': self.decode_errors,
+                'latency': self.latency.to_dict(),
+                'tag_decode_times': {tag: h.to_dict() for tag, h in sorted(self.tag_decode_times.items())},
+                }
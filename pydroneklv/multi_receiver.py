@@ -0,0 +1,150 @@
+# module to receive KLV packets from many UDP feeds in a single thread, waiting on all the sockets at once
+import selectors
+import socket
+import time
+from collections import namedtuple
+
+from .decimation import Decimator
+from .stream_decoder import StreamDecoder
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+MAX_DATAGRAM_SIZE = 65535
+
+FeedPacket = namedtuple('FeedPacket', "feed packet")  # name of the feed the packet came from, decoded packet
+
+
+class Feed:
+    """a UDP socket and the decoder reassembling its stream, with its counters"""
+
+    def __init__(self, name: str, sock: socket.socket, decoder: Any):
+        self.name = name
+        self.socket = sock
+        self.decoder = decoder
+        self.datagrams = 0
+        self.bytes = 0
+        self.packets = 0
+        self.socket_errors = 0
+        self.last_packet_time: Optional[float] = None
+
+    @property
+    def local_address(self) -> Tuple[str, int]:
+        return self.socket.getsockname()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {'datagrams': self.datagrams,
+                 'bytes': self.bytes,
+                 'packets': self.packets,
+                 'socket_errors': self.socket_errors,
+                 'last_packet_time': self.last_packet_time,
+                 }
+        # the StreamDecoder counters, also when it is wrapped by a TsKlvDecoder
+        stream_decoder = getattr(self.decoder, 'decoder', self.decoder)
+        for counter in ('crc_errors', 'decode_errors', 'skipped_bytes'):
+            if hasattr(stream_decoder, counter):
+                stats[counter] = getattr(stream_decoder, counter)
+        demuxer = getattr(self.decoder, 'demuxer', None)
+        if demuxer is not None:
+            stats['sync_losses'] = demuxer.sync_losses
+        metrics = getattr(self.decoder, 'metrics', None)
+        if metrics is not None:
+            stats['metrics'] = metrics.snapshot()
+        return stats
+
+
+class MultiFeedReceiver:
+    """
+    receives KLV streams on many UDP sockets in one thread, each feed with its own decoder so packets
+    are reassembled per feed. packets are returned as FeedPackets naming their feed
+
+        with MultiFeedReceiver(decoder_factory=TsKlvDecoder) as receiver:
+            receiver.add_feed('uav1', '0.0.0.0', 20001)
+            receiver.add_feed('uav2', '0.0.0.0', 20002)
+            for feed, packet in receiver:
+                ...
+
+    decoder_factory - creates the decoder of a feed, any object with a feed(bytes) method returning the
+                      completed packets, StreamDecoder by default
+    max_datagrams   - datagrams read from one socket per poll, so a busy feed can't starve the others
+    """
+
+    def __init__(self, decoder_factory: Callable[[], Any] = StreamDecoder, max_datagrams: int = 64):
+        self.decoder_factory = decoder_factory
+        self.max_datagrams = max_datagrams
+        self.feeds: Dict[str, Feed] = {}
+        self._selector = selectors.DefaultSelector()
+
+    def add_feed(self, name: str, host: str, port: int, decoder: Optional[Any] = None,
+                 decimation: Optional[Decimator] = None) -> Feed:
+        """
+        listens on host:port, port 0 picks a free port (see Feed.local_address)
+        decimation - Decimator of this feed, passed to decoder_factory as its decimation keyword
+        """
+        if name in self.feeds:
+            raise ValueError(f'feed {name} already exists')
+        if decoder is not None and decimation is not None:
+            raise ValueError('decimation is an option of the decoder_factory, give it to the decoder instead')
+        if decoder is None:
+            decoder = self.decoder_factory(decimation=decimation) if decimation is not None else self.decoder_factory()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setblocking(False)
+            sock.bind((host, port))
+        except OSError:
+            sock.close()
+            raise
+        feed = Feed(name, sock, decoder)
+        self.feeds[name] = feed
+        self._selector.register(sock, selectors.EVENT_READ, feed)
+        return feed
+
+    def remove_feed(self, name: str) -> None:
+        feed = self.feeds.pop(name)
+        self._selector.unregister(feed.socket)
+        feed.socket.close()
+
+    def poll(self, timeout: Optional[float] = None) -> List[FeedPacket]:
+        """
+        waits up to timeout seconds (None for ever) for datagrams on any feed
+        returns the packets completed by the datagrams read, possibly none
+        """
+        packets = []
+        if not self.feeds:
+            return packets
+        for key, _ in self._selector.select(timeout):
+            feed: Feed = key.data
+            for _ in range(self.max_datagrams):
+                try:
+                    data = feed.socket.recv(MAX_DATAGRAM_SIZE)
+                except BlockingIOError:
+                    break
+                except OSError:
+                    feed.socket_errors += 1
+                    break
+                feed.datagrams += 1
+                feed.bytes += len(data)
+                decoded = feed.decoder.feed(data)
+                if decoded:
+                    feed.packets += len(decoded)
+                    feed.last_packet_time = time.time()
+                    packets += [FeedPacket(feed.name, packet) for packet in decoded]
+        return packets
+
+    def __iter__(self) -> Iterator[FeedPacket]:
+        while self.feeds:
+            yield from self.poll()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """counters of every feed, by feed name"""
+        return {name: feed.stats() for name, feed in self.feeds.items()}
+
+    def close(self) -> None:
+        for name in list(self.feeds):
+            self.remove_feed(name)
+        self._selector.close()
+
+    def __enter__(self) -> 'MultiFeedReceiver':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
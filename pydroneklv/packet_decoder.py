@@ -1,10 +1,12 @@
-from .decoder_map import klv_types_data, klv_types
+from .decoder_map import klv_dispatch_table, low_cardinality_tags
 from .decoder_map import UNIVERSAL_KEY as BYTES_UKEY
-from .decoders import verify_crc, decode_length
+from .decoders import verify_crc, decode_length, decode_field, decode_timestamp_seconds
 from .errors import *
 
-from typing import Optional, Tuple
-from collections import namedtuple
+from typing import AbstractSet, Dict, Iterable, Iterator, Optional, Union
+from collections import namedtuple, OrderedDict
+from collections.abc import Mapping
+import re
 
 KlvField = namedtuple('KlvField', "name len bytes value")
 
@@ -21,6 +23,22 @@ TIMESTAMP_SIZE = 10
 CRC_SIZE = 4
 MINIMUM_PACKET_SIZE = len(BYTES_UKEY) + MIN_LEN_FIELD_SIZE + TIMESTAMP_SIZE + CRC_SIZE
 
+TIMESTAMP_TAG = 2
+TIMESTAMP_PAYLOAD_SIZE = 8
+TIMESTAMP_TAGS = frozenset([TIMESTAMP_TAG])
+
+
+# memoryviews have no find method, the regex module searches any bytes-like object without copying it
+_UKEY_PATTERN = re.compile(re.escape(bytes(BYTES_UKEY)))
+
+
+def find_packet_key(buf: bytes, idx: int = 0) -> int:
+    """returns the index of the first universal key in buf at or after idx, -1 if there is none"""
+    if isinstance(buf, memoryview):
+        match = _UKEY_PATTERN.search(buf, idx)
+        return match.start() if match else -1
+    return buf.find(BYTES_UKEY, idx)
+
 
 def is_packet_start(buf: bytes, idx: int, packet_header: bytes = BYTES_UKEY) -> bool:
     return buf[idx:idx+len(packet_header)] == packet_header
@@ -35,45 +53,212 @@ def search_packet_start(buf: bytes, idx: int) -> Optional[int]:
     """receives a buffer and a start index
     returns the index at which the packet header starts or None if it's not found
     """
-    while has_min_size(buf, idx):
-        if is_packet_start(buf, idx):
-            idx += len(BYTES_UKEY)  # skip universal key
-            return idx
-        idx += 1
-    return None
+    key_idx = find_packet_key(buf, idx)  # bulk search instead of comparing at every index
+    if key_idx == -1 or not has_min_size(buf, key_idx):
+        return None
+    return key_idx + len(BYTES_UKEY)  # skip universal key
+
+
+def tags_set(tags: Optional[Iterable[int]]) -> Optional[AbstractSet[int]]:
+    """tags projection argument as a set, None stands for every tag"""
+    if tags is None or isinstance(tags, (set, frozenset)):
+        return tags
+    return frozenset(tags)
+
+
+def index_fields(buf: bytes, start: int, end: int, tags: Optional[AbstractSet[int]] = None) -> Dict[int, int]:
+    """
+    walks the fields of a payload between indexes start and end, without decoding them
+    returns a dict of tag key -> index of the tag byte, in the order the tags appear
+    tags - if given, only these tags are indexed and the walk stops once all of them are found
+    raises ByteArrayTooSmall if a field runs past end
+    """
+    fields = {}
+    idx = start
+    while idx < end:
+        if idx + 1 >= end:
+            raise ByteArrayTooSmall(f"field at {idx} has no length")
+        n_tag_len_bytes, tag_len = decode_length(buf, idx + 1)
+        field_end = idx + 1 + n_tag_len_bytes + tag_len
+        if field_end > end:
+            raise ByteArrayTooSmall(f"field at {idx} ends at {field_end}, past the payload end {end}")
+        tag = buf[idx]
+        if tags is None or tag in tags:
+            fields[tag] = idx
+            if tags is not None and len(fields) == len(tags):
+                break
+        idx = field_end
+    return fields
 
 
-def decode_field(buf: bytes, idx: int = 0) -> Tuple[int, int, bytes]:
+def read_timestamp(buf: bytes, offset: int) -> Optional[int]:
     """
-    receives a bytes buffer and the index to start decoding
-    assumes first bytes is tag number
-    following length encoded bytes
-    following payload bytes
-
-    returns a tuple of:
-    - number of bytes in the tag, including tag key, bytes encoding length and value bytes
-    - tag key
-    - value bytes
+    raw tag 2 timestamp, in microseconds, of the packet whose universal key is at offset
+    ST 0601 puts the timestamp first in the packet, so it is read there without walking the fields,
+    other positions are found with index_fields. returns None if the packet has no timestamp
+    the packet does not need to be checked, ByteArrayTooSmall is raised when it is truncated or its
+    timestamp field has the wrong size
     """
-    tag = buf[idx]
-    n_tag_len_bytes, tag_len = decode_length(buf, idx + 1)
+    idx = offset + len(BYTES_UKEY)
+    if idx >= len(buf) or idx + 1 + (buf[idx] & 0b01111111 if buf[idx] & 0b10000000 else 0) > len(buf):
+        raise ByteArrayTooSmall("packet length is truncated")
+    n_length_bytes, payload_length = decode_length(buf, idx)
+    payload_start = idx + n_length_bytes
+    payload_end = payload_start + payload_length
+    if payload_end > len(buf):
+        raise ByteArrayTooSmall(f"payload ends at {payload_end}, past the buffer end {len(buf)}")
+    if payload_start + 1 < payload_end and buf[payload_start] == TIMESTAMP_TAG and \
+       buf[payload_start + 1] == TIMESTAMP_PAYLOAD_SIZE:
+        timestamp_idx = payload_start + 2
+    else:
+        fields = index_fields(buf, payload_start, payload_end, TIMESTAMP_TAGS)
+        if TIMESTAMP_TAG not in fields:
+            return None
+        timestamp_idx = fields[TIMESTAMP_TAG] + 2
+        if buf[timestamp_idx - 1] != TIMESTAMP_PAYLOAD_SIZE:
+            raise ByteArrayTooSmall("timestamp field is not 8 bytes")
+    if timestamp_idx + TIMESTAMP_PAYLOAD_SIZE > payload_end:
+        raise ByteArrayTooSmall("timestamp runs past the payload end")
+    return decode_timestamp_seconds(buf[timestamp_idx:timestamp_idx + TIMESTAMP_PAYLOAD_SIZE])
+
+
+class KlvPacket(Mapping):
+    """
+    read only, dict compatible view of a packet that decodes each field the first time it is read
+    only the index of every tag is recorded when the packet is created, packet[tag] returns the same
+    KlvField decode_packet would and keeps it for the next reads
+    """
+    __slots__ = ('_buf', '_fields', '_cache', '_copy', '_raw')
+
+    def __init__(self, buf: memoryview, fields: Dict[int, int], copy: bool = True, raw: bool = False):
+        self._buf = buf
+        self._fields = fields
+        self._cache: Optional[Dict[int, KlvField]] = None
+        self._copy = copy
+        self._raw = raw
+
+    def __getitem__(self, tag: int) -> KlvField:
+        if self._cache is not None:
+            field = self._cache.get(tag)
+            if field is not None:
+                return field
+        else:
+            self._cache = {}
+
+        _, _, tag_payload = decode_field(self._buf, self._fields[tag])
+        if self._copy:
+            tag_payload = bytes(tag_payload)
+        type_data = klv_dispatch_table[tag]
+        decode_func = type_data.raw_decode_func if self._raw else type_data.decode_func
+        field = KlvField(name=type_data.description,
+                         len=len(tag_payload),
+                         bytes=tag_payload,
+                         value=decode_func(tag_payload))
+        self._cache[tag] = field
+        return field
+
+    def __contains__(self, tag: object) -> bool:
+        return tag in self._fields
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._fields)
 
-    tag_payload_start = idx + 1 + n_tag_len_bytes  # +1 for tag byte
-    tag_payload = buf[tag_payload_start:tag_payload_start + tag_len]
+    def __len__(self) -> int:
+        return len(self._fields)
 
-    return 1+n_tag_len_bytes+tag_len, tag, tag_payload
+    def __repr__(self) -> str:
+        return f"KlvPacket(tags={list(self._fields)})"
 
+    def raw(self, tag: int) -> memoryview:
+        """payload of a tag as a view into the packet buffer, without decoding or copying it"""
+        return decode_field(self._buf, self._fields[tag])[2]
 
-def decode_packet(buf: bytes, start_index: int = 0) -> dict:
-    buf = buf[start_index:]
-    if not has_min_size(buf):
+
+class DecodeCache:
+    """
+    bounded LRU of decoded fields, keyed by tag and payload bytes, for the tags whose values repeat from
+    packet to packet. a field whose payload is in the cache is not decoded again, the same KlvField object
+    is returned for every packet carrying those bytes. meant to be owned by the decoder of one stream
+
+    max_size - number of fields kept, the least recently used is evicted beyond it
+    tags     - tags to cache, by default the ones flagged low_cardinality in decoder_map
+    raw      - cache the fields decoded in raw mode, see decode_packet
+    """
+
+    def __init__(self, max_size: int = 256, tags: Optional[Iterable[int]] = None, raw: bool = False):
+        self.max_size = max_size
+        self.tags = tags_set(tags) if tags is not None else low_cardinality_tags
+        self.raw = raw
+        self.hits = 0
+        self.misses = 0
+        self._fields: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate, 'size': len(self._fields)}
+
+    def clear(self) -> None:
+        self._fields.clear()
+
+    def field(self, tag: int, tag_payload: bytes) -> KlvField:
+        """decoded field of the tag for the payload, from the cache when the same bytes were decoded before"""
+        key = (tag, tag_payload if isinstance(tag_payload, bytes) else bytes(tag_payload))
+        field = self._fields.get(key)
+        if field is not None:
+            self._fields.move_to_end(key)
+            self.hits += 1
+            return field
+
+        self.misses += 1
+        tag_payload = key[1]  # the cached field must not hold a view into the packet buffer
+        type_data = klv_dispatch_table[tag]
+        decode_func = type_data.raw_decode_func if self.raw else type_data.decode_func
+        field = KlvField(name=type_data.description,
+                         len=len(tag_payload),
+                         bytes=tag_payload,
+                         value=decode_func(tag_payload))
+        self._fields[key] = field
+        if len(self._fields) > self.max_size:
+            self._fields.popitem(last=False)
+        return field
+
+
+def decode_packet(buf: bytes, start_index: int = 0, lazy: bool = False, copy: bool = True,
+                  tags: Optional[Iterable[int]] = None, check_crc: bool = True,
+                  cache: Optional[DecodeCache] = None, raw: bool = False) -> Union[dict, KlvPacket]:
+    """
+    decodes the first packet found in buf, after start_index
+    buf can be any bytes-like object (bytes, bytearray, memoryview, mmap), it is parsed in place
+
+    lazy      - return a KlvPacket decoding the fields on access, instead of a dict of every decoded field
+    copy      - give the fields their own bytes, when False field bytes and undecoded values are memoryviews
+                into buf, which then must not be modified while the packet is in use. a lazy packet copies
+                its payload once unless buf is bytes
+    tags      - decode only these tags, the others are skipped by their length without being sliced or
+                decoded, and the packet walk stops once every requested tag has been found
+    check_crc - verify the packet checksum, the whole packet is read for it even when the walk stops early
+    cache     - DecodeCache giving the fields of its tags, when the packet is not lazy
+    raw       - decode integers without scaling them and the timestamp as UNIX microseconds, the scaling of
+                each tag is in decoder_map.scaling_table
+    """
+    tags = tags_set(tags)
+    if cache is not None and cache.raw != raw:
+        raise ValueError(f'cache decodes with raw={cache.raw}, the packet with raw={raw}')
+    if not has_min_size(buf, start_index):
         raise ByteArrayTooSmall()
 
-    idx = buf.find(BYTES_UKEY)
-    if idx == -1:
+    key_idx = find_packet_key(buf, start_index)
+    if key_idx == -1:
         raise UniversalKeyNotFound()
 
-    idx += len(BYTES_UKEY)  # move index to start of length field
+    idx = key_idx + len(BYTES_UKEY)  # move index to start of length field
     n_length_bytes, payload_length = decode_length(buf, idx)
     idx += n_length_bytes  # move index to start of payload
 
@@ -83,34 +268,45 @@ def decode_packet(buf: bytes, start_index: int = 0) -> dict:
         raise ByteArrayTooSmall(
             f"size of payload bytes={remaining_bytes} =/= parsed size={payload_length}")
 
-    total_size = len(BYTES_UKEY) + n_length_bytes + payload_length
-    if not verify_crc(buf, start_index, total_size):
+    payload_start = idx
+    payload_end = payload_start + payload_length
+    if check_crc and not verify_crc(buf, key_idx, payload_end):
         raise CRCError()
 
+    view = memoryview(buf)  # slicing the view gives the field payloads without copying them
+    if lazy:
+        if copy and not isinstance(buf, bytes):
+            # the fields are decoded later, the packet keeps its own copy of the payload in case buf changes
+            view = memoryview(bytes(view[payload_start:payload_end]))
+            payload_start, payload_end = 0, payload_length
+        return KlvPacket(view, index_fields(view, payload_start, payload_end, tags), copy, raw)
+
     packet = {}
-    payload_start = idx
-    tag_start = 0  # tag start index, relative to the payload start index
-    while tag_start < payload_length:
-        n_tag_bytes, tag, tag_payload = decode_field(buf, payload_start+tag_start)
-
-        if tag in klv_types_data:  # the new list for decoder maps
-            type_data = klv_types_data[tag]
-            tag_description = type_data.description
-            decode_func = type_data.decode_func
-        elif tag in klv_types:  # old list of decoder map
-            tag_description, decode_func = klv_types[tag]
-        else:  # non existent decoder
-            tag_description, decode_func = ("unknown", None)
-
-        if decode_func:
-            decoded_value = decode_func(tag_payload)
-        else:
-            decoded_value = tag_payload
+    n_missing_tags = len(tags) if tags is not None else -1
+    idx = payload_start
+    while idx < payload_end:
+        if tags is not None:
+            if view[idx] not in tags:
+                n_tag_len_bytes, tag_len = decode_length(view, idx + 1)
+                idx += 1 + n_tag_len_bytes + tag_len
+                continue
+            if view[idx] not in packet:
+                n_missing_tags -= 1
 
-        packet[tag] = KlvField(name=tag_description,
-                               len=len(tag_payload),
-                               bytes=tag_payload,
-                               value=decoded_value)
+        n_tag_bytes, tag, tag_payload = decode_field(view, idx)
+        idx += n_tag_bytes
+        if cache is not None and tag in cache.tags:
+            packet[tag] = cache.field(tag, tag_payload)
+        else:
+            if copy:
+                tag_payload = bytes(tag_payload)
+            type_data = klv_dispatch_table[tag]
+            decode_func = type_data.raw_decode_func if raw else type_data.decode_func
+            packet[tag] = KlvField(name=type_data.description,
+                                   len=len(tag_payload),
+                                   bytes=tag_payload,
+                                   value=decode_func(tag_payload))
 
-        tag_start += n_tag_bytes
+        if n_missing_tags == 0:
+            break
     return packet
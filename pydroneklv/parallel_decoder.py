@@ -0,0 +1,90 @@
+# module to decode large KLV recordings with a pool of worker processes
+import mmap
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from .packet_decoder import find_packet_key
+from .stream_decoder import StreamDecoder
+
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_CHUNK_SIZE = 8 * 2 ** 20
+
+
+def find_chunk_boundaries(buf: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Tuple[int, int]]:
+    """
+    splits a buffer in (start, end) ranges of about chunk_size bytes, every range starts at a universal key
+    so that no packet is split across two ranges. bytes before the first universal key are left out
+    """
+    ranges = []
+    start = find_packet_key(buf, 0)
+    while start != -1 and start < len(buf):
+        end = find_packet_key(buf, start + chunk_size) if start + chunk_size < len(buf) else -1
+        if end == -1:
+            end = len(buf)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def ordered_map(executor: Executor, func: Callable, args_iter: Iterable[tuple], max_pending: int) -> Iterator[Any]:
+    """
+    like executor.map, but submits at most max_pending calls ahead of the one being yielded, so the
+    arguments are consumed lazily and memory stays bounded. results are yielded in submission order, as
+    soon as they are done when the arguments are pulled
+    """
+    pending = deque()
+    try:
+        for args in args_iter:
+            pending.append(executor.submit(func, *args))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            while pending and pending[0].done():
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def decode_file_range(path: str, start: int, end: int, tags: Optional[Iterable[int]] = None,
+                      check_crc: bool = True, raw: bool = False) -> List[dict]:
+    """decodes the packets in the bytes [start, end) of a raw KLV recording, run by the worker processes"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return StreamDecoder(tags=tags, check_crc=check_crc, raw=raw).feed(data)
+
+
+def iter_decode_file_parallel(path: str, workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                              tags: Optional[Iterable[int]] = None, check_crc: bool = True,
+                              raw: bool = False) -> Iterator[dict]:
+    """
+    yields the packets of a raw KLV recording in file order, decoded by a pool of processes
+    the file is split in chunks of about chunk_size bytes aligned to packet starts, each worker reads and
+    decodes whole chunks. the packets are the same as the ones of stream_decoder.decode_file
+    workers - number of processes, defaults to the number of CPUs
+    tags, check_crc, raw - see decode_packet, raw packets are also cheaper to send back from the workers
+    """
+    workers = workers or os.cpu_count() or 1
+    if tags is not None:
+        tags = frozenset(tags)
+    if os.path.getsize(path) == 0:
+        return
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        ranges = find_chunk_boundaries(buf, chunk_size)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        args_iter = ((path, start, end, tags, check_crc, raw) for start, end in ranges)
+        for packets in ordered_map(executor, decode_file_range, args_iter, 2 * workers):
+            yield from packets
+
+
+def decode_file_parallel(path: str, workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         tags: Optional[Iterable[int]] = None, check_crc: bool = True,
+                         raw: bool = False) -> List[dict]:
+    """list of all the packets of a raw KLV recording, see iter_decode_file_parallel"""
+    return list(iter_decode_file_parallel(path, workers, chunk_size, tags, check_crc, raw))
@@ -0,0 +1,186 @@
+# module to access the packets of a raw KLV recording file randomly, through a memory map and an
+# index of the packet offsets saved next to the recording
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+from .decoder_map import UNIVERSAL_KEY as BYTES_UKEY
+from .decoders import decode_length, verify_crc
+from .packet_decoder import decode_packet, find_packet_key
+from .stream_decoder import MAX_PACKET_SIZE
+
+from typing import Optional, Tuple, Union
+
+INDEX_SUFFIX = '.klvidx'
+INDEX_MAGIC = b'KLVIDX01'
+# magic, byte order of the arrays, number of packets, position where the next scan starts
+INDEX_HEADER = struct.Struct('<8sBQQ')
+
+
+def scan_packets(buf: bytes, start: int = 0, max_packet_size: int = MAX_PACKET_SIZE) -> Tuple[array, array, int]:
+    """
+    finds the packets in buf from index start on. candidates are located with a bulk search of the universal
+    key and kept only if their length fits in buf and their CRC matches
+    returns the offsets and sizes of the packets found, and the index where a later scan should resume,
+    after the last packet or at the start of a packet not complete yet
+    """
+    offsets = array('Q')
+    sizes = array('I')
+    pos = start
+    while True:
+        key_idx = find_packet_key(buf, pos)
+        if key_idx == -1:
+            # the tail can hold the beginning of a universal key
+            return offsets, sizes, max(pos, len(buf) - len(BYTES_UKEY) + 1)
+
+        length_idx = key_idx + len(BYTES_UKEY)
+        if length_idx >= len(buf):
+            return offsets, sizes, key_idx
+        n_length_bytes = 1
+        if buf[length_idx] & 0b10000000:  # long form, first byte holds the number of length bytes
+            n_length_bytes += buf[length_idx] & 0b01111111
+        if length_idx + n_length_bytes > len(buf):
+            return offsets, sizes, key_idx
+
+        n_length_bytes, payload_length = decode_length(buf, length_idx)
+        packet_size = len(BYTES_UKEY) + n_length_bytes + payload_length
+        if payload_length > max_packet_size:
+            pos = key_idx + 1
+        elif key_idx + packet_size > len(buf):
+            return offsets, sizes, key_idx
+        elif verify_crc(buf, key_idx, key_idx + packet_size):
+            offsets.append(key_idx)
+            sizes.append(packet_size)
+            pos = key_idx + packet_size
+        else:
+            pos = key_idx + 1
+
+
+class KlvRecording(Sequence):
+    """
+    raw KLV recording with random access to its packets, recording[i] decodes the i-th packet
+
+    the file is memory mapped and scanned once for its packets, the offsets found are saved to a sidecar
+    index file (path + INDEX_SUFFIX) which is loaded instead of scanning when the recording is opened
+    again. refresh() scans the bytes appended to a recording still being written.
+
+        with KlvRecording('mission.klv') as recording:
+            packet = recording[1000]
+    """
+
+    def __init__(self, path: str, index_path: Optional[str] = None, use_index: bool = True,
+                 save_index: bool = True):
+        self.path = path
+        self.index_path = index_path if index_path is not None else path + INDEX_SUFFIX
+        self.save_index = save_index
+
+        self.offsets = array('Q')
+        self.sizes = array('I')
+        self.scanned_bytes = 0  # bytes scanned by this object, 0 when everything came from the index
+        self._scan_pos = 0
+
+        self._file = open(path, 'rb')
+        self._mmap: Optional[mmap.mmap] = None
+        self._map()
+
+        if not (use_index and self._load_index()):
+            self.offsets = array('Q')
+            self.sizes = array('I')
+            self._scan_pos = 0
+        self.refresh()
+
+    def _map(self) -> None:
+        size = os.fstat(self._file.fileno()).st_size
+        if size > 0 and (self._mmap is None or size != len(self._mmap)):
+            # the previous map is not closed, lazy and copy=False packets can still hold views of it. it is
+            # unmapped once they are gone
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def buffer(self) -> Union[mmap.mmap, bytes]:
+        return self._mmap if self._mmap is not None else b''
+
+    def refresh(self) -> int:
+        """scans the bytes added to the file since the last scan, returns the number of new packets"""
+        self._map()
+        buf = self.buffer
+        if len(buf) <= self._scan_pos:
+            return 0
+        offsets, sizes, scan_pos = scan_packets(buf, self._scan_pos)
+        self.scanned_bytes += scan_pos - self._scan_pos
+        self._scan_pos = scan_pos
+        self.offsets.extend(offsets)
+        self.sizes.extend(sizes)
+        if self.save_index and (len(offsets) or not os.path.exists(self.index_path)):
+            self._save_index()
+        return len(offsets)
+
+    def _save_index(self) -> None:
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, sys.byteorder == 'little', len(self.offsets), self._scan_pos))
+            self.offsets.tofile(f)
+            self.sizes.tofile(f)
+        os.replace(tmp_path, self.index_path)  # readers never see a partially written index
+
+    def _load_index(self) -> bool:
+        """loads the sidecar index, returns False if it is missing or doesn't match the recording"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                magic, little_endian, n_packets, scan_pos = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                if magic != INDEX_MAGIC:
+                    return False
+                self.offsets.fromfile(f, n_packets)
+                self.sizes.fromfile(f, n_packets)
+        except (OSError, EOFError, struct.error):
+            return False
+        if bool(little_endian) != (sys.byteorder == 'little'):
+            self.offsets.byteswap()
+            self.sizes.byteswap()
+
+        # the recording can only have grown since, check that the last indexed packet is still there
+        buf = self.buffer
+        if scan_pos > len(buf):
+            return False
+        if n_packets:
+            start = self.offsets[-1]
+            end = start + self.sizes[-1]
+            if end > len(buf) or buf[start:start + len(BYTES_UKEY)] != BYTES_UKEY or \
+               not verify_crc(buf, start, end):
+                return False
+        self._scan_pos = scan_pos
+        return True
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.packet(j) for j in range(*i.indices(len(self)))]
+        return self.packet(i)
+
+    def packet(self, i: int, **decode_kwargs) -> dict:
+        """decodes the i-th packet, decode_kwargs are passed to decode_packet"""
+        return decode_packet(self.buffer, self.offsets[i], **decode_kwargs)
+
+    def packet_bytes(self, i: int) -> bytes:
+        start = self.offsets[i]
+        return self.buffer[start:start + self.sizes[i]]
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:  # packets still hold views of the map, unmapped once they are gone
+                pass
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self) -> 'KlvRecording':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,2 +1,170 @@
 # module to receive a stream of bytes and decode packets as they come,
-# each message can contain only a partial packet
\ No newline at end of file
+# each message can contain only a partial packet
+from .decoder_map import UNIVERSAL_KEY as BYTES_UKEY
+from .decoders import decode_length
+from .packet_decoder import decode_packet, tags_set, DecodeCache
+from .errors import *
+from .decimation import Decimator
+from .delta import DeltaFilter
+from .metrics import DecodeMetrics
+
+from typing import Iterable, Iterator, List, Optional
+
+# upper bound for the payload length of a single packet, anything larger is treated as a
+# false universal key match inside garbage bytes
+MAX_PACKET_SIZE = 2 ** 16
+
+
+class StreamDecoder:
+    """stateful decoder for a byte stream carrying KLV packets
+
+    bytes are appended to an internal reassembly buffer with feed(), which returns the packets
+    completed so far. packets split across several chunks are kept until the missing bytes arrive.
+    garbage between packets and packets failing the CRC check are skipped, decoding resumes at the
+    next universal key.
+    lazy, tags, check_crc - see decode_packet
+    metrics - DecodeMetrics counting the decoded packets and errors
+    cache - DecodeCache of this stream, for the fields whose values repeat
+    delta - DeltaFilter, packets are then DeltaPackets with only the fields changed since the previous ones
+    raw - see decode_packet, a cache must then be created with raw=True too
+    decimation - Decimator choosing the packets to decode from their bytes, the others are skipped undecoded
+    """
+
+    def __init__(self, max_packet_size: int = MAX_PACKET_SIZE, lazy: bool = False,
+                 tags: Optional[Iterable[int]] = None, check_crc: bool = True,
+                 metrics: Optional[DecodeMetrics] = None, cache: Optional[DecodeCache] = None,
+                 delta: Optional[DeltaFilter] = None, raw: bool = False, decimation: Optional[Decimator] = None):
+        if cache is not None and cache.raw != raw:  # checked once, every packet would be dropped otherwise
+            raise ValueError(f'cache decodes with raw={cache.raw}, the packets with raw={raw}')
+        self.max_packet_size = max_packet_size
+        self.lazy = lazy
+        self.tags = tags_set(tags)
+        self.check_crc = check_crc
+        self.metrics = metrics
+        self.cache = cache
+        self.delta = delta
+        self.raw = raw
+        self.decimation = decimation
+        self._buf = bytearray()
+        self._pos = 0  # index of the first byte not yet consumed
+
+        self.crc_errors = 0
+        self.decode_errors = 0
+        self.skipped_bytes = 0
+        self.decimated_packets = 0
+
+    @property
+    def pending(self) -> int:
+        """number of buffered bytes waiting for the rest of a packet"""
+        return len(self._buf) - self._pos
+
+    def reset(self) -> None:
+        self._buf.clear()
+        self._pos = 0
+        if self.delta is not None:
+            self.delta.reset()
+        if self.decimation is not None:
+            self.decimation.reset()
+
+    def feed(self, chunk: bytes) -> List[dict]:
+        """append a chunk of bytes to the stream, returns the list of packets completed by it"""
+        self._buf += chunk
+        packets = []
+        decode = self.metrics.decode if self.metrics is not None else decode_packet
+        lazy = self.lazy or self.delta is not None  # the delta filter compares the fields before decoding them
+        while True:
+            packet_size = self._next_packet_size()
+            if packet_size is None:
+                break
+
+            start = self._pos
+            end = start + packet_size
+            # only a packet ending with a checksum field is skipped whole, a false universal key match
+            # goes to the decoder which resyncs on the next byte
+            if self.decimation is not None and self._buf[end - 4] == 1 and self._buf[end - 3] == 2:
+                try:
+                    keep = self.decimation.keep(self._buf, start)
+                except Exception:
+                    # the bytes read by the decimation are malformed, a corrupted packet or a false universal
+                    # key match, resync on the next key
+                    self.decode_errors += 1
+                    self._skip(1)
+                    continue
+                if not keep:
+                    self.decimated_packets += 1
+                    self._pos = end
+                    continue
+            try:
+                # the slice is the only copy made, the packet owns it and the buffer stays resizable
+                packet_bytes = self._buf[start:start + packet_size]
+                packet = decode(packet_bytes, lazy=lazy, tags=self.tags, check_crc=self.check_crc, cache=self.cache,
+                                raw=self.raw)
+                packets.append(packet if self.delta is None else self.delta.update(packet))
+                self._pos = start + packet_size
+            except CRCError:
+                # either a corrupted packet or a false universal key match, resync on the next key
+                self.crc_errors += 1
+                self._skip(1)
+            except Exception:
+                # packet framing and CRC are valid, but a field could not be decoded
+                self.decode_errors += 1
+                self._skip(packet_size)
+
+        # drop consumed bytes, deleting from the front of a bytearray does not move the remaining bytes
+        del self._buf[:self._pos]
+        self._pos = 0
+        return packets
+
+    def _skip(self, n_bytes: int) -> None:
+        self._pos += n_bytes
+        self.skipped_bytes += n_bytes
+
+    def _next_packet_size(self):
+        """moves the read position to the next universal key
+        returns the size of the packet starting there or None if it is not complete yet
+        """
+        while True:
+            buf = self._buf
+            start = buf.find(BYTES_UKEY, self._pos)
+            if start == -1:
+                # keep the tail, it can hold the beginning of a universal key split across chunks
+                self._skip(max(0, len(buf) - self._pos - len(BYTES_UKEY) + 1))
+                return None
+            self._skip(start - self._pos)
+
+            length_idx = start + len(BYTES_UKEY)
+            if length_idx >= len(buf):
+                return None
+            n_length_bytes = 1
+            if buf[length_idx] & 0b10000000:  # long form, first byte holds the number of length bytes
+                n_length_bytes += buf[length_idx] & 0b01111111
+            if length_idx + n_length_bytes > len(buf):
+                return None
+
+            n_length_bytes, payload_length = decode_length(buf, length_idx)
+            if payload_length > self.max_packet_size:
+                self._skip(1)
+                continue
+
+            packet_size = len(BYTES_UKEY) + n_length_bytes + payload_length
+            if start + packet_size > len(buf):
+                return None
+            return packet_size
+
+
+def decode_file(path: str, read_size: int = 2 ** 20, tags: Optional[Iterable[int]] = None,
+                check_crc: bool = True, metrics: Optional[DecodeMetrics] = None,
+                delta: Optional[DeltaFilter] = None, raw: bool = False,
+                decimation: Optional[Decimator] = None) -> Iterator[dict]:
+    """yields the packets of a raw KLV recording, read read_size bytes at a time
+    tags, check_crc, raw - see decode_packet
+    metrics, delta, decimation - see StreamDecoder
+    """
+    decoder = StreamDecoder(tags=tags, check_crc=check_crc, metrics=metrics, delta=delta, raw=raw,
+                            decimation=decimation)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(read_size)
+            if not chunk:
+                break
+            yield from decoder.feed(chunk)
@@ -0,0 +1,173 @@
+# module to decode demuxed packets in a pipeline of threads, a demux thread filling a bounded queue and a
+# pool of decode threads, so a slow consumer doesn't hold up the demux
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .aio_receiver import DROP_OLDEST, DROP_NEWEST
+from .metrics import DecodeMetrics
+from .packet_decoder import decode_packet, tags_set
+
+from typing import Deque, Iterable, Iterator, Optional, Tuple
+
+# what the demux thread does with a packet when the queue is full, the drop policies are the ones of
+# UdpKlvReceiver
+BLOCK = 'block'  # wait for the consumer, nothing is lost but the source is not read meanwhile
+QUEUE_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class ThreadedDecoder:
+    """
+    iterator over the packets decoded from a source of packet bytes, in source order
+
+    a demux thread reads the source into a queue of at most max_queue_size packets, policy decides what
+    happens when the consumer falls behind and the queue is full, see QUEUE_POLICIES. the queued packets
+    are decoded by a pool of workers threads, up to 2 * workers ahead of the consumer.
+
+        with ThreadedDecoder(demux_data_packets('udp://0.0.0.0:20000'), policy=DROP_OLDEST) as decoder:
+            for packet in decoder:
+                ...
+
+    packets failing to decode are dropped, metrics counts them by error
+    tags, check_crc - see decode_packet
+    """
+
+    def __init__(self, source: Iterable[bytes], workers: int = 2, max_queue_size: int = 1024,
+                 policy: str = BLOCK, tags: Optional[Iterable[int]] = None, check_crc: bool = True,
+                 metrics: Optional[DecodeMetrics] = None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f'policy must be one of {QUEUE_POLICIES}, got {policy}')
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.policy = policy
+        self.tags = tags_set(tags)
+        self.check_crc = check_crc
+        self.metrics = metrics
+
+        self.demuxed_packets = 0
+        self.dropped_packets = 0
+
+        self._source = source
+        self._queue: Deque[Tuple[bytes, int]] = deque()  # packet bytes, time demuxed
+        self._cond = threading.Condition()
+        self._demux_done = False
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._demux, name='klv-demux', daemon=True)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def queue_size(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> 'ThreadedDecoder':
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='klv-decode')
+            self._thread.start()
+        return self
+
+    def _demux(self) -> None:
+        try:
+            for packet_bytes in self._source:
+                item = (packet_bytes, time.perf_counter_ns())
+                with self._cond:
+                    if self._closed:
+                        break
+                    self.demuxed_packets += 1
+                    if len(self._queue) >= self.max_queue_size:
+                        if self.policy == DROP_NEWEST:
+                            self.dropped_packets += 1
+                            continue
+                        if self.policy == DROP_OLDEST:
+                            self._queue.popleft()
+                            self.dropped_packets += 1
+                        else:
+                            while len(self._queue) >= self.max_queue_size and not self._closed:
+                                self._cond.wait()
+                    self._queue.append(item)
+                    self._cond.notify_all()
+        except Exception as e:
+            self._error = e  # raised in the consumer once the queued packets are yielded
+        finally:
+            close = getattr(self._source, 'close', None)  # ends generators, PyAV closes its container
+            if close is not None:
+                close()
+            with self._cond:
+                self._demux_done = True
+                self._cond.notify_all()
+
+    def _notify(self, _future: Future) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def _ready(self, pending: Deque[Future], max_pending: int) -> bool:
+        """whether the consumer has something to do, called with the condition held"""
+        return self._closed or bool(pending and pending[0].done()) or \
+            bool(self._queue and len(pending) < max_pending) or (self._demux_done and not self._queue and not pending)
+
+    def _decoded(self) -> Iterator[tuple]:
+        """
+        decode results in source order, up to 2 * workers packets are decoded ahead. the oldest result is
+        yielded as soon as it is done, without waiting for more packets from a source that stays open
+        """
+        pending: Deque[Future] = deque()
+        max_pending = 2 * self.workers
+        try:
+            while True:
+                item = None
+                with self._cond:
+                    while not self._ready(pending, max_pending):
+                        self._cond.wait()
+                    if self._closed or (self._demux_done and not self._queue and not pending):
+                        break
+                    if self._queue and len(pending) < max_pending:
+                        item = self._queue.popleft()
+                        self._cond.notify_all()  # room for a blocked demux thread
+                if item is not None:
+                    future = self._executor.submit(self._decode, *item)
+                    future.add_done_callback(self._notify)
+                    pending.append(future)
+                while pending and pending[0].done():
+                    yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _decode(self, packet_bytes: bytes, demux_time: int):
+        # runs in the workers, the consumer thread does the accounting so metrics are not shared
+        try:
+            return decode_packet(packet_bytes, tags=self.tags, check_crc=self.check_crc), None, \
+                len(packet_bytes), demux_time
+        except Exception as e:
+            return None, e, len(packet_bytes), demux_time
+
+    def __iter__(self) -> Iterator[dict]:
+        self.start()
+        metrics = self.metrics
+        for packet, error, n_bytes, demux_time in self._decoded():
+            if error is not None:
+                if metrics is not None:
+                    metrics.add_error(error)
+                continue
+            if metrics is not None:
+                metrics.add_packet(n_bytes)
+                metrics.add_latency(demux_time)
+            yield packet
+        if self._error is not None and not self._closed:
+            raise self._error
+
+    def close(self) -> None:
+        """stops the demux thread at its next packet and the workers"""
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            self._cond.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def __enter__(self) -> 'ThreadedDecoder':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,99 @@
+# module to find the packets of a recording by their tag 2 UNIX timestamp
+import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .decoders import to_microseconds
+from .errors import ByteArrayTooSmall
+from .packet_decoder import decode_packet, read_timestamp
+from .recording import KlvRecording
+
+from typing import Iterator, List, Optional, Tuple, Union
+
+
+class TimeIndex:
+    """
+    sorted map of packet timestamps (microseconds) to byte offsets, for range and nearest packet queries
+    in O(log n). packets out of timestamp order are inserted at their sorted position, packets with equal
+    timestamps keep their file order.
+
+        index = TimeIndex.from_recording(recording)
+        for packet in index.packets(recording, datetime(2021, 5, 3, 14, 2), datetime(2021, 5, 3, 14, 5)):
+            ...
+    """
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.offsets = array('Q')
+        self.n_indexed_packets = 0  # packets of the recording already added, for update()
+        self.packets_without_timestamp = 0
+        self.bad_timestamps = 0  # packets whose tag 2 is malformed, left out
+
+    @classmethod
+    def from_recording(cls, recording: KlvRecording) -> 'TimeIndex':
+        index = cls()
+        index.update(recording)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def add(self, timestamp: int, offset: int) -> None:
+        if not self.timestamps or timestamp >= self.timestamps[-1]:  # in order, the common case
+            self.timestamps.append(timestamp)
+            self.offsets.append(offset)
+        else:
+            i = bisect_right(self.timestamps, timestamp)
+            self.timestamps.insert(i, timestamp)
+            self.offsets.insert(i, offset)
+
+    def update(self, recording: KlvRecording, refresh: bool = True) -> int:
+        """
+        adds the packets of the recording not indexed yet, so the index can follow a growing recording
+        refresh - scan the recording for new packets first
+        returns the number of packets added
+        """
+        if refresh:
+            recording.refresh()
+        buf = recording.buffer
+        n_added = 0
+        for i in range(self.n_indexed_packets, len(recording)):
+            offset = recording.offsets[i]
+            self.n_indexed_packets = i + 1
+            try:
+                timestamp = read_timestamp(buf, offset)
+            except ByteArrayTooSmall:
+                self.bad_timestamps += 1
+                continue
+            if timestamp is None:
+                self.packets_without_timestamp += 1
+                continue
+            self.add(timestamp, offset)
+            n_added += 1
+        return n_added
+
+    def _range_indices(self, start: Union[int, datetime.datetime], end: Union[int, datetime.datetime]) -> range:
+        return range(bisect_left(self.timestamps, to_microseconds(start)),
+                     bisect_right(self.timestamps, to_microseconds(end)))
+
+    def range(self, start: Union[int, datetime.datetime], end: Union[int, datetime.datetime]) -> List[int]:
+        """offsets of the packets with start <= timestamp <= end, in timestamp order"""
+        indices = self._range_indices(start, end)
+        return list(self.offsets[indices.start:indices.stop])
+
+    def nearest(self, t: Union[int, datetime.datetime]) -> Optional[Tuple[int, int]]:
+        """(timestamp, offset) of the packet closest in time to t, None if the index is empty"""
+        if not self.timestamps:
+            return None
+        t = to_microseconds(t)
+        i = bisect_left(self.timestamps, t)
+        if i == len(self.timestamps) or (i > 0 and t - self.timestamps[i - 1] <= self.timestamps[i] - t):
+            i -= 1
+        return self.timestamps[i], self.offsets[i]
+
+    def packets(self, recording: KlvRecording, start: Union[int, datetime.datetime],
+                end: Union[int, datetime.datetime], **decode_kwargs) -> Iterator[dict]:
+        """decodes the packets of the recording with start <= timestamp <= end, see decode_packet"""
+        buf = recording.buffer
+        for offset in self.range(start, end):
+            yield decode_packet(buf, offset, **decode_kwargs)
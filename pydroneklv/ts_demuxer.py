@@ -0,0 +1,334 @@
+# module to extract the KLV data stream from MPEG-TS bytes, without depending on PyAV/FFmpeg
+import time
+from collections import namedtuple
+
+from .decimation import Decimator
+from .delta import DeltaFilter
+from .metrics import DecodeMetrics
+from .stream_decoder import StreamDecoder
+
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+TS_PACKET_SIZE = 188
+SYNC_BYTE = 0x47
+PAT_PID = 0x0000
+NULL_PID = 0x1FFF
+
+# stream types and descriptors identifying a KLV elementary stream in the PMT
+STREAM_TYPE_PRIVATE_PES = 0x06
+STREAM_TYPE_METADATA_PES = 0x15
+REGISTRATION_DESCRIPTOR = 0x05
+METADATA_DESCRIPTOR = 0x26
+KLV_FORMAT_IDENTIFIER = b'KLVA'
+
+# PES stream ids without the optional PES header
+PES_IDS_WITHOUT_HEADER = {0xBC, 0xBE, 0xBF, 0xF0, 0xF1, 0xF2, 0xF8, 0xFF}
+
+# pts and dts are in units of the 90 kHz MPEG system clock, None when absent
+PesPacket = namedtuple('PesPacket', "pid stream_id pts dts payload")
+
+
+def read_pes_timestamp(buf: bytes, idx: int) -> int:
+    """33 bit PTS/DTS spread over 5 bytes with marker bits"""
+    return (((buf[idx] >> 1) & 0x07) << 30 | buf[idx + 1] << 22 | (buf[idx + 2] >> 1) << 15 |
+            buf[idx + 3] << 7 | buf[idx + 4] >> 1)
+
+
+def parse_pes(pid: int, pes: bytes, header_only: bool = False) -> Optional[PesPacket]:
+    """parses a reassembled PES packet, returns None if it doesn't start with a PES start code
+    header_only - pes is the start of the packet, only its header is read and the payload is left empty
+    """
+    if len(pes) < 6 or pes[0] != 0 or pes[1] != 0 or pes[2] != 1:
+        return None
+    stream_id = pes[3]
+    pes_length = (pes[4] << 8) | pes[5]
+    end = 6 + pes_length if pes_length else len(pes)  # a zero length means unbounded
+
+    pts = dts = None
+    if stream_id in PES_IDS_WITHOUT_HEADER:
+        data_start = 6
+    else:
+        if len(pes) < 9:
+            return None
+        flags = pes[7]
+        data_start = 9 + pes[8]
+        if flags & 0x80 and len(pes) >= 14:
+            pts = read_pes_timestamp(pes, 9)
+        if flags & 0x40 and len(pes) >= 19:
+            dts = read_pes_timestamp(pes, 14)
+    payload = b'' if header_only else bytes(pes[data_start:end])
+    return PesPacket(pid=pid, stream_id=stream_id, pts=pts, dts=dts, payload=payload)
+
+
+def is_klv_stream(stream_type: int, descriptors: bytes) -> bool:
+    """tells if a PMT entry describes a KLV stream, from its stream type and ES info descriptors"""
+    if stream_type == STREAM_TYPE_METADATA_PES:
+        return True
+    if stream_type != STREAM_TYPE_PRIVATE_PES:
+        return False
+    idx = 0
+    while idx + 2 <= len(descriptors):
+        tag, length = descriptors[idx], descriptors[idx + 1]
+        body = descriptors[idx + 2:idx + 2 + length]
+        if tag == REGISTRATION_DESCRIPTOR and body[:4] == KLV_FORMAT_IDENTIFIER:
+            return True
+        if tag == METADATA_DESCRIPTOR and KLV_FORMAT_IDENTIFIER in body:
+            return True
+        idx += 2 + length
+    return False
+
+
+class TsDemuxer:
+    """
+    incremental MPEG-TS demuxer returning the PES packets of the KLV stream
+
+    TS bytes are given in chunks of any size with feed(). the PAT and PMT are read to find the KLV
+    elementary stream (stream type 0x15, or 0x06 with a KLVA registration descriptor), unless its PID
+    is given, and its PES packets are reassembled from the TS packets carrying them.
+    only the TS packets of the wanted PIDs are parsed, they are located by searching their PID in the
+    headers of all the packets of a chunk at once. PSI sections are expected to fit in one TS packet.
+    pids - other PIDs whose PES packets are returned as well
+    stream_types - the PES packets of the streams of these types listed in the PMTs are returned as well
+    header_pids, header_stream_types - as pids and stream_types, but the PES packets are returned without
+                                       their payload as soon as their header is read, nothing is buffered.
+                                       for the streams, such as video, of which only the timestamps are used
+    """
+
+    def __init__(self, klv_pid: Optional[int] = None, pids: Iterable[int] = (), stream_types: Iterable[int] = (),
+                 header_pids: Iterable[int] = (), header_stream_types: Iterable[int] = ()):
+        self.klv_pid = klv_pid
+        self.pids: Set[int] = set(pids)
+        self.stream_types: Set[int] = set(stream_types)
+        self.header_pids: Set[int] = set(header_pids)
+        self.header_stream_types: Set[int] = set(header_stream_types)
+        self.streams: Dict[int, int] = {}  # elementary PID -> stream type, as listed in the PMTs
+
+        self.sync_losses = 0
+
+        self._pmt_pids: Set[int] = set()
+        self._pes: Dict[int, bytearray] = {}  # PES packets being reassembled, by PID
+        self._buf = bytearray()
+        self._pids_changed = False
+
+    def wanted_pids(self) -> Set[int]:
+        pids = {PAT_PID} | self._pmt_pids | self.pids | self.header_pids
+        if self.klv_pid is not None:
+            pids.add(self.klv_pid)
+        return pids
+
+    def feed(self, chunk: bytes) -> List[PesPacket]:
+        """append a chunk of TS bytes, returns the PES packets completed by it"""
+        self._buf += chunk
+        buf = self._buf
+        out = []
+        pos = 0
+        while len(buf) - pos >= TS_PACKET_SIZE:
+            # check the sync byte of every whole packet left at once
+            n_packets = (len(buf) - pos) // TS_PACKET_SIZE
+            stop = pos + n_packets * TS_PACKET_SIZE
+            sync_bytes = bytes(buf[pos:stop:TS_PACKET_SIZE])
+            n_synced = n_packets - len(sync_bytes.lstrip(b'\x47'))
+            if n_synced == 0:
+                pos = self._resync(buf, pos + 1)
+                continue
+            self._read_packets(buf, pos, pos + n_synced * TS_PACKET_SIZE, out)
+            pos += n_synced * TS_PACKET_SIZE
+
+        del buf[:pos]
+        return out
+
+    def flush(self) -> List[PesPacket]:
+        """end of stream, returns the PES packets still being reassembled"""
+        out = []
+        for pid in list(self._pes):
+            self._flush_pes(pid, out)
+        return out
+
+    def _resync(self, buf: bytearray, pos: int) -> int:
+        """index of the next byte that looks like the start of a packet"""
+        self.sync_losses += 1
+        while True:
+            pos = buf.find(SYNC_BYTE, pos)
+            if pos == -1:
+                return len(buf)
+            next_sync = pos + TS_PACKET_SIZE
+            if next_sync >= len(buf) or buf[next_sync] == SYNC_BYTE:
+                return pos
+            pos += 1
+
+    def _read_packets(self, buf: bytearray, start: int, stop: int, out: List[PesPacket]) -> None:
+        """reads the packets of the wanted PIDs among the synced packets in buf[start:stop]"""
+        pid_high = buf[start + 1:stop:TS_PACKET_SIZE]
+        pid_low = buf[start + 2:stop:TS_PACKET_SIZE]
+        first = 0
+        while first < len(pid_low):
+            indices = []
+            for pid in self.wanted_pids():
+                i = pid_low.find(pid & 0xFF, first)
+                while i != -1:
+                    if pid_high[i] & 0x1F == pid >> 8:
+                        indices.append(i)
+                    i = pid_low.find(pid & 0xFF, i + 1)
+            indices.sort()
+
+            first = len(pid_low)
+            for i in indices:
+                self._read_packet(buf, start + i * TS_PACKET_SIZE, out)
+                if self._pids_changed:
+                    # a PAT or PMT added PIDs, search again the packets after this one
+                    self._pids_changed = False
+                    first = i + 1
+                    break
+
+    def _read_packet(self, buf: bytearray, idx: int, out: List[PesPacket]) -> None:
+        if buf[idx + 1] & 0x80:  # transport error indicator
+            return
+        pid = ((buf[idx + 1] & 0x1F) << 8) | buf[idx + 2]
+        payload_unit_start = buf[idx + 1] & 0x40
+        adaptation_field_control = (buf[idx + 3] >> 4) & 0x03
+        payload_start = idx + 4
+        if adaptation_field_control & 0x02:
+            payload_start += 1 + buf[idx + 4]
+        packet_end = idx + TS_PACKET_SIZE
+        if not adaptation_field_control & 0x01 or payload_start >= packet_end:
+            return  # no payload
+
+        if pid == PAT_PID:
+            if payload_unit_start:
+                self._read_pat(buf[payload_start:packet_end])
+        elif pid in self._pmt_pids:
+            if payload_unit_start:
+                self._read_pmt(buf[payload_start:packet_end])
+        elif pid in self.header_pids:
+            if payload_unit_start:  # the PES header is at the start of the packet payload
+                packet = parse_pes(pid, buf[payload_start:packet_end], header_only=True)
+                if packet is not None:
+                    out.append(packet)
+        else:
+            self._read_pes(pid, payload_unit_start, buf, payload_start, packet_end, out)
+
+    @staticmethod
+    def _section(payload: bytes) -> Optional[bytes]:
+        """PSI section starting in a TS packet payload, without its CRC. None if it doesn't fit in the packet"""
+        section_start = 1 + payload[0]  # skip the pointer field
+        section = payload[section_start:]
+        if len(section) < 3:
+            return None
+        section_length = ((section[1] & 0x0F) << 8) | section[2]
+        if section_length < 4 or len(section) < 3 + section_length:
+            return None
+        return section[:3 + section_length - 4]
+
+    def _read_pat(self, payload: bytes) -> None:
+        section = self._section(payload)
+        if section is None or section[0] != 0x00:
+            return
+        for idx in range(8, len(section) - 3, 4):
+            program_number = (section[idx] << 8) | section[idx + 1]
+            pid = ((section[idx + 2] & 0x1F) << 8) | section[idx + 3]
+            if program_number != 0 and pid not in self._pmt_pids:  # program 0 is the network PID
+                self._pmt_pids.add(pid)
+                self._pids_changed = True
+
+    def _read_pmt(self, payload: bytes) -> None:
+        section = self._section(payload)
+        if section is None or len(section) < 12 or section[0] != 0x02:
+            return
+        program_info_length = ((section[10] & 0x0F) << 8) | section[11]
+        idx = 12 + program_info_length
+        while idx + 5 <= len(section):
+            stream_type = section[idx]
+            pid = ((section[idx + 1] & 0x1F) << 8) | section[idx + 2]
+            es_info_length = ((section[idx + 3] & 0x0F) << 8) | section[idx + 4]
+            if idx + 5 + es_info_length > len(section):
+                return  # truncated entry
+            descriptors = section[idx + 5:idx + 5 + es_info_length]
+            self.streams[pid] = stream_type
+            if self.klv_pid is None and is_klv_stream(stream_type, descriptors):
+                self.klv_pid = pid
+                self._pids_changed = True
+            elif stream_type in self.stream_types and pid not in self.pids:
+                self.pids.add(pid)
+                self._pids_changed = True
+            elif stream_type in self.header_stream_types and pid not in self.header_pids:
+                self.header_pids.add(pid)
+                self._pids_changed = True
+            idx += 5 + es_info_length
+
+    def _read_pes(self, pid: int, payload_unit_start: int, buf: bytearray, start: int, end: int,
+                  out: List[PesPacket]) -> None:
+        if payload_unit_start:
+            self._flush_pes(pid, out)  # a PES of unbounded length ends where the next one starts
+            pes = self._pes[pid] = bytearray(buf[start:end])
+        else:
+            pes = self._pes.get(pid)
+            if pes is None:  # joined the stream in the middle of a PES packet
+                return
+            pes += buf[start:end]
+
+        if len(pes) >= 6:
+            pes_length = (pes[4] << 8) | pes[5]
+            if pes_length and len(pes) >= 6 + pes_length:
+                self._flush_pes(pid, out)
+
+    def _flush_pes(self, pid: int, out: List[PesPacket]) -> None:
+        pes = self._pes.pop(pid, None)
+        if pes is not None:
+            packet = parse_pes(pid, pes)
+            if packet is not None:
+                out.append(packet)
+
+
+class TsKlvDecoder:
+    """
+    decoder for MPEG-TS bytes with the same feed() interface as StreamDecoder, it can be given to the
+    receivers in place of one. the KLV PES payloads are decoded with a StreamDecoder
+    klv_pid - PID of the KLV stream, found in the PMT if not given
+    decoder_kwargs - StreamDecoder options
+    """
+
+    def __init__(self, klv_pid: Optional[int] = None, **decoder_kwargs):
+        self.demuxer = TsDemuxer(klv_pid)
+        self.decoder = StreamDecoder(**decoder_kwargs)
+
+    @property
+    def metrics(self) -> Optional[DecodeMetrics]:
+        return self.decoder.metrics
+
+    def _decode(self, pes_packets: List[PesPacket], demux_time: Optional[int]) -> List[dict]:
+        packets = []
+        for pes in pes_packets:
+            if pes.pid == self.demuxer.klv_pid:
+                packets += self.decoder.feed(pes.payload)
+        if demux_time is not None:
+            for _ in packets:
+                self.decoder.metrics.add_latency(demux_time)
+        return packets
+
+    def feed(self, chunk: bytes) -> List[dict]:
+        # latency is measured from the start of the demux of the chunk
+        demux_time = time.perf_counter_ns() if self.decoder.metrics is not None else None
+        return self._decode(self.demuxer.feed(chunk), demux_time)
+
+    def flush(self) -> List[dict]:
+        demux_time = time.perf_counter_ns() if self.decoder.metrics is not None else None
+        return self._decode(self.demuxer.flush(), demux_time)
+
+
+def decode_ts_file(path: str, read_size: int = 2 ** 20, klv_pid: Optional[int] = None,
+                   tags: Optional[Iterable[int]] = None, check_crc: bool = True,
+                   metrics: Optional[DecodeMetrics] = None, delta: Optional[DeltaFilter] = None,
+                   raw: bool = False, decimation: Optional[Decimator] = None) -> Iterator[dict]:
+    """yields the KLV packets of a MPEG-TS recording, read read_size bytes at a time
+    tags, check_crc, raw - see decode_packet
+    metrics, delta, decimation - see StreamDecoder
+    """
+    decoder = TsKlvDecoder(klv_pid, tags=tags, check_crc=check_crc, metrics=metrics, delta=delta, raw=raw,
+                           decimation=decimation)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(read_size)
+            if not chunk:
+                break
+            yield from decoder.feed(chunk)
+    yield from decoder.flush()
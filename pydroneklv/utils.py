@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 def to_hex_padded(num: int) -> str:
     """integer to bytes, using minimum number of bytes necessary"""
     num_hex = hex(num)[2:]  # drop the '0x' part
@@ -7,8 +10,26 @@ def to_hex_padded(num: int) -> str:
     return num_hex
 
 
-def computeCrc(buf: bytes) -> int:
-    crc = 0
-    for i, b in enumerate(buf):
-        crc += b << (8 * ((i + 1) % 2))
-    return crc & 0xffff
\ No newline at end of file
+def word_sum(buf: bytes, start: int = 0, end: Optional[int] = None) -> int:
+    """sum of buf[start:end] taken as 16 bit big endian words, an odd trailing byte counts as
+    the high byte of a last word. the result is not truncated"""
+    if end is None:
+        end = len(buf)
+    # the high bytes of the words are at start, start + 2, ... and the low bytes in between. summing
+    # each half with a stepped slice runs in C over the whole buffer instead of one python iteration
+    # per byte, and slices the input once instead of slicing out the range first
+    return (sum(buf[start:end:2]) << 8) + sum(buf[start + 1:end:2])
+
+
+def computeCrc(buf: bytes, crc: int = 0, offset: int = 0) -> int:
+    """sum of the buffer taken as 16 bit big endian words, truncated to 16 bits
+    an odd trailing byte counts as the high byte of a last word
+
+    crc    - running checksum of the previous bytes, to checksum a buffer in several parts
+    offset - position of buf[0] in the checksummed byte sequence, only its parity matters
+    """
+    start = 0
+    if offset % 2 and len(buf) > 0:  # buf[0] is the low byte of a word started in the previous part
+        crc += buf[0]
+        start = 1
+    return (crc + word_sum(buf, start)) & 0xffff
@@ -9,8 +9,11 @@ setup(
     author_email='dasilva@emfa.pt',
     license='',
     packages=['pydroneklv'],
-    install_requires=['av'
-                      ],
+    install_requires=[],
+    extras_require={'av': ['av'],
+                    'numpy': ['numpy'],
+                    'parquet': ['pyarrow'],
+                    },
 
     classifiers=[
         'Development Status :: 1 - Early development',
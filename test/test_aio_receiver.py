@@ -0,0 +1,67 @@
+import asyncio
+import socket
+import unittest
+
+from pydroneklv.aio_receiver import open_udp_receiver, DROP_NEWEST, DROP_OLDEST, PAUSE
+from pydroneklv.packet_decoder import decode_packet
+from test.test_decode_packet import PKT_BYTES
+
+
+class MyTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.pkt_bytes = PKT_BYTES
+        self.expected = decode_packet(self.pkt_bytes)
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def tearDown(self):
+        self.sender.close()
+
+    async def wait_received(self, receiver, n_packets):
+        while receiver.received_packets < n_packets:
+            await asyncio.sleep(0.01)
+
+    async def test_loopback(self):
+        async with await open_udp_receiver('127.0.0.1', 0) as receiver:
+            # one whole packet, then one split across two datagrams
+            self.sender.sendto(self.pkt_bytes, receiver.local_address)
+            self.sender.sendto(self.pkt_bytes[:20], receiver.local_address)
+            self.sender.sendto(self.pkt_bytes[20:], receiver.local_address)
+
+            packets = []
+            async for packet in receiver:
+                packets.append(packet)
+                if len(packets) == 2:
+                    break
+        self.assertEqual([self.expected] * 2, packets)
+
+    async def test_drop_policies(self):
+        for policy, n_dropped in ((DROP_OLDEST, 3), (DROP_NEWEST, 3), (PAUSE, 0)):
+            with self.subTest(policy=policy):
+                receiver = await open_udp_receiver('127.0.0.1', 0, max_queue_size=2, policy=policy)
+                for i in range(5):
+                    self.sender.sendto(self.pkt_bytes, receiver.local_address)
+                await asyncio.wait_for(self.wait_received(receiver, 2 if policy == PAUSE else 5), 5)
+                self.assertEqual(n_dropped, receiver.dropped_packets)
+                self.assertEqual(2, receiver.queue_size)
+                receiver.close()
+                # queued packets are still delivered after closing
+                self.assertEqual([self.expected] * 2, [packet async for packet in receiver])
+
+    async def test_cancellation(self):
+        receiver = await open_udp_receiver('127.0.0.1', 0)
+        consumer = asyncio.ensure_future(receiver.__anext__())
+        await asyncio.sleep(0.01)
+        consumer.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await consumer
+
+        # the receiver keeps working after a consumer is cancelled
+        self.sender.sendto(self.pkt_bytes, receiver.local_address)
+        self.assertEqual(self.expected, await asyncio.wait_for(receiver.__anext__(), 5))
+        receiver.close()
+        with self.assertRaises(StopAsyncIteration):
+            await receiver.__anext__()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+from pydroneklv.decoder_map import UNIVERSAL_KEY
+from pydroneklv.delta import DeltaFilter
+from pydroneklv.encoders import encode_field, encode_length, encode_packet, mk_crc_field
+from pydroneklv.metrics import DecodeMetrics
+from pydroneklv.packet_decoder import decode_packet
+
+try:
+    import pydroneklv.av_decoder as av_decoder
+except ImportError:
+    av_decoder = None
+
+T0 = 1_600_000_000_000_000  # microseconds
+
+
+def mk_bad_packet() -> bytes:
+    # CRC valid, tag 13 is 3 bytes instead of 4
+    payload = encode_field(2, T0.to_bytes(8, 'big')) + encode_field(13, b'\x00\x01\x02')
+    packet = UNIVERSAL_KEY + encode_length(len(payload) + 4) + payload
+    return packet + mk_crc_field(packet)
+
+
+@unittest.skipIf(av_decoder is None, "PyAV is not installed")
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.packets = [encode_packet({2: T0 + i, 13: 10.0}) for i in range(2)]
+        # the demux of a stream with a bad packet between two good ones
+        patcher = mock.patch.object(av_decoder, 'demux_data_packets',
+                                    lambda path: iter([self.packets[0], mk_bad_packet(), self.packets[1]]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_delta_bad_field(self):
+        deltas = list(av_decoder.decode_from_ts_stream('stream.ts', delta=DeltaFilter()))
+        self.assertEqual([[1, 2, 13], [2]], [sorted(d) for d in deltas])  # tag 13 didn't change
+        self.assertEqual(decode_packet(self.packets[1])[2], deltas[1][2])
+
+        metrics = DecodeMetrics()
+        deltas = list(av_decoder.decode_from_ts_stream('stream.ts', delta=DeltaFilter(), metrics=metrics))
+        self.assertEqual(2, len(deltas))
+        self.assertEqual(1, metrics.decode_errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
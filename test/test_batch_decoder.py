@@ -0,0 +1,97 @@
+import unittest
+
+from pydroneklv.decoder_map import UNIVERSAL_KEY
+from pydroneklv.encoders import encode_field, encode_length, encode_packet, mk_crc_field
+from pydroneklv.packet_decoder import decode_packet
+from test.test_decode_packet import PKT_BYTES
+
+try:
+    import numpy as np
+    from pydroneklv.batch_decoder import decode_batch, verify_crc_batch
+except ImportError:
+    np = None
+
+T0 = 1_600_000_000_000_000  # microseconds
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.pkt_bytes = PKT_BYTES
+        self.expected = decode_packet(self.pkt_bytes)
+
+    def test_matches_decode_packet(self):
+        batch = decode_batch([self.pkt_bytes] * 3)
+        self.assertEqual(3, len(batch))
+        self.assertTrue(batch.valid.all())
+        self.assertEqual(sorted(self.expected), sorted(batch.tags()))
+        for tag, field in self.expected.items():
+            with self.subTest(tag=tag):
+                self.assertTrue(batch.present[tag].all())
+                if isinstance(field.value, float):
+                    self.assertEqual([field.value] * 3, batch[tag].tolist())
+
+        timestamps = batch[2].astype('datetime64[ms]').tolist()
+        self.assertEqual([self.expected[2].value.replace(microsecond=29000)] * 3, timestamps)
+
+    def test_invalid_and_missing(self):
+        corrupted = bytearray(self.pkt_bytes)
+        corrupted[30] ^= 0xFF
+        batch = decode_batch([self.pkt_bytes, bytes(corrupted), b'garbage', self.pkt_bytes])
+        self.assertEqual([True, False, False, True], batch.valid.tolist())
+        self.assertEqual([True, False, False, True], batch.present[5].tolist())
+        self.assertTrue(np.isnan(batch[5][1:3]).all())
+
+    def test_field_decode_error(self):
+        good = encode_packet({2: 1, 72: T0})
+        payload = encode_field(2, b'\x00' * 8) + encode_field(72, b'\x00\x01\x02')  # 3 bytes instead of 8
+        bad = UNIVERSAL_KEY + encode_length(len(payload) + 4) + payload
+        bad += mk_crc_field(bad)
+        batch = decode_batch([good, bad, good])
+        self.assertEqual([True, True, True], batch.valid.tolist())
+        self.assertEqual([True, False, True], batch.present[72].tolist())
+        self.assertIsNone(batch[72][1])
+        self.assertEqual(decode_packet(good)[72].value, batch[72][2])
+
+    def test_malformed_lengths(self):
+        key = self.pkt_bytes[:16]
+        overrun = bytearray(self.pkt_bytes)
+        overrun[19:23] = b'\x83\xff\xff\xff'  # tag 2 length past the end of the payload
+        long_form = key + b'\x06\x0d\x84\x00\x00\x00\x01'  # tag 13 length over 5 bytes, the payload has 4
+        packets = [key + b'\x84\x00', bytes(overrun), long_form, self.pkt_bytes]
+        batch = decode_batch(packets, check_crc=False)
+        self.assertEqual([False, False, False, True], batch.valid.tolist())
+        self.assertEqual([False, False, False, True], batch.present[13].tolist())
+
+    def test_tags_projection(self):
+        batch = decode_batch([self.pkt_bytes], tags=[13, 14])
+        self.assertEqual([13, 14], sorted(batch.tags()))
+        self.assertEqual(self.expected[13].value, batch[13][0])
+
+    def test_raw(self):
+        from pydroneklv.decoder_map import scale_raw_value
+        raw_packet = decode_packet(self.pkt_bytes, raw=True)
+        batch = decode_batch([self.pkt_bytes, b'garbage'], tags=[2, 5, 13], raw=True)
+        self.assertEqual(np.int64, batch[2].dtype)
+        self.assertEqual([raw_packet[2].value, 0], batch[2].tolist())
+        self.assertEqual(np.uint16, batch[5].dtype)
+        self.assertEqual([raw_packet[5].value, 0], batch[5].tolist())
+        self.assertEqual([False], batch.present[13][1:].tolist())
+        np.testing.assert_allclose(decode_batch([self.pkt_bytes], tags=[13])[13], scale_raw_value(13, batch[13][:1]))
+
+    def test_verify_crc_batch(self):
+        corrupted = bytearray(self.pkt_bytes)
+        corrupted[30] ^= 0xFF
+        stream = b''
+        starts, ends = [], []
+        for i, pkt in enumerate([self.pkt_bytes, bytes(corrupted), self.pkt_bytes, self.pkt_bytes]):
+            stream += b'x' * i  # garbage of varying size, so packets start at odd and even indices
+            starts.append(len(stream))
+            stream += pkt
+            ends.append(len(stream))
+        mask = verify_crc_batch(stream, starts, ends)
+        self.assertEqual([True, False, True, True], mask.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
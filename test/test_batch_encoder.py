@@ -0,0 +1,52 @@
+import datetime
+import unittest
+
+from pydroneklv.encoders import encode_packet
+from pydroneklv.stream_decoder import StreamDecoder
+
+try:
+    import numpy as np
+    from pydroneklv.batch_encoder import encode_batch, iter_synthetic_stream, synthetic_columns
+except ImportError:
+    np = None
+
+START = datetime.datetime(2021, 5, 3, 14, 2)
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class MyTestCase(unittest.TestCase):
+    def test_matches_encode_packet(self):
+        columns = synthetic_columns(10, START, rng=np.random.default_rng(0))
+        constants = {3: 'MISSION01', 65: 8}
+        buf = encode_batch(columns, constants)
+        packet_size = len(buf) // 10
+        for i in range(10):
+            with self.subTest(i=i):
+                values = {2: int(columns[2][i])}
+                values.update(constants)
+                values.update({tag: float(column[i]) for tag, column in columns.items() if tag != 2})
+                self.assertEqual(encode_packet(values), buf[i * packet_size:(i + 1) * packet_size])
+
+    def test_datetime64_and_clamping(self):
+        timestamps = np.array([START, START + datetime.timedelta(seconds=1)], dtype='datetime64[us]')
+        buf = encode_batch({2: timestamps, 6: [100.0, -100.0]})
+        packets = list(StreamDecoder().feed(buf))
+        self.assertEqual([START, START + datetime.timedelta(seconds=1)], [p[2].value for p in packets])
+        self.assertEqual([20.0, -20.0], [p[6].value for p in packets])
+        with self.assertRaises(ValueError):
+            encode_batch({3: ['MISSION01']})
+
+    def test_synthetic_stream(self):
+        decoder = StreamDecoder()
+        packets = [p for chunk in iter_synthetic_stream(250, START, batch_size=100, seed=1)
+                   for p in decoder.feed(chunk)]
+        self.assertEqual(250, len(packets))
+        self.assertEqual(0, decoder.crc_errors)
+        self.assertEqual('MISSION01', packets[0][3].value)
+        self.assertEqual(START + datetime.timedelta(seconds=249 / 30), packets[-1][2].value)
+        # consecutive batches continue the same track
+        self.assertLess(abs(packets[100][13].value - packets[99][13].value), 1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import socket
+import unittest
+
+try:
+    from pydroneklv.av_decoder import decimated
+except ImportError:
+    decimated = None
+
+from pydroneklv.decimation import EveryNth, FixedRate, OnChange
+from pydroneklv.decoder_map import UNIVERSAL_KEY
+from pydroneklv.errors import ByteArrayTooSmall
+from pydroneklv.encoders import encode_field, encode_length, encode_packet, mk_crc_field
+from pydroneklv.multi_receiver import MultiFeedReceiver
+from pydroneklv.stream_decoder import StreamDecoder
+from pydroneklv.ts_demuxer import TsKlvDecoder
+from test.test_ts_demuxer import mk_ts_stream
+
+T0 = 1_600_000_000_000_000  # microseconds, on a second boundary
+FRAME_US = 33_367  # 29.97 Hz
+
+
+def mk_stream(n_packets: int) -> list:
+    # heading turns by 1.5 degrees per packet, crossing north, the mission id changes once
+    return [encode_packet({2: T0 + i * FRAME_US, 3: 'MISSION01' if i < 50 else 'MISSION02',
+                           5: (300.0 + 1.5 * i) % 360, 13: 10.0})
+            for i in range(n_packets)]
+
+
+def timestamps(packets):
+    return [(packet[2].value - packets[0][2].value).total_seconds() for packet in packets]
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.packets = mk_stream(60)
+        self.stream = b''.join(self.packets)
+
+    def test_every_nth(self):
+        decoder = StreamDecoder(decimation=EveryNth(4))
+        packets = decoder.feed(self.stream)
+        self.assertEqual(15, len(packets))
+        self.assertEqual([i * 4 * FRAME_US / 1e6 for i in range(15)], timestamps(packets))
+        self.assertEqual(45, decoder.decimated_packets)
+        self.assertEqual((15, 45), (decoder.decimation.kept_packets, decoder.decimation.dropped_packets))
+        self.assertRaises(ValueError, EveryNth, 0)
+
+    def test_fixed_rate(self):
+        decoder = StreamDecoder(decimation=FixedRate(5))
+        packets = []
+        for i in range(0, len(self.stream), 100):
+            packets += decoder.feed(self.stream[i:i + 100])
+        # the first packet of every 200 ms period of stream time
+        self.assertEqual(10, len(packets))
+        for i, t in enumerate(timestamps(packets)):
+            self.assertLess(abs(t - i * 0.2), FRAME_US / 1e6)
+
+        decoder.reset()
+        self.assertEqual(1, len(decoder.feed(self.packets[-1])))
+        self.assertRaises(ValueError, FixedRate, 0)
+
+    def test_on_change(self):
+        decoder = StreamDecoder(decimation=OnChange({3: None, 5: 10.0}))
+        packets = decoder.feed(self.stream)
+        headings = [round(packet[5].value, 1) for packet in packets]
+        # every 7 packets for 10 degrees, across north too, and when the mission changes
+        self.assertEqual([300.0, 310.5, 321.0, 331.5, 342.0, 352.5, 3.0, 13.5, 15.0, 25.5], headings)
+        self.assertEqual('MISSION02', packets[8][3].value)
+
+        decoder = StreamDecoder(decimation=OnChange({13: 1.0}, max_interval=1))
+        self.assertEqual([0, 1], [round(t) for t in timestamps(decoder.feed(self.stream))])
+
+    def test_skipped_undecoded(self):
+        corrupted = bytearray(self.packets[1])
+        corrupted[-1] ^= 0xFF
+        # a false universal key in the garbage isn't skipped as a whole packet
+        stream = self.packets[0] + bytes(corrupted) + b'\x00' + UNIVERSAL_KEY + b'\x10' + self.packets[2]
+        decoder = StreamDecoder(decimation=EveryNth(2))
+        packets = decoder.feed(stream)
+        self.assertEqual([0.0, 2 * FRAME_US / 1e6], timestamps(packets))
+        self.assertEqual(1, decoder.crc_errors)  # the false key, the corrupted packet was never checked
+
+    def test_malformed(self):
+        # a tag 13 with a 2 bytes payload, the CRC is valid so only the decimation reads the field wrong
+        payload = encode_field(2, self.packets[0][19:27]) + encode_field(13, b'\x00\x01')
+        packet = UNIVERSAL_KEY + encode_length(len(payload) + 4) + payload
+        packet += mk_crc_field(packet)
+        decoder = StreamDecoder(decimation=OnChange({13: 0.001}))
+        packets = decoder.feed(self.packets[0] + packet + self.packets[1])
+        self.assertEqual([0.0], timestamps(packets))
+        self.assertEqual((1, 1), (decoder.decode_errors, decoder.decimated_packets))
+        self.assertEqual(0, decoder.pending)
+        for stream_packet in self.packets[2:5]:
+            self.assertEqual(0, len(decoder.feed(packet + stream_packet)))  # tag 13 didn't change
+            self.assertEqual(0, decoder.pending)
+        self.assertEqual((4, 4), (decoder.decode_errors, decoder.decimated_packets))
+
+    @unittest.skipIf(decimated is None, "PyAV is not installed")
+    def test_malformed_av(self):
+        # a truncated timestamp, PyAV packets hold one KLV packet each and are dropped
+        packet = UNIVERSAL_KEY + b'\x0e' + encode_field(2, b'\x00' * 8)[:6]
+        self.assertRaises(ByteArrayTooSmall, FixedRate(5).keep, packet, 0)
+        self.assertEqual([self.packets[0]], list(decimated([packet, self.packets[0]], FixedRate(5))))
+
+    def test_receiver(self):
+        with MultiFeedReceiver(decoder_factory=TsKlvDecoder) as receiver, \
+                socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            feed = receiver.add_feed('uav1', '127.0.0.1', 0, decimation=FixedRate(1))
+            self.assertRaises(ValueError, receiver.add_feed, 'uav2', '127.0.0.1', 0, StreamDecoder(), FixedRate(1))
+            stream = mk_ts_stream(self.packets)
+            for i in range(0, len(stream), 1316):
+                sender.sendto(stream[i:i + 1316], feed.local_address)
+
+            packets = []
+            while len(packets) < 2:
+                polled = receiver.poll(5)
+                self.assertTrue(polled, 'timed out')
+                packets += [packet for _, packet in polled]
+            self.assertEqual([0.0, 30 * FRAME_US / 1e6], timestamps(packets))
+
+
+if __name__ == '__main__':
+    unittest.main()
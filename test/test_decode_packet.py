@@ -1,7 +1,9 @@
 import unittest
 
-from pydroneklv.packet_decoder import decode_packet
+from pydroneklv.packet_decoder import decode_packet, DecodeCache
+from pydroneklv.errors import CRCError
 import pydroneklv.decoder_map as decoder_map
+from pydroneklv.decoders import decode_timestamp_seconds
 import pydroneklv.encoders as encoders
 
 from typing import List, TypedDict, Any
@@ -53,6 +55,10 @@ class TestPacket:
         self.pkt_bytes: bytes = mk_packet(payload)
 
 
+# bytes of the sample packet, for the other test modules
+PKT_BYTES = TestPacket().pkt_bytes
+
+
 def compare_klv_values(tag: int, v1: Any, v2: Any) -> bool:
     """if there is a resolution to a specific KLV field, use that as margin of error
     otherwise, check equality"""
@@ -84,3 +90,138 @@ class MyTestCase(unittest.TestCase):
                 decoded_val = self.decoded[f.tag].value
                 self.assertTrue(compare_klv_values(f.tag, f.value, decoded_val),
                                 f'tag {f.tag} {f.value} =/= {decoded_val}')
+
+
+class TestLazyPacket(unittest.TestCase):
+    def setUp(self):
+        self.pkt: TestPacket = TestPacket()
+        self.decoded = decode_packet(self.pkt.pkt_bytes)
+        self.lazy = decode_packet(self.pkt.pkt_bytes, lazy=True)
+
+    def test_dict_interface(self):
+        self.assertEqual(list(self.decoded.keys()), list(self.lazy.keys()))
+        self.assertEqual(len(self.decoded), len(self.lazy))
+        self.assertIn(13, self.lazy)
+        self.assertNotIn(200, self.lazy)
+        self.assertIsNone(self.lazy.get(200))
+        self.assertEqual(self.decoded, dict(self.lazy))
+        self.assertRaises(KeyError, lambda: self.lazy[200])
+
+    def test_decodes_on_access(self):
+        self.assertIsNone(self.lazy._cache)
+        field = self.lazy[13]
+        self.assertEqual(self.decoded[13], field)
+        self.assertIs(field, self.lazy[13])
+        self.assertEqual([13], list(self.lazy._cache))
+
+    def test_slots(self):
+        self.assertFalse(hasattr(self.lazy, '__dict__'))
+
+
+class TestZeroCopy(unittest.TestCase):
+    def setUp(self):
+        self.pkt: TestPacket = TestPacket()
+        self.decoded = decode_packet(self.pkt.pkt_bytes)
+        self.recording = b'garbage' + self.pkt.pkt_bytes + b'garbage'
+
+    def test_buffer_types(self):
+        for buf in (self.recording, bytearray(self.recording), memoryview(self.recording)):
+            with self.subTest(buf_type=type(buf)):
+                self.assertEqual(self.decoded, decode_packet(buf))
+                self.assertEqual(self.decoded, decode_packet(buf, start_index=3))
+                self.assertEqual(self.decoded, dict(decode_packet(buf, lazy=True)))
+
+    def test_no_copy(self):
+        decoded = decode_packet(memoryview(self.recording), copy=False)
+        for tag, field in self.decoded.items():
+            with self.subTest(tag=tag):
+                self.assertIsInstance(decoded[tag].bytes, memoryview)
+                self.assertEqual(field.bytes, decoded[tag].bytes)
+                self.assertEqual(field.value, decoded[tag].value)
+
+        lazy = decode_packet(self.recording, lazy=True, copy=False)
+        self.assertIsInstance(lazy.raw(13), memoryview)
+        self.assertIsInstance(lazy[13].bytes, memoryview)
+        self.assertEqual(self.decoded[13], lazy[13])
+
+    def test_lazy_copy(self):
+        # a reused receive buffer is changed and resized while the lazy packet is still in use
+        buf = bytearray(self.recording)
+        lazy = decode_packet(buf, lazy=True)
+        buf[:] = bytes(len(buf))
+        buf += b'next chunk'
+        self.assertEqual(self.decoded, dict(lazy))
+
+
+class TestTagsProjection(unittest.TestCase):
+    def setUp(self):
+        self.pkt: TestPacket = TestPacket()
+        self.decoded = decode_packet(self.pkt.pkt_bytes)
+        self.tags = [2, 13, 14, 15]
+
+    def test_projection(self):
+        expected = {tag: self.decoded[tag] for tag in self.tags}
+        self.assertEqual(expected, decode_packet(self.pkt.pkt_bytes, tags=self.tags))
+        self.assertEqual(expected, dict(decode_packet(self.pkt.pkt_bytes, tags=self.tags, lazy=True)))
+        self.assertEqual({}, decode_packet(self.pkt.pkt_bytes, tags=[200]))
+
+    def test_check_crc(self):
+        corrupted = bytearray(self.pkt.pkt_bytes)
+        corrupted[-1] ^= 0xFF
+        self.assertRaises(CRCError, decode_packet, corrupted, tags=self.tags)
+        self.assertEqual(self.decoded[13], decode_packet(corrupted, tags=self.tags, check_crc=False)[13])
+
+
+class TestDecodeCache(unittest.TestCase):
+    def setUp(self):
+        self.pkt: TestPacket = TestPacket()
+        self.decoded = decode_packet(self.pkt.pkt_bytes)
+
+    def test_shared_fields(self):
+        cache = DecodeCache()
+        first = decode_packet(self.pkt.pkt_bytes, cache=cache)
+        second = decode_packet(bytearray(self.pkt.pkt_bytes), copy=False, cache=cache)
+        self.assertEqual(self.decoded, first)
+        self.assertEqual(self.decoded, second)
+        for tag in (3, 4, 10, 11, 12, 65):
+            self.assertIs(first[tag], second[tag])
+            self.assertIsInstance(second[tag].bytes, bytes)
+        self.assertIsNot(first[13], second[13])
+        self.assertEqual({'hits': 6, 'misses': 6, 'hit_rate': 0.5, 'size': 6}, cache.stats())
+
+    def test_bounded(self):
+        cache = DecodeCache(max_size=2, tags=[59])
+        for call_sign in ('A', 'B', 'A', 'C', 'B'):
+            self.assertEqual(call_sign, cache.field(59, call_sign.encode()).value)
+        self.assertEqual(2, len(cache))
+        self.assertEqual((1, 4), (cache.hits, cache.misses))
+        self.assertEqual({2: self.decoded[2]}, decode_packet(self.pkt.pkt_bytes, tags=[2], cache=cache))
+
+
+class TestRawMode(unittest.TestCase):
+    def setUp(self):
+        self.pkt: TestPacket = TestPacket()
+        self.decoded = decode_packet(self.pkt.pkt_bytes)
+
+    def test_raw_values(self):
+        raw = decode_packet(self.pkt.pkt_bytes, raw=True)
+        self.assertEqual(list(self.decoded), list(raw))
+        self.assertEqual(decode_timestamp_seconds(self.decoded[2].bytes), raw[2].value)
+        for tag, field in self.decoded.items():
+            with self.subTest(tag=tag):
+                self.assertEqual(field.bytes, raw[tag].bytes)
+                type_data = decoder_map.klv_dispatch_table[tag]
+                if type_data.struct is not None:
+                    self.assertIsInstance(raw[tag].value, int)
+                if tag in decoder_map.scaling_table:
+                    self.assertAlmostEqual(field.value, decoder_map.scale_raw_value(tag, raw[tag].value))
+                elif tag != 2:
+                    self.assertEqual(field.value, raw[tag].value)
+        self.assertEqual(raw, dict(decode_packet(self.pkt.pkt_bytes, lazy=True, raw=True)))
+
+    def test_raw_cache(self):
+        self.assertRaises(ValueError, decode_packet, self.pkt.pkt_bytes, raw=True, cache=DecodeCache())
+        cache = DecodeCache(tags=[65], raw=True)
+        first = decode_packet(self.pkt.pkt_bytes, raw=True, cache=cache)
+        self.assertIs(first[65], decode_packet(self.pkt.pkt_bytes, raw=True, cache=cache)[65])
+        self.assertEqual(decode_packet(self.pkt.pkt_bytes, raw=True), first)
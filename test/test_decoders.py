@@ -1,7 +1,11 @@
 import unittest
 import struct
-from pydroneklv.decoder_map import klv_types_data
+import random
+from pydroneklv.decoder_map import klv_types_data, klv_dispatch_table, UNIVERSAL_KEY
+from pydroneklv.utils import computeCrc
 import pydroneklv.decoders as decoders
+import pydroneklv.encoders as encoders
+from pydroneklv.packet_decoder import decode_packet
 
 struct_letters =\
     {'uint8': 'B',
@@ -81,6 +85,44 @@ class MyTestCase(unittest.TestCase):
 
         self.assertEqual(decoders.decodeAltitude(packet_payload), true_value)
 
+    def test_dispatch_table(self):
+        self.assertEqual(256, len(klv_dispatch_table))
+        for tag, packet_type_data in enumerate(klv_dispatch_table):
+            with self.subTest(f"tag {tag} | {packet_type_data.description} | dispatch entry"):
+                if tag in klv_types_data:
+                    self.assertIs(klv_types_data[tag], packet_type_data)
+                else:
+                    self.assertEqual(b'\x01\x02', packet_type_data.decode_func(b'\x01\x02'))
+                if packet_type_data.input_type in struct_letters:
+                    self.assertEqual('>' + struct_letters[packet_type_data.input_type],
+                                     packet_type_data.struct.format)
+
+    def test_decode_string(self):
+        self.assertEqual('MISSION01', decoders.decodeString(memoryview(b'MISSION01')))
+        # a non-ASCII mission id doesn't fail the packet
+        payload = encoders.encode_field(3, b'MISSION\xe901')
+        packet = UNIVERSAL_KEY + encoders.encode_length(len(payload) + 4) + payload
+        packet += encoders.mk_crc_field(packet)
+        self.assertEqual('MISSION\ufffd01', decode_packet(packet)[3].value)
+        self.assertEqual(b'MISSION\xe901', decode_packet(packet)[3].bytes)
+
+    def test_compute_crc(self):
+        def reference_crc(buf):
+            crc = 0
+            for i, b in enumerate(buf):
+                crc += b << (8 * ((i + 1) % 2))
+            return crc & 0xffff
+
+        rnd = random.Random(0)
+        for size in (0, 1, 2, 3, 31, 32, 1001):
+            buf = bytes(rnd.randrange(256) for _ in range(size))
+            with self.subTest(size=size):
+                self.assertEqual(reference_crc(buf), computeCrc(buf))
+                self.assertEqual(reference_crc(buf), computeCrc(memoryview(buf)))
+                for split in (0, 1, size // 2):
+                    first, second = buf[:split], buf[split:]
+                    self.assertEqual(reference_crc(buf), computeCrc(second, computeCrc(first), len(first)))
+
 
 if __name__ == '__main__':
     unittest.main()
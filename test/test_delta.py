@@ -0,0 +1,70 @@
+import unittest
+
+from pydroneklv.delta import DeltaFilter
+from pydroneklv.decoder_map import UNIVERSAL_KEY
+from pydroneklv.encoders import encode_length, encode_packet, mk_crc_field
+from pydroneklv.packet_decoder import decode_packet
+from pydroneklv.stream_decoder import StreamDecoder
+from pydroneklv.ts_demuxer import TsKlvDecoder
+from test.test_ts_demuxer import mk_ts_stream
+
+T0 = 1_600_000_000_000_000  # microseconds
+
+
+def mk_packets(n: int, period_us: int = 100_000):
+    # tag 2 changes every packet, tag 13 every other packet, tag 3 never
+    return [encode_packet({2: T0 + i * period_us, 3: 'MISSION01', 13: 40.0 + i // 2, 65: 8}) for i in range(n)]
+
+
+class MyTestCase(unittest.TestCase):
+    def test_changed_fields(self):
+        packets = mk_packets(4)
+        deltas = StreamDecoder(delta=DeltaFilter(keyframe_interval=None)).feed(b''.join(packets))
+        self.assertEqual(decode_packet(packets[0]), deltas[0])
+        self.assertTrue(deltas[0].keyframe)
+        self.assertEqual([[2], [2, 13], [2]], [sorted(d) for d in deltas[1:]])
+        self.assertFalse(any(d.keyframe for d in deltas[1:]))
+        self.assertEqual(decode_packet(packets[2])[13], deltas[2][13])
+
+    def test_keyframe_interval(self):
+        deltas = StreamDecoder(delta=DeltaFilter(keyframe_interval=3)).feed(b''.join(mk_packets(7)))
+        self.assertEqual([True, False, False, True, False, False, True], [d.keyframe for d in deltas])
+        self.assertEqual(5, len(deltas[3]))  # every field, checksum included
+
+    def test_keyframe_seconds(self):
+        deltas = StreamDecoder(delta=DeltaFilter(keyframe_interval=None, keyframe_seconds=0.25)) \
+            .feed(b''.join(mk_packets(7)))
+        self.assertEqual([True, False, False, True, False, False, True], [d.keyframe for d in deltas])
+
+    def test_missing_field(self):
+        delta = DeltaFilter(keyframe_interval=None)
+        decoder = StreamDecoder(delta=delta)
+        decoder.feed(encode_packet({2: T0, 3: 'MISSION01'}))
+        self.assertEqual([2], sorted(decoder.feed(encode_packet({2: T0 + 1}))[0]))
+        self.assertEqual([2, 3], sorted(decoder.feed(encode_packet({2: T0 + 2, 3: 'MISSION01'}))[0]))
+        self.assertEqual((6, 0), (delta.emitted_fields, delta.skipped_fields))
+
+    def test_bad_packet(self):
+        # tag 13 of the second packet is 3 bytes, it fails to decode after its mission id was compared
+        bad = bytearray(encode_packet({2: T0 + 1, 3: 'MISSION02', 13: 41.0}))
+        payload = bad[17:-4].replace(b'\x0d\x04', b'\x0d\x03', 1)[:-1]
+        bad = UNIVERSAL_KEY + encode_length(len(payload) + 4) + payload
+        bad += mk_crc_field(bad)
+        delta = DeltaFilter(keyframe_interval=2)
+        decoder = StreamDecoder(delta=delta)
+        deltas = decoder.feed(encode_packet({2: T0, 3: 'MISSION01', 13: 40.0}) + bad +
+                              encode_packet({2: T0 + 2, 3: 'MISSION02', 13: 40.0}))
+        self.assertEqual(1, decoder.decode_errors)
+        # the mission id is emitted with the packet after, which isn't a keyframe
+        self.assertEqual([True, False], [d.keyframe for d in deltas])
+        self.assertEqual([2, 3], sorted(deltas[1]))
+        self.assertEqual('MISSION02', deltas[1][3].value)
+
+    def test_ts(self):
+        decoder = TsKlvDecoder(delta=DeltaFilter())
+        deltas = decoder.feed(mk_ts_stream(mk_packets(4))) + decoder.flush()
+        self.assertEqual([[1, 2, 3, 13, 65], [2], [2, 13], [2]], [sorted(d) for d in deltas])
+
+
+if __name__ == '__main__':
+    unittest.main()
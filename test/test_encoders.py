@@ -0,0 +1,44 @@
+import datetime
+import unittest
+
+import pydroneklv.encoders as encoders
+from pydroneklv.decoder_map import klv_types_data
+from pydroneklv.decoders import decode_length
+from pydroneklv.packet_decoder import decode_packet
+from test.test_decode_packet import PKT_BYTES
+
+
+class MyTestCase(unittest.TestCase):
+    def test_encode_length(self):
+        for length in (0, 1, 127, 128, 255, 256, 65535, 70000, 2 ** 32):
+            with self.subTest(length=length):
+                encoded = encoders.encode_length(length)
+                self.assertEqual((len(encoded), length), decode_length(encoded))
+        self.assertEqual(b'\x7f', encoders.encode_length(127))
+        self.assertEqual(b'\x81\x80', encoders.encode_length(128))
+
+    def test_examples(self):
+        for tag, type_data in klv_types_data.items():
+            if type_data.example_input_output_values is None:
+                continue
+            with self.subTest(tag=tag):
+                in_, out_ = type_data.example_input_output_values
+                self.assertEqual(bytes.fromhex(in_), encoders.klv_encoder_table[tag](out_))
+
+    def test_round_trip(self):
+        pkt_bytes = PKT_BYTES
+        values = {tag: field.value for tag, field in decode_packet(pkt_bytes).items() if tag != 1}
+        self.assertEqual(pkt_bytes, encoders.encode_packet(values))
+
+    def test_values(self):
+        self.assertEqual(encoders.encode_value(2, 1_600_000_000_000_000),
+                         encoders.encode_value(2, datetime.datetime(2020, 9, 13, 12, 26, 40)))
+        # out of range values are clamped to the limits of the type
+        self.assertEqual(b'\x7f\xff', encoders.klv_encoder_table[6](100.0))
+        self.assertEqual(b'\x80\x01', encoders.klv_encoder_table[6](-100.0))
+        packet = decode_packet(encoders.encode_packet({2: 0, 34: 2, 48: b'\x01\x02', 59: 'CALL'}))
+        self.assertEqual([2, b'\x01\x02', 'CALL'], [packet[34].value, bytes(packet[48].value), packet[59].value])
+
+
+if __name__ == '__main__':
+    unittest.main()
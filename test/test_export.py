@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from pydroneklv.packet_decoder import decode_packet
+from test.test_decode_packet import PKT_BYTES
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pydroneklv.export import ColumnarWriter, export_packets, read_columns
+except ImportError:
+    pa = None
+
+
+@unittest.skipIf(pa is None, "pyarrow is not installed")
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.expected = decode_packet(PKT_BYTES)
+        self.partial = decode_packet(PKT_BYTES, tags=[2, 5, 13])
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'telemetry.parquet')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        packets = [self.expected, self.partial] * 5
+        self.assertEqual(10, export_packets(packets, self.path, row_group_size=4))
+        table = read_columns(self.path)
+        self.assertEqual(10, table.num_rows)
+
+        for tag, field in self.expected.items():
+            with self.subTest(tag=tag):
+                column = table.column(str(tag)).to_pylist()
+                value = field.value if not isinstance(field.value, (bytes, memoryview)) else bytes(field.value)
+                self.assertEqual(value, column[0])
+                if tag in self.partial:
+                    self.assertEqual(value, column[1])
+                else:
+                    self.assertIsNone(column[1])
+
+        self.assertEqual(3, pq.ParquetFile(self.path).metadata.num_row_groups)
+
+    def test_selected_columns(self):
+        with ColumnarWriter(self.path, tags=[2, 13, 3]) as writer:
+            writer.write(self.expected)
+            writer.write({})
+        table = read_columns(self.path, tags=[13, 3])
+        self.assertEqual(['13', '3'], table.column_names)
+        self.assertEqual([self.expected[13].value, None], table.column('13').to_pylist())
+        self.assertEqual(pa.float64(), table.schema.field('13').type)
+        self.assertEqual(b'Sensor latitude', read_columns(self.path).schema.field('13').metadata[b'description'])
+
+
+if __name__ == '__main__':
+    unittest.main()
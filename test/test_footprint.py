@@ -0,0 +1,69 @@
+import unittest
+
+from pydroneklv.encoders import encode_packet, encode_field, encode_value
+
+from test.test_decode_packet import mk_packet
+
+try:
+    import numpy as np
+    from pydroneklv.batch_decoder import decode_batch
+    from pydroneklv.footprint import compute_footprints
+except ImportError:
+    np = None
+
+T0 = 1_600_000_000_000_000  # microseconds
+
+
+def mk_footprint_packet(lat: float, lon: float, half_size: float, **extra) -> bytes:
+    # square footprint around the frame center, corners clockwise from the upper left
+    offsets = ((half_size, -half_size), (half_size, half_size), (-half_size, half_size), (-half_size, -half_size))
+    values = {2: T0, 23: lat, 24: lon, 25: 100.0}
+    for i, (lat_offset, lon_offset) in enumerate(offsets):
+        values[26 + 2 * i] = lat_offset
+        values[27 + 2 * i] = lon_offset
+    values.update(extra)
+    return encode_packet(values)
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class MyTestCase(unittest.TestCase):
+    def test_footprints(self):
+        packets = [mk_footprint_packet(0.0, 10.0, 0.01),
+                   mk_footprint_packet(60.0, 179.995, 0.01),
+                   encode_packet({2: T0, 23: 45.0, 24: 5.0})]
+        footprints = compute_footprints(decode_batch(packets))
+        self.assertEqual([True, True, False], footprints.valid.tolist())
+        np.testing.assert_allclose([0.0, 10.0, 100.0], footprints.center[0], atol=0.1)
+        np.testing.assert_allclose([0.01, 9.99], footprints.corners[0, 0], atol=1e-5)
+
+        polygons = footprints.polygons()
+        self.assertEqual((3, 5, 2), polygons.shape)
+        np.testing.assert_array_equal(polygons[:, 0], polygons[:, 4])
+        np.testing.assert_allclose([9.99, 0.01], polygons[0, 0], atol=1e-5)
+        # the footprint crossing the antimeridian wraps to negative longitudes
+        self.assertLess(footprints.corners[1, 1, 1], -179)
+
+        # about 2.2 km side at the equator, half as wide at 60 degrees of latitude
+        areas = footprints.areas()
+        side = 6371008.8 * np.radians(0.02)
+        np.testing.assert_allclose(side ** 2, areas[0], rtol=1e-3)
+        np.testing.assert_allclose(side ** 2 / 2, areas[1], rtol=1e-3)
+        self.assertTrue(np.isnan(areas[2]))
+        np.testing.assert_allclose([9.99, -0.01, 10.01, 0.01], footprints.bounds()[0], atol=1e-5)
+
+    def test_full_corners_and_error_indicator(self):
+        full_corners = {82: 1.0, 83: 2.0, 84: 1.0, 85: 3.0, 86: 0.0, 87: 3.0, 88: 0.0, 89: 2.0}
+        packet = encode_packet({2: T0, 23: 0.5, 24: 2.5, **full_corners})
+        # 0x8000 is the error indicator of the offsets, it decodes out of their +-0.075 range
+        fields = [encode_value(2, T0), encode_value(23, 0.0), encode_value(24, 0.0), encode_field(26, b'\x80\x00')]
+        fields += [encode_value(tag, 0.01) for tag in range(27, 34)]
+        error_packet = mk_packet({'fields': [], 'bytes': b''.join(fields)})
+        footprints = compute_footprints(decode_batch([packet, error_packet]))
+        np.testing.assert_allclose([[1, 2], [1, 3], [0, 3], [0, 2]], footprints.corners[0], atol=1e-6)
+        self.assertFalse(footprints.valid[1])
+        self.assertTrue(np.isnan(footprints.corners[1, 0, 0]))
+        self.assertEqual(0.01, round(footprints.corners[1, 0, 1], 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
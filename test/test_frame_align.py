@@ -0,0 +1,104 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from pydroneklv.encoders import encode_packet
+from pydroneklv.frame_align import FrameAligner, TsFrameAligner, align_ts_file, interpolate_packet, PTS_MODULO
+from pydroneklv.packet_decoder import decode_packet
+from test.test_ts_demuxer import mk_pat, mk_pmt, mk_pes, mk_ts_packets, VIDEO_PID, KLV_PID
+
+T0 = datetime.datetime(2020, 1, 1)
+
+
+def mk_klv(i: int) -> bytes:
+    # heading crosses north between the packets 1 and 2
+    return encode_packet({2: T0 + datetime.timedelta(seconds=i), 5: (350.0 + 5 * i) % 360, 13: 10.0 + i})
+
+
+class MyTestCase(unittest.TestCase):
+    def test_nearest(self):
+        aligner = FrameAligner(reorder_depth=0)
+        out = aligner.add_frame(0) + aligner.add_klv(1000, 'a') + aligner.add_frame(2000) + aligner.add_frame(4000)
+        out += aligner.add_klv(5000, 'b') + aligner.add_frame(6000) + aligner.flush()
+        self.assertEqual([(0, 'a', 1000), (2000, 'a', 1000), (4000, 'b', 5000), (6000, 'b', 5000)], out)
+        self.assertEqual(4, aligner.frames)
+
+    def test_previous_and_max_distance(self):
+        aligner = FrameAligner(method='previous', max_distance=1500, reorder_depth=0)
+        out = aligner.add_frame(0) + aligner.add_klv(1000, 'a') + aligner.add_frame(2000) + aligner.add_frame(3000)
+        out += aligner.flush()
+        self.assertEqual([(0, None, None), (2000, 'a', 1000), (3000, None, None)], out)
+        self.assertEqual(2, aligner.unmatched_frames)
+        self.assertRaises(ValueError, FrameAligner, 'closest')
+
+    def test_reorder_and_wrap(self):
+        aligner = FrameAligner(reorder_depth=2)
+        start = PTS_MODULO - 3000
+        out = []
+        # B-frames come after the frames they are shown between, and the pts rolls over
+        for pts in (start, start + 9000, start + 3000, start + 6000):
+            out += aligner.add_frame(pts % PTS_MODULO)
+            out += aligner.add_klv(pts % PTS_MODULO, pts)
+        out += aligner.flush()
+        self.assertEqual([start, start + 3000, start + 6000, start + 9000], [frame.pts for frame in out])
+        self.assertEqual([frame.pts for frame in out], [frame.packet for frame in out])
+
+    def test_bounded(self):
+        aligner = FrameAligner(reorder_depth=0, max_pending=3)
+        out = aligner.add_klv(0, 'a')
+        for pts in range(1, 100):
+            out += aligner.add_frame(pts * 3000)
+            out += aligner.add_klv(pts * 3000 + 1, pts)
+            self.assertLessEqual(len(aligner._klv_pts), 2)
+        self.assertEqual(list(range(1, 100)), [frame.packet for frame in out])
+
+        # without KLV packets, frames wait for at most max_pending frames
+        for pts in range(100, 110):
+            out += aligner.add_frame(pts * 3000)
+        self.assertEqual(106, len(out))
+        self.assertEqual(3, len(aligner._pending))
+
+    def test_interpolate(self):
+        before, after = decode_packet(mk_klv(1)), decode_packet(mk_klv(2))
+        packet = interpolate_packet(before, after, 0.5)
+        self.assertEqual(T0 + datetime.timedelta(seconds=1.5), packet[2].value)
+        self.assertAlmostEqual(357.5, packet[5].value, places=2)  # the short way, not 177.5
+        self.assertAlmostEqual(11.5, packet[13].value, places=5)
+        self.assertEqual(after[1], packet[1])  # the fields of the nearest packet, after from half way
+
+        aligner = FrameAligner(method='interpolate', reorder_depth=0)
+        out = aligner.add_klv(0, before) + aligner.add_frame(0) + aligner.add_frame(1000)
+        out += aligner.add_klv(4000, after) + aligner.flush()
+        self.assertEqual((0, before, 0), out[0])
+        self.assertAlmostEqual(11.25, out[1].packet[13].value, places=5)
+        self.assertIsNone(out[1].klv_pts)
+
+    def test_ts(self):
+        # 30 fps video, with KLV packets every other frame, half a frame late
+        stream = mk_pat() + mk_pmt()
+        for i in range(10):
+            stream += mk_ts_packets(VIDEO_PID, mk_pes(0xE0, i * 3000, b'\x00' * 500, False), i)
+            if i % 2 == 0:
+                stream += mk_ts_packets(KLV_PID, mk_pes(0xFC, i * 3000 + 1500, mk_klv(i)), i)
+
+        aligner = TsFrameAligner(method='previous')
+        frames = []
+        for i in range(0, len(stream), 1000):
+            frames += aligner.feed(stream[i:i + 1000])
+        frames += aligner.flush()
+        self.assertEqual(VIDEO_PID, aligner.video_pid)
+        self.assertEqual([i * 3000 for i in range(10)], [frame.pts for frame in frames])
+        self.assertIsNone(frames[0].packet)
+        for i, frame in enumerate(frames[1:], 1):
+            self.assertEqual(decode_packet(mk_klv((i - 1) // 2 * 2)), frame.packet)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'recording.ts')
+            with open(path, 'wb') as f:
+                f.write(stream)
+            self.assertEqual(frames, list(align_ts_file(path, read_size=5000, method='previous')))
+
+
+if __name__ == '__main__':
+    unittest.main()
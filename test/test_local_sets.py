@@ -0,0 +1,69 @@
+import unittest
+import uuid
+
+from pydroneklv.encoders import encode_field, encode_length, encode_packet
+from pydroneklv.local_sets import MiisCoreId, SecurityLocalSet, VmtiLocalSet, decode_ber_oid
+from pydroneklv.packet_decoder import decode_packet
+
+
+def mk_vtarget(target_id: int, centroid: int, confidence: int) -> bytes:
+    # target ids above 127 take two BER-OID bytes
+    id_bytes = bytes([target_id]) if target_id < 128 else bytes([0x80 | (target_id >> 7), target_id & 0x7f])
+    pack = id_bytes + encode_field(1, centroid.to_bytes(3, 'big')) + encode_field(5, bytes([confidence]))
+    return encode_length(len(pack)) + pack
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.security = encode_field(1, b'\x01') + encode_field(3, b'//PRT') + encode_field(22, b'\x00\x0c')
+        targets = mk_vtarget(1, 409600, 80) + mk_vtarget(300, 1000, 55)
+        self.vmti = encode_field(3, b'DSTO_ADSS') + encode_field(5, b'\x00\x1c') + encode_field(101, targets)
+        self.sensor_id = uuid.uuid4()
+        self.miis = bytes([1, 0x20]) + self.sensor_id.bytes
+        self.packet = decode_packet(encode_packet({2: 0, 48: self.security, 74: self.vmti, 94: self.miis}))
+
+    def test_security(self):
+        security = self.packet[48].value
+        self.assertIsInstance(security, SecurityLocalSet)
+        self.assertEqual({1: 1, 3: '//PRT', 22: 12}, dict(security))
+        self.assertEqual('Classifying Country', security.name(3))
+        self.assertEqual(self.security, bytes(security))
+
+    def test_vmti(self):
+        vmti = self.packet[74].value
+        self.assertIsInstance(vmti, VmtiLocalSet)
+        self.assertEqual('DSTO_ADSS', vmti[3])
+        self.assertEqual(28, vmti[5])
+        self.assertEqual(2, len(vmti.targets))
+        targets = list(vmti.targets)
+        self.assertEqual([1, 300], [target.target_id for target in targets])
+        self.assertEqual([{1: 409600, 5: 80}, {1: 1000, 5: 55}], [dict(target) for target in targets])
+        self.assertEqual(0, len(VmtiLocalSet(b'').targets))
+
+    def test_lazy(self):
+        vmti = VmtiLocalSet(self.vmti)
+        self.assertIsNone(vmti._fields)  # nothing parsed until read
+        self.assertEqual(3, len(vmti))
+        self.assertEqual({}, vmti._values)
+        # a truncated nested set only fails when read
+        broken = decode_packet(encode_packet({2: 0, 74: b'\x03'}))
+        with self.assertRaises(IndexError):
+            broken[74].value[3]
+
+    def test_miis(self):
+        miis = self.packet[94].value
+        self.assertEqual(MiisCoreId(self.miis), miis)
+        self.assertEqual((1, 0x20, [self.sensor_id]), (miis.version, miis.usage, miis.identifiers))
+
+    def test_ber_oid(self):
+        self.assertEqual((1, 5), decode_ber_oid(b'\x05'))
+        self.assertEqual((2, 300), decode_ber_oid(b'\x82\x2c'))
+
+    def test_zero_copy(self):
+        packet = decode_packet(bytearray(encode_packet({2: 0, 74: self.vmti})), copy=False)
+        self.assertEqual(self.packet[74].value, packet[74].value)
+        self.assertEqual([1, 300], [target.target_id for target in packet[74].value.targets])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import unittest
+
+from pydroneklv.errors import ByteArrayTooSmall, CRCError, UniversalKeyNotFound
+from pydroneklv.metrics import DecodeMetrics, Histogram
+from pydroneklv.packet_decoder import decode_packet
+from pydroneklv.stream_decoder import StreamDecoder
+from pydroneklv.ts_demuxer import TsKlvDecoder
+from test.test_decode_packet import PKT_BYTES
+from test.test_ts_demuxer import mk_ts_stream
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.pkt_bytes = PKT_BYTES
+        self.expected = decode_packet(self.pkt_bytes)
+
+    def test_stream_counters(self):
+        corrupted = bytearray(self.pkt_bytes)
+        corrupted[30] ^= 0xFF
+        metrics = DecodeMetrics()
+        decoder = StreamDecoder(metrics=metrics)
+        packets = decoder.feed(self.pkt_bytes * 2 + bytes(corrupted) + self.pkt_bytes)
+        self.assertEqual([self.expected] * 3, packets)
+        self.assertEqual(3, metrics.packets)
+        self.assertEqual(3 * len(self.pkt_bytes), metrics.bytes)
+        self.assertEqual(1, metrics.crc_errors)
+        self.assertEqual(decoder.crc_errors, metrics.crc_errors)
+
+        snapshot = metrics.snapshot()
+        json.dumps(snapshot)
+        self.assertEqual(3, snapshot['packets'])
+        self.assertGreater(snapshot['packets_per_s'], 0)
+        self.assertEqual(0, metrics.snapshot()['packets_per_s'])  # nothing new since the last snapshot
+
+    def test_errors(self):
+        metrics = DecodeMetrics()
+        for buf, error in ((self.pkt_bytes[:20], ByteArrayTooSmall),
+                           (self.pkt_bytes[:-10], ByteArrayTooSmall),
+                           (b'\x00' * 100, UniversalKeyNotFound),
+                           (self.pkt_bytes[:-1] + b'\x00', CRCError)):
+            with self.assertRaises(error):
+                metrics.decode(buf)
+        self.assertEqual((2, 1, 1, 0), (metrics.too_small_errors, metrics.key_not_found_errors,
+                                        metrics.crc_errors, metrics.packets))
+
+    def test_tag_timing(self):
+        metrics = DecodeMetrics(tag_timing=True)
+        self.assertEqual(self.expected, metrics.decode(self.pkt_bytes))
+        self.assertEqual({13: self.expected[13]}, metrics.decode(self.pkt_bytes, tags=[13]))
+        self.assertEqual(sorted(self.expected), sorted(metrics.tag_decode_times))
+        self.assertEqual(2, metrics.tag_decode_times[13].count)
+        self.assertEqual(1, metrics.tag_decode_times[2].count)
+
+    def test_ts_latency(self):
+        metrics = DecodeMetrics()
+        decoder = TsKlvDecoder(metrics=metrics)
+        packets = decoder.feed(mk_ts_stream([self.pkt_bytes] * 3)) + decoder.flush()
+        self.assertEqual(3, len(packets))
+        self.assertIs(metrics, decoder.metrics)
+        self.assertEqual(3, metrics.latency.count)
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for duration in (0, 1, 3, 1000, 1000):
+            histogram.add(duration)
+        self.assertEqual(4, histogram.quantile(0.5))
+        self.assertEqual(1024, histogram.quantile(0.9))
+        self.assertEqual(1, histogram.quantile(0.2))
+        other = DecodeMetrics()
+        other.latency.add(5)
+        merged = DecodeMetrics()
+        merged.latency.merge(histogram)
+        merged.merge(other)
+        self.assertEqual(6, merged.latency.count)
+        self.assertEqual({1: 1, 2: 1, 4: 1, 8: 1, 1024: 2}, merged.latency.to_dict()['buckets'])
+
+
+if __name__ == '__main__':
+    unittest.main()
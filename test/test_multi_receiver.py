@@ -0,0 +1,68 @@
+import socket
+import unittest
+
+from pydroneklv.encoders import encode_packet
+from pydroneklv.multi_receiver import FeedPacket, MultiFeedReceiver
+from pydroneklv.packet_decoder import decode_packet
+from pydroneklv.ts_demuxer import TsKlvDecoder
+from test.test_ts_demuxer import mk_ts_stream
+
+T0 = 1_600_000_000_000_000  # microseconds
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver = MultiFeedReceiver()
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+
+    def receive(self, n_packets):
+        packets = []
+        while len(packets) < n_packets:
+            polled = self.receiver.poll(5)
+            self.assertTrue(polled, 'timed out')
+            packets += polled
+        return packets
+
+    def test_feeds_reassembled_separately(self):
+        uav1 = self.receiver.add_feed('uav1', '127.0.0.1', 0)
+        uav2 = self.receiver.add_feed('uav2', '127.0.0.1', 0)
+        packet1 = encode_packet({2: T0, 3: 'UAV1'})
+        packet2 = encode_packet({2: T0, 3: 'UAV2'})
+        # both packets split in two datagrams, interleaved
+        self.sender.sendto(packet1[:30], uav1.local_address)
+        self.sender.sendto(packet2[:20], uav2.local_address)
+        self.sender.sendto(packet1[30:], uav1.local_address)
+        self.sender.sendto(packet2[20:], uav2.local_address)
+
+        packets = self.receive(2)
+        self.assertEqual({('uav1', 'UAV1'), ('uav2', 'UAV2')}, {(feed, packet[3].value) for feed, packet in packets})
+        stats = self.receiver.stats()
+        self.assertEqual((2, 1, 0), (stats['uav1']['datagrams'], stats['uav1']['packets'],
+                                     stats['uav1']['crc_errors']))
+        self.assertEqual(len(packet2), stats['uav2']['bytes'])
+
+    def test_ts_feed(self):
+        feed = self.receiver.add_feed('ts', '127.0.0.1', 0, decoder=TsKlvDecoder())
+        packet = encode_packet({2: T0, 13: 45.0})
+        stream = mk_ts_stream([packet] * 2)
+        for i in range(0, len(stream), 7 * 188):
+            self.sender.sendto(stream[i:i + 7 * 188], feed.local_address)
+        packets = self.receive(1)  # the last PES is only complete on the next payload start
+        self.assertEqual(FeedPacket('ts', decode_packet(packet)), packets[0])
+        self.assertEqual(0, self.receiver.stats()['ts']['sync_losses'])
+
+    def test_feed_management(self):
+        self.receiver.add_feed('uav1', '127.0.0.1', 0)
+        with self.assertRaises(ValueError):
+            self.receiver.add_feed('uav1', '127.0.0.1', 0)
+        self.receiver.remove_feed('uav1')
+        self.assertEqual({}, self.receiver.stats())
+        self.assertEqual([], self.receiver.poll(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from pydroneklv.parallel_decoder import decode_file_parallel, find_chunk_boundaries
+from pydroneklv.stream_decoder import decode_file
+from test.test_decode_packet import PKT_BYTES
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        pkt_bytes = PKT_BYTES
+        corrupted = bytearray(pkt_bytes)
+        corrupted[30] ^= 0xFF
+        self.recording = b'garbage' + (pkt_bytes + b'\x00' * 5 + pkt_bytes + bytes(corrupted)) * 50
+        fd, self.path = tempfile.mkstemp(suffix='.klv')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self.recording)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_chunk_boundaries(self):
+        ranges = find_chunk_boundaries(self.recording, 1000)
+        self.assertEqual(len(b'garbage'), ranges[0][0])
+        self.assertEqual(len(self.recording), ranges[-1][1])
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(0, self.recording.find(PKT_BYTES[:16], start) - start)
+
+    def test_same_as_serial(self):
+        serial = list(decode_file(self.path, read_size=100))
+        self.assertEqual(100, len(serial))
+        for chunk_size in (1, 1000, 10 ** 6):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(serial, decode_file_parallel(self.path, workers=2, chunk_size=chunk_size))
+        self.assertEqual([{13: p[13]} for p in serial],
+                         decode_file_parallel(self.path, workers=2, chunk_size=1000, tags=[13]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+from pydroneklv.packet_decoder import decode_packet
+from pydroneklv.recording import KlvRecording, scan_packets
+from test.test_decode_packet import PKT_BYTES
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.pkt_bytes = PKT_BYTES
+        self.expected = decode_packet(self.pkt_bytes)
+        corrupted = bytearray(self.pkt_bytes)
+        corrupted[30] ^= 0xFF
+        self.recording = b'garbage' + (self.pkt_bytes + bytes(corrupted) + b'\x00' * 3 + self.pkt_bytes) * 10
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'recording.klv')
+        with open(self.path, 'wb') as f:
+            f.write(self.recording)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_scan(self):
+        offsets, sizes, scan_pos = scan_packets(self.recording)
+        self.assertEqual(20, len(offsets))
+        self.assertEqual([len(self.pkt_bytes)] * 20, list(sizes))
+        for offset in offsets:
+            self.assertEqual(self.pkt_bytes, self.recording[offset:offset + len(self.pkt_bytes)])
+        self.assertEqual(len(self.recording), scan_pos)
+
+        # a packet cut at the end is left for the next scan
+        _, _, scan_pos = scan_packets(self.recording + self.pkt_bytes[:30])
+        self.assertEqual(len(self.recording), scan_pos)
+
+    def test_random_access(self):
+        with KlvRecording(self.path) as recording:
+            self.assertEqual(20, len(recording))
+            self.assertEqual(self.expected, recording[7])
+            self.assertEqual(self.expected, recording[-1])
+            self.assertEqual([self.expected] * 2, recording[3:5])
+            self.assertEqual({13: self.expected[13]}, recording.packet(2, tags=[13]))
+            self.assertEqual(self.pkt_bytes, recording.packet_bytes(0))
+
+    def test_index_reused(self):
+        with KlvRecording(self.path) as recording:
+            self.assertEqual(len(self.recording), recording.scanned_bytes)
+            offsets = list(recording.offsets)
+        self.assertTrue(os.path.exists(self.path + '.klvidx'))
+
+        with KlvRecording(self.path) as recording:
+            self.assertEqual(0, recording.scanned_bytes)
+            self.assertEqual(offsets, list(recording.offsets))
+
+        with KlvRecording(self.path, use_index=False) as recording:
+            self.assertEqual(len(self.recording), recording.scanned_bytes)
+
+    def test_growing_recording(self):
+        with open(self.path, 'ab') as f, KlvRecording(self.path) as recording:
+            f.write(self.pkt_bytes[:50])
+            f.flush()
+            self.assertEqual(0, recording.refresh())
+            f.write(self.pkt_bytes[50:] + self.pkt_bytes)
+            f.flush()
+            self.assertEqual(2, recording.refresh())
+            self.assertEqual(self.expected, recording[21])
+
+        with KlvRecording(self.path) as recording:
+            self.assertEqual(22, len(recording))
+            self.assertEqual(0, recording.scanned_bytes)
+
+    def test_views_across_refresh(self):
+        with open(self.path, 'ab') as f:
+            recording = KlvRecording(self.path)
+            lazy = recording.packet(0, lazy=True, copy=False)
+            view = recording.packet(1, copy=False)
+            f.write(self.pkt_bytes)
+            f.flush()
+            self.assertEqual(1, recording.refresh())
+            self.assertEqual(self.expected, lazy)
+            self.assertEqual(self.expected, view)
+            recording.close()
+            self.assertEqual(self.expected[13], lazy[13])
+
+    def test_stale_index(self):
+        KlvRecording(self.path).close()
+        with open(self.path, 'wb') as f:
+            f.write(self.pkt_bytes)
+        with KlvRecording(self.path) as recording:
+            self.assertEqual(1, len(recording))
+
+
+if __name__ == '__main__':
+    unittest.main()
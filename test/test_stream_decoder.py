@@ -0,0 +1,81 @@
+import unittest
+
+from pydroneklv.packet_decoder import decode_packet, DecodeCache
+from pydroneklv.stream_decoder import StreamDecoder
+from pydroneklv.ts_demuxer import TsKlvDecoder
+from test.test_decode_packet import PKT_BYTES
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.pkt_bytes = PKT_BYTES
+        self.expected = decode_packet(self.pkt_bytes)
+
+    def test_whole_packets(self):
+        decoder = StreamDecoder()
+        packets = decoder.feed(self.pkt_bytes * 3)
+        self.assertEqual([self.expected] * 3, packets)
+        self.assertEqual(0, decoder.pending)
+
+    def test_byte_by_byte(self):
+        decoder = StreamDecoder()
+        packets = []
+        for i in range(len(self.pkt_bytes) * 2):
+            packets += decoder.feed(self.pkt_bytes[i % len(self.pkt_bytes):][:1])
+        self.assertEqual([self.expected] * 2, packets)
+
+    def test_split_chunks(self):
+        stream = self.pkt_bytes * 4
+        for chunk_size in (7, 16, 17, 50, len(self.pkt_bytes) - 1):
+            with self.subTest(chunk_size=chunk_size):
+                decoder = StreamDecoder()
+                packets = []
+                for i in range(0, len(stream), chunk_size):
+                    packets += decoder.feed(stream[i:i + chunk_size])
+                self.assertEqual([self.expected] * 4, packets)
+
+    def test_cache(self):
+        decoder = StreamDecoder(cache=DecodeCache())
+        packets = decoder.feed(self.pkt_bytes * 3)
+        self.assertEqual([self.expected] * 3, packets)
+        self.assertIs(packets[0][3], packets[2][3])
+        self.assertAlmostEqual(2 / 3, decoder.cache.hit_rate)
+
+    def test_raw(self):
+        packets = StreamDecoder(raw=True).feed(self.pkt_bytes * 2)
+        self.assertEqual([decode_packet(self.pkt_bytes, raw=True)] * 2, packets)
+        self.assertIsInstance(packets[0][2].value, int)
+
+        self.assertRaises(ValueError, StreamDecoder, raw=True, cache=DecodeCache())
+        self.assertRaises(ValueError, TsKlvDecoder, cache=DecodeCache(raw=True))
+        decoder = StreamDecoder(raw=True, cache=DecodeCache(raw=True))
+        self.assertEqual(packets, decoder.feed(self.pkt_bytes * 2))
+
+    def test_garbage_between_packets(self):
+        decoder = StreamDecoder()
+        garbage = b'\x00\x06\x0e\x2b\x34garbage'
+        packets = decoder.feed(garbage + self.pkt_bytes + garbage + self.pkt_bytes + garbage)
+        self.assertEqual([self.expected] * 2, packets)
+        self.assertEqual(3 * len(garbage), decoder.skipped_bytes + decoder.pending)
+
+    def test_resync_after_crc_error(self):
+        corrupted = bytearray(self.pkt_bytes)
+        corrupted[30] ^= 0xFF
+        decoder = StreamDecoder()
+        packets = decoder.feed(bytes(corrupted) + self.pkt_bytes)
+        self.assertEqual([self.expected], packets)
+        self.assertEqual(1, decoder.crc_errors)
+
+    def test_resync_after_truncated_packet(self):
+        decoder = StreamDecoder()
+        packets = decoder.feed(self.pkt_bytes[:40] + self.pkt_bytes + self.pkt_bytes)
+        self.assertEqual([self.expected] * 2, packets)
+
+    def test_tags_projection(self):
+        decoder = StreamDecoder(tags=[2, 13])
+        packets = decoder.feed(self.pkt_bytes * 2)
+        self.assertEqual([{2: self.expected[2], 13: self.expected[13]}] * 2, packets)
+
+
+if __name__ == '__main__':
+    unittest.main()
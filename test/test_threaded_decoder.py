@@ -0,0 +1,93 @@
+import threading
+import time
+import unittest
+
+from pydroneklv.aio_receiver import DROP_NEWEST, DROP_OLDEST
+from pydroneklv.encoders import encode_packet
+from pydroneklv.metrics import DecodeMetrics
+from pydroneklv.threaded_decoder import BLOCK, ThreadedDecoder
+
+T0 = 1_600_000_000_000_000  # microseconds
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.packets = [encode_packet({2: T0 + i, 13: 45.0}) for i in range(20)]
+
+    def timestamps(self, packets):
+        return [packet[2].bytes for packet in packets]
+
+    def raw_timestamps(self, packets_bytes):
+        return [packet_bytes[19:27] for packet_bytes in packets_bytes]  # after the key, length, tag and length
+
+    def demuxed(self, decoder: ThreadedDecoder) -> ThreadedDecoder:
+        """waits for the demux thread to read the whole source before consuming"""
+        decoder.start()
+        decoder._thread.join()
+        return decoder
+
+    def test_block_keeps_order(self):
+        def slow_source():
+            for i, packet in enumerate(self.packets):
+                if i % 5 == 0:
+                    time.sleep(0.01)
+                yield packet
+
+        metrics = DecodeMetrics()
+        with ThreadedDecoder(slow_source(), workers=3, max_queue_size=2, policy=BLOCK, metrics=metrics) as decoder:
+            packets = list(decoder)
+        self.assertEqual(self.raw_timestamps(self.packets), self.timestamps(packets))
+        self.assertEqual(0, decoder.dropped_packets)
+        self.assertEqual(20, metrics.packets)
+        self.assertEqual(20, metrics.latency.count)
+
+    def test_open_source(self):
+        # a live source with no packets for now, the ones already demuxed aren't held back
+        resume = threading.Event()
+
+        def open_source():
+            yield from self.packets[:3]
+            resume.wait(10)
+            yield from self.packets[3:]
+
+        with ThreadedDecoder(open_source(), workers=2) as decoder:
+            packets = iter(decoder)
+            t = time.perf_counter()
+            head = [next(packets) for _ in range(3)]
+            self.assertLess(time.perf_counter() - t, 5)
+            self.assertFalse(resume.is_set())
+            resume.set()
+            packets = head + list(packets)
+        self.assertEqual(self.raw_timestamps(self.packets), self.timestamps(packets))
+
+    def test_drop_policies(self):
+        for policy, kept in ((DROP_NEWEST, self.packets[:5]), (DROP_OLDEST, self.packets[-5:])):
+            with self.subTest(policy=policy):
+                with self.demuxed(ThreadedDecoder(iter(self.packets), max_queue_size=5, policy=policy)) as decoder:
+                    packets = list(decoder)
+                self.assertEqual(self.raw_timestamps(kept), self.timestamps(packets))
+                self.assertEqual((20, 15), (decoder.demuxed_packets, decoder.dropped_packets))
+
+    def test_errors(self):
+        def failing_source():
+            yield self.packets[0]
+            yield self.packets[1][:-1] + b'\x00'  # bad checksum
+            yield self.packets[2]
+            raise OSError('stream lost')
+
+        metrics = DecodeMetrics()
+        decoder = ThreadedDecoder(failing_source(), metrics=metrics)
+        packets = []
+        with self.assertRaises(OSError):
+            for packet in decoder:
+                packets.append(packet)
+        decoder.close()
+        self.assertEqual(self.raw_timestamps([self.packets[0], self.packets[2]]), self.timestamps(packets))
+        self.assertEqual(1, metrics.crc_errors)
+
+        with self.assertRaises(ValueError):
+            ThreadedDecoder([], policy='pause')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import datetime
+import os
+import struct
+import tempfile
+import unittest
+
+import pydroneklv.encoders as encoders
+from pydroneklv.decoders import to_microseconds
+from pydroneklv.recording import KlvRecording
+from pydroneklv.time_index import TimeIndex, read_timestamp
+from test.test_decode_packet import mk_packet
+
+T0 = 1_600_000_000_000_000  # microseconds
+
+
+def mk_timed_packet(timestamp: int, timestamp_first: bool = True) -> bytes:
+    timestamp_field = encoders.encode_field(2, struct.pack('>Q', timestamp))
+    other_field = encoders.encode_field(13, b'\x55\x95\xb6\x6d')
+    payload = timestamp_field + other_field if timestamp_first else other_field + timestamp_field
+    return mk_packet({'fields': [], 'bytes': payload})
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        # one packet per second, with the 5th and 6th out of order
+        self.timestamps = [T0 + i * 1_000_000 for i in range(10)]
+        self.timestamps[5], self.timestamps[6] = self.timestamps[6], self.timestamps[5]
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'recording.klv')
+        self.write_packets(self.timestamps)
+        self.recording = KlvRecording(self.path)
+        self.index = TimeIndex.from_recording(self.recording)
+
+    def tearDown(self):
+        self.recording.close()
+        self.tmp_dir.cleanup()
+
+    def write_packets(self, timestamps):
+        with open(self.path, 'ab') as f:
+            for i, t in enumerate(timestamps):
+                f.write(mk_timed_packet(t, timestamp_first=i % 3 != 0))
+
+    def test_read_timestamp(self):
+        for timestamp_first in (True, False):
+            with self.subTest(timestamp_first=timestamp_first):
+                self.assertEqual(T0, read_timestamp(mk_timed_packet(T0, timestamp_first), 0))
+
+    def test_sorted(self):
+        self.assertEqual(10, len(self.index))
+        self.assertEqual(sorted(self.timestamps), list(self.index.timestamps))
+        for t, offset in zip(self.index.timestamps, self.index.offsets):
+            self.assertEqual(t, read_timestamp(self.recording.buffer, offset))
+
+    def test_range(self):
+        offsets = self.index.range(T0 + 2_000_000, T0 + 6_000_000)
+        self.assertEqual([T0 + i * 1_000_000 for i in range(2, 7)],
+                         [read_timestamp(self.recording.buffer, offset) for offset in offsets])
+        self.assertEqual([], self.index.range(T0 - 10, T0 - 1))
+
+        start = datetime.datetime.utcfromtimestamp((T0 + 2_000_000) / 1e6)
+        packets = list(self.index.packets(self.recording, start, start + datetime.timedelta(seconds=1)))
+        self.assertEqual([start, start + datetime.timedelta(seconds=1)], [p[2].value for p in packets])
+
+    def test_nearest(self):
+        self.assertEqual(T0, self.index.nearest(0)[0])
+        self.assertEqual(T0 + 9_000_000, self.index.nearest(T0 * 2)[0])
+        self.assertEqual(T0 + 5_000_000, self.index.nearest(T0 + 5_400_000)[0])
+        self.assertEqual(T0 + 6_000_000, self.index.nearest(T0 + 5_600_000)[0])
+        self.assertIsNone(TimeIndex().nearest(T0))
+
+    def test_update(self):
+        self.write_packets([T0 + 20_000_000, T0 + 500_000])
+        self.assertEqual(2, self.index.update(self.recording))
+        self.assertEqual(12, len(self.index))
+        self.assertEqual(sorted(self.timestamps + [T0 + 20_000_000, T0 + 500_000]), list(self.index.timestamps))
+        self.assertEqual(0, self.index.update(self.recording))
+
+    def test_bad_timestamp(self):
+        # a 4 bytes tag 2 in a packet with a valid CRC is skipped, the packets after it are indexed once
+        with open(self.path, 'ab') as f:
+            f.write(mk_packet({'fields': [], 'bytes': encoders.encode_field(2, b'\x00\x01\x02\x03')}))
+        self.write_packets([T0 + 20_000_000])
+        self.assertEqual(1, self.index.update(self.recording))
+        self.assertEqual(1, self.index.bad_timestamps)
+        self.assertEqual(0, self.index.update(self.recording))
+        self.assertEqual(11, len(self.index))
+
+    def test_to_microseconds(self):
+        dt = datetime.datetime(2020, 9, 13, 12, 26, 40)
+        self.assertEqual(T0, to_microseconds(dt))
+        self.assertEqual(T0, to_microseconds(dt.replace(tzinfo=datetime.timezone.utc)))
+        self.assertEqual(T0, to_microseconds(T0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from pydroneklv.packet_decoder import decode_packet
+from pydroneklv.ts_demuxer import TsDemuxer, TsKlvDecoder, decode_ts_file, TS_PACKET_SIZE
+from test.test_decode_packet import PKT_BYTES
+
+PMT_PID = 0x1000
+KLV_PID = 0x0101
+VIDEO_PID = 0x0100
+
+
+def mpeg_crc32(data: bytes) -> int:
+    crc = 0xFFFFFFFF
+    for b in data:
+        crc ^= b << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7 if crc & 0x80000000 else crc << 1) & 0xFFFFFFFF
+    return crc
+
+
+def mk_ts_packets(pid: int, payload: bytes, counter: int = 0) -> bytes:
+    """splits a PES packet or PSI section in TS packets, the last one padded with an adaptation field"""
+    packets = b''
+    for i in range(0, max(len(payload), 1), TS_PACKET_SIZE - 4):
+        chunk = payload[i:i + TS_PACKET_SIZE - 4]
+        pusi = 0x40 if i == 0 else 0
+        header = bytes([0x47, pusi | (pid >> 8), pid & 0xFF])
+        n_stuffing = TS_PACKET_SIZE - 4 - len(chunk)
+        if n_stuffing:
+            adaptation = bytes([n_stuffing - 1]) + (b'\x00' + b'\xff' * (n_stuffing - 2) if n_stuffing > 1 else b'')
+            packets += header + bytes([0x30 | counter % 16]) + adaptation + chunk
+        else:
+            packets += header + bytes([0x10 | counter % 16]) + chunk
+        counter += 1
+    return packets
+
+
+def mk_section(table_id: int, body: bytes) -> bytes:
+    section = bytes([table_id]) + struct.pack('>H', 0xB000 | (len(body) + 4)) + body
+    return b'\x00' + section + struct.pack('>I', mpeg_crc32(section))  # pointer field first
+
+
+def mk_pat() -> bytes:
+    body = struct.pack('>HBBBHH', 1, 0xC1, 0, 0, 1, 0xE000 | PMT_PID)
+    return mk_ts_packets(0, mk_section(0x00, body))
+
+
+def mk_pmt() -> bytes:
+    klv_descriptor = b'\x05\x04KLVA'
+    body = struct.pack('>HBBBHH', 1, 0xC1, 0, 0, 0xE000 | VIDEO_PID, 0xF000)
+    body += struct.pack('>BHH', 0x1B, 0xE000 | VIDEO_PID, 0xF000)
+    body += struct.pack('>BHH', 0x06, 0xE000 | KLV_PID, 0xF000 | len(klv_descriptor)) + klv_descriptor
+    return mk_ts_packets(PMT_PID, mk_section(0x02, body))
+
+
+def mk_pes(stream_id: int, pts: int, payload: bytes, bounded: bool = True) -> bytes:
+    pts_bytes = bytes([0x21 | ((pts >> 29) & 0x0E), (pts >> 22) & 0xFF, 0x01 | ((pts >> 14) & 0xFE),
+                       (pts >> 7) & 0xFF, 0x01 | ((pts << 1) & 0xFE)])
+    header = b'\x80\x80\x05' + pts_bytes
+    pes_length = len(header) + len(payload) if bounded else 0
+    return b'\x00\x00\x01' + bytes([stream_id]) + struct.pack('>H', pes_length) + header + payload
+
+
+def mk_ts_stream(klv_packets, video_payload_size: int = 1000) -> bytes:
+    stream = mk_pat() + mk_pmt()
+    for i, klv_packet in enumerate(klv_packets):
+        stream += mk_ts_packets(VIDEO_PID, mk_pes(0xE0, i * 3000, b'\x00\x01' * (video_payload_size // 2), False), i)
+        stream += mk_ts_packets(KLV_PID, mk_pes(0xFC, i * 3000, klv_packet), i)
+    return stream
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.pkt_bytes = PKT_BYTES
+        self.expected = decode_packet(self.pkt_bytes)
+        # the second KLV packet spans several TS packets
+        self.klv_packets = [self.pkt_bytes, self.pkt_bytes + self.pkt_bytes, self.pkt_bytes]
+        self.stream = mk_ts_stream(self.klv_packets)
+
+    def test_demux(self):
+        demuxer = TsDemuxer()
+        pes_packets = demuxer.feed(self.stream)
+        self.assertEqual(KLV_PID, demuxer.klv_pid)
+        self.assertEqual({VIDEO_PID: 0x1B, KLV_PID: 0x06}, demuxer.streams)
+        self.assertEqual(self.klv_packets, [pes.payload for pes in pes_packets])
+        self.assertEqual([0, 3000, 6000], [pes.pts for pes in pes_packets])
+        self.assertEqual([], demuxer.flush())
+
+    def test_demux_other_pids(self):
+        demuxer = TsDemuxer(pids=[VIDEO_PID])
+        pes_packets = demuxer.feed(self.stream) + demuxer.flush()
+        # the video PES packets have no length, each one ends when the next one starts
+        self.assertEqual([KLV_PID, VIDEO_PID] * 3, [pes.pid for pes in pes_packets])
+
+    def test_demux_headers(self):
+        for demuxer in (TsDemuxer(header_pids=[VIDEO_PID]), TsDemuxer(header_stream_types=[0x1B])):
+            with self.subTest(header_pids=demuxer.header_pids):
+                pes_packets = []
+                for i in range(0, len(self.stream), TS_PACKET_SIZE):
+                    pes_packets += demuxer.feed(self.stream[i:i + TS_PACKET_SIZE])
+                    self.assertNotIn(VIDEO_PID, demuxer._pes)  # the video payloads are never buffered
+                # the video PES packets are returned as soon as they start
+                self.assertEqual([VIDEO_PID, KLV_PID] * 3, [pes.pid for pes in pes_packets])
+                self.assertEqual([0, 0, 3000, 3000, 6000, 6000], [pes.pts for pes in pes_packets])
+                self.assertEqual([b''] * 3, [pes.payload for pes in pes_packets[::2]])
+
+    def test_short_pmt(self):
+        entry = struct.pack('>BHH', 0x15, 0xE000 | KLV_PID, 0xF000 | 20)  # descriptors past the end
+        bad_sections = [
+            mk_section(0x02, b'\x00\x01\xc1'),  # ends before the program info length
+            mk_section(0x02, struct.pack('>HBBBHH', 1, 0xC1, 0, 0, 0xE000 | VIDEO_PID, 0xF000 | 50)),
+            mk_section(0x02, struct.pack('>HBBBHH', 1, 0xC1, 0, 0, 0xE000 | VIDEO_PID, 0xF000) + entry),
+            b'\x00\x02\xb0\xff' + b'\x00' * 20,  # longer than the TS packet
+        ]
+        for section in bad_sections:
+            with self.subTest(section=section):
+                demuxer = TsDemuxer()
+                self.assertEqual([], demuxer.feed(mk_pat() + mk_ts_packets(PMT_PID, section)))
+                self.assertEqual(({}, None), (demuxer.streams, demuxer.klv_pid))
+                self.assertEqual(3, len(demuxer.feed(self.stream)))
+
+    def test_chunks_and_garbage(self):
+        stream = b'garbage' + self.stream[:500] + b'\x47garbage' + self.stream[500:]
+        for chunk_size in (1, 100, TS_PACKET_SIZE, len(stream)):
+            with self.subTest(chunk_size=chunk_size):
+                decoder = TsKlvDecoder()
+                packets = []
+                for i in range(0, len(stream), chunk_size):
+                    packets += decoder.feed(stream[i:i + chunk_size])
+                packets += decoder.flush()
+                self.assertEqual([self.expected] * 4, packets)
+                self.assertGreater(decoder.demuxer.sync_losses, 0)
+
+    def test_decode_ts_file(self):
+        fd, path = tempfile.mkstemp(suffix='.ts')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.stream)
+            self.assertEqual([self.expected] * 4, list(decode_ts_file(path, read_size=1000)))
+            self.assertEqual([{2: self.expected[2]}] * 4, list(decode_ts_file(path, tags=[2])))
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()